@@ -10,23 +10,25 @@ import os
 import logging
 import traceback
 from pathlib import Path
-from datetime import datetime
 
 # Configurar logging para produção
 def setup_logging():
-    """Configura o sistema de logging para produção"""
-    log_dir = Path("logs")
-    log_dir.mkdir(exist_ok=True)
-    
-    log_file = log_dir / f"app_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+    """Configura o sistema de logging para produção (arquivo único com rotação, gravado em segundo plano)"""
+    try:
+        from config.settings import Settings
+        from utils.log_pipeline import configurar_logging
+    except ImportError:
+        # Dependência ausente: apenas console, para check_dependencies conseguir relatar o problema
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        return logging.getLogger(__name__)
     
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file, encoding='utf-8'),
-            logging.StreamHandler(sys.stdout)
-        ]
+    settings = Settings()
+    configurar_logging(
+        "logs", "app",
+        nivel=settings.log_nivel,
+        max_mb=settings.log_max_mb,
+        backups=settings.log_backups,
+        json_lines=settings.log_json
     )
     
     return logging.getLogger(__name__)
@@ -149,6 +149,23 @@ a = Analysis(
         'utils',
         'utils.data_processor',
         'utils.license_checker',
+        'utils.wait_engine',
+        'utils.selector_cache',
+        'utils.page_probe',
+        'utils.webdriver_profiler',
+        'utils.inscricao_cache',
+        'utils.inscricao_resolver',
+        'utils.option_catalog',
+        'utils.conciliacao_rascunhos',
+        'utils.worker_pool',
+        'utils.tab_scheduler',
+        'utils.http_engine',
+        'utils.abrasf',
+        'utils.wizard_state',
+        'utils.watchdog',
+        'utils.chrome_remoto',
+        'utils.screenshot_writer',
+        'utils.log_pipeline',
         'gui',
         'gui.main_window',
         'webiss_automation',
@@ -23,6 +23,36 @@ class Settings:
         self.delay_between_actions = 2.0
         self.data_directory = 'data'
         self.logs_directory = 'logs'
+        self.inscricao_endereco_url = ''
+        self.emitir_direto = False
+        self.rascunhos_url = ''
+        self.workers = 1
+        self.worker_credentials = ''
+        self.abas = 1
+        self.pipeline_emissao = False
+        self.motor_emissao = 'selenium'
+        self.abrasf_url = ''
+        self.abrasf_certificado = ''
+        self.abrasf_senha_certificado = ''
+        self.prestador_cnpj = ''
+        self.prestador_inscricao_municipal = ''
+        self.codigo_municipio = '1721000'
+        self.comando_timeout = 90
+        self.page_load_timeout = 60
+        self.reciclar_navegador_notas = 150
+        self.reciclar_navegador_mb = 1500
+        self.aquecer_navegador = True
+        self.aquecer_login = True
+        self.chrome_debug_port = 0
+        self.chrome_perfil_dir = ''
+        self.screenshots = 'erros'
+        self.screenshots_amostra = 20
+        self.screenshots_max_mb = 200
+        self.screenshots_max_dias = 7
+        self.log_nivel = 'INFO'
+        self.log_max_mb = 10
+        self.log_backups = 5
+        self.log_json = True
         
         # Carregar configurações do arquivo .env se existir
         self.load_from_env_file('.env')
@@ -41,6 +71,62 @@ class Settings:
         self.data_directory = os.getenv('DATA_DIRECTORY', self.data_directory if hasattr(self, 'data_directory') else 'data')
         self.logs_directory = os.getenv('LOGS_DIRECTORY', self.logs_directory if hasattr(self, 'logs_directory') else 'logs')
         
+        # Endpoint de endereço da inscrição municipal (vazio = aprendido automaticamente)
+        self.inscricao_endereco_url = os.getenv('INSCRICAO_ENDERECO_URL', self.inscricao_endereco_url)
+        
+        # Emitir direto da etapa de Valores, sem salvar rascunho (registros arriscados sempre salvam)
+        self.emitir_direto = os.getenv('EMITIR_DIRETO', str(self.emitir_direto)).lower() == 'true'
+        
+        # Página com a lista de rascunhos (vazio = navegação pelo menu)
+        self.rascunhos_url = os.getenv('RASCUNHOS_URL', self.rascunhos_url)
+        
+        # Navegadores em paralelo e contas por navegador ('usuario1:senha1;usuario2:senha2')
+        self.workers = int(os.getenv('WORKERS', str(self.workers)))
+        self.worker_credentials = os.getenv('WORKER_CREDENTIALS', self.worker_credentials)
+        
+        # Abas com wizards simultâneos dentro de uma mesma sessão do Chrome
+        self.abas = int(os.getenv('ABAS', str(self.abas)))
+        
+        # Preencher a próxima nota em uma segunda aba enquanto a atual é emitida
+        self.pipeline_emissao = os.getenv('PIPELINE_EMISSAO', str(self.pipeline_emissao)).lower() == 'true'
+        
+        # Motor de emissão: 'selenium' (wizard no navegador) ou 'http' (posts diretos, Selenium como reserva)
+        self.motor_emissao = os.getenv('MOTOR_EMISSAO', self.motor_emissao).lower()
+        
+        # Webservice ABRASF (lotes RPS) e dados do prestador
+        self.abrasf_url = os.getenv('ABRASF_URL', self.abrasf_url)
+        self.abrasf_certificado = os.getenv('ABRASF_CERTIFICADO', self.abrasf_certificado)
+        self.abrasf_senha_certificado = os.getenv('ABRASF_SENHA_CERTIFICADO', self.abrasf_senha_certificado)
+        self.prestador_cnpj = os.getenv('PRESTADOR_CNPJ', self.prestador_cnpj)
+        self.prestador_inscricao_municipal = os.getenv('PRESTADOR_INSCRICAO_MUNICIPAL', self.prestador_inscricao_municipal)
+        self.codigo_municipio = os.getenv('CODIGO_MUNICIPIO', self.codigo_municipio)
+        
+        # Prazos rígidos do navegador e reciclagem periódica do Chrome (0 = desativado)
+        self.comando_timeout = int(os.getenv('COMANDO_TIMEOUT', str(self.comando_timeout)))
+        self.page_load_timeout = int(os.getenv('PAGE_LOAD_TIMEOUT', str(self.page_load_timeout)))
+        self.reciclar_navegador_notas = int(os.getenv('RECICLAR_NAVEGADOR_NOTAS', str(self.reciclar_navegador_notas)))
+        self.reciclar_navegador_mb = int(os.getenv('RECICLAR_NAVEGADOR_MB', str(self.reciclar_navegador_mb)))
+        
+        # Navegador pré-aquecido ao abrir a interface (e login antecipado, se houver credenciais)
+        self.aquecer_navegador = os.getenv('AQUECER_NAVEGADOR', str(self.aquecer_navegador)).lower() == 'true'
+        self.aquecer_login = os.getenv('AQUECER_LOGIN', str(self.aquecer_login)).lower() == 'true'
+        
+        # Chrome de longa duração com depuração remota, reaproveitado entre execuções (0 = desativado)
+        self.chrome_debug_port = int(os.getenv('CHROME_DEBUG_PORT', str(self.chrome_debug_port)))
+        self.chrome_perfil_dir = os.getenv('CHROME_PERFIL_DIR', self.chrome_perfil_dir)
+        
+        # Política de screenshots (off, erros, amostra, sempre) e retenção da pasta logs/screenshots
+        self.screenshots = os.getenv('SCREENSHOTS', self.screenshots).lower()
+        self.screenshots_amostra = int(os.getenv('SCREENSHOTS_AMOSTRA', str(self.screenshots_amostra)))
+        self.screenshots_max_mb = int(os.getenv('SCREENSHOTS_MAX_MB', str(self.screenshots_max_mb)))
+        self.screenshots_max_dias = int(os.getenv('SCREENSHOTS_MAX_DIAS', str(self.screenshots_max_dias)))
+        
+        # Logging assíncrono: nível, rotação dos arquivos e saída JSON-lines
+        self.log_nivel = os.getenv('LOG_NIVEL', self.log_nivel)
+        self.log_max_mb = int(os.getenv('LOG_MAX_MB', str(self.log_max_mb)))
+        self.log_backups = int(os.getenv('LOG_BACKUPS', str(self.log_backups)))
+        self.log_json = os.getenv('LOG_JSON', str(self.log_json)).lower() == 'true'
+        
 
         
         # Criar diretórios se não existirem
@@ -96,6 +182,66 @@ class Settings:
                                 self.data_directory = value
                             elif key == 'LOGS_DIRECTORY':
                                 self.logs_directory = value
+                            elif key == 'INSCRICAO_ENDERECO_URL':
+                                self.inscricao_endereco_url = value
+                            elif key == 'EMITIR_DIRETO':
+                                self.emitir_direto = value.lower() == 'true'
+                            elif key == 'RASCUNHOS_URL':
+                                self.rascunhos_url = value
+                            elif key == 'WORKERS':
+                                self.workers = int(value)
+                            elif key == 'WORKER_CREDENTIALS':
+                                self.worker_credentials = value
+                            elif key == 'ABAS':
+                                self.abas = int(value)
+                            elif key == 'PIPELINE_EMISSAO':
+                                self.pipeline_emissao = value.lower() == 'true'
+                            elif key == 'MOTOR_EMISSAO':
+                                self.motor_emissao = value.lower()
+                            elif key == 'ABRASF_URL':
+                                self.abrasf_url = value
+                            elif key == 'ABRASF_CERTIFICADO':
+                                self.abrasf_certificado = value
+                            elif key == 'ABRASF_SENHA_CERTIFICADO':
+                                self.abrasf_senha_certificado = value
+                            elif key == 'PRESTADOR_CNPJ':
+                                self.prestador_cnpj = value
+                            elif key == 'PRESTADOR_INSCRICAO_MUNICIPAL':
+                                self.prestador_inscricao_municipal = value
+                            elif key == 'CODIGO_MUNICIPIO':
+                                self.codigo_municipio = value
+                            elif key == 'COMANDO_TIMEOUT':
+                                self.comando_timeout = int(value)
+                            elif key == 'PAGE_LOAD_TIMEOUT':
+                                self.page_load_timeout = int(value)
+                            elif key == 'RECICLAR_NAVEGADOR_NOTAS':
+                                self.reciclar_navegador_notas = int(value)
+                            elif key == 'RECICLAR_NAVEGADOR_MB':
+                                self.reciclar_navegador_mb = int(value)
+                            elif key == 'AQUECER_NAVEGADOR':
+                                self.aquecer_navegador = value.lower() == 'true'
+                            elif key == 'AQUECER_LOGIN':
+                                self.aquecer_login = value.lower() == 'true'
+                            elif key == 'CHROME_DEBUG_PORT':
+                                self.chrome_debug_port = int(value)
+                            elif key == 'CHROME_PERFIL_DIR':
+                                self.chrome_perfil_dir = value
+                            elif key == 'SCREENSHOTS':
+                                self.screenshots = value.lower()
+                            elif key == 'SCREENSHOTS_AMOSTRA':
+                                self.screenshots_amostra = int(value)
+                            elif key == 'SCREENSHOTS_MAX_MB':
+                                self.screenshots_max_mb = int(value)
+                            elif key == 'SCREENSHOTS_MAX_DIAS':
+                                self.screenshots_max_dias = int(value)
+                            elif key == 'LOG_NIVEL':
+                                self.log_nivel = value
+                            elif key == 'LOG_MAX_MB':
+                                self.log_max_mb = int(value)
+                            elif key == 'LOG_BACKUPS':
+                                self.log_backups = int(value)
+                            elif key == 'LOG_JSON':
+                                self.log_json = value.lower() == 'true'
 
                 
                 logger.info(f"Configurações carregadas de: {file_path}")
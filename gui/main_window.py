@@ -21,6 +21,12 @@ logger = logging.getLogger(__name__)
 class ModernMainWindow:
     """Janela principal moderna da aplicação"""
     
+    MODO_COMPLETO = "Completo (preencher e emitir)"
+    MODO_FASE_RASCUNHOS = "Fase 1 - Criar rascunhos"
+    MODO_FASE_EMISSAO = "Fase 2 - Emitir rascunhos"
+    MODO_ABRASF = "Lote RPS ABRASF (webservice)"
+    MODOS_LOTE = (MODO_COMPLETO, MODO_FASE_RASCUNHOS, MODO_FASE_EMISSAO, MODO_ABRASF)
+    
     def __init__(self, data_processor, webiss_automation, settings):
         self.data_processor = data_processor
         self.webiss_automation = webiss_automation
@@ -36,6 +42,16 @@ class ModernMainWindow:
         self.processing = False
         self.current_data = None
         self.automation = None
+        self.emitir_direto_lote = False
+        self.estado_thread = threading.local()
+        self.metricas_lock = threading.Lock()
+        self.modo_lote = self.MODO_COMPLETO
+        
+        # Aquecimento do navegador em segundo plano e tempo até a primeira nota
+        self.inicio_app = time.perf_counter()
+        self.inicio_automacao = None
+        self.primeira_nota_registrada = False
+        self.aquecimento_thread = None
         
         # Configurar interface
         self.setup_ui()
@@ -241,6 +257,65 @@ class ModernMainWindow:
                                        variable=self.headless_var)
         headless_check.pack(anchor=tk.W, padx=10, pady=5)
         
+        # Emissão direta (sem rascunho)
+        self.emitir_direto_var = tk.BooleanVar(value=self.settings.emitir_direto)
+        emitir_direto_check = tk.Checkbutton(config_frame,
+                                            text="Emitir direto (sem rascunho)",
+                                            font=('Segoe UI', 10),
+                                            fg='#ecf0f1', bg='#34495e',
+                                            selectcolor='#2c3e50',
+                                            variable=self.emitir_direto_var)
+        emitir_direto_check.pack(anchor=tk.W, padx=10, pady=5)
+        
+        # Pré-preencher a próxima nota enquanto a atual é emitida
+        self.pipeline_var = tk.BooleanVar(value=self.settings.pipeline_emissao)
+        pipeline_check = tk.Checkbutton(config_frame,
+                                       text="Preencher próxima nota durante a emissão (2 abas)",
+                                       font=('Segoe UI', 10),
+                                       fg='#ecf0f1', bg='#34495e',
+                                       selectcolor='#2c3e50',
+                                       variable=self.pipeline_var)
+        pipeline_check.pack(anchor=tk.W, padx=10, pady=5)
+        
+        # Emissão por HTTP, com o Selenium como reserva
+        self.motor_http_var = tk.BooleanVar(value=self.settings.motor_emissao == 'http')
+        motor_http_check = tk.Checkbutton(config_frame,
+                                         text="Emitir via HTTP (Selenium como reserva)",
+                                         font=('Segoe UI', 10),
+                                         fg='#ecf0f1', bg='#34495e',
+                                         selectcolor='#2c3e50',
+                                         variable=self.motor_http_var)
+        motor_http_check.pack(anchor=tk.W, padx=10, pady=5)
+        
+        # Navegadores em paralelo
+        workers_frame = tk.Frame(config_frame, bg='#34495e')
+        workers_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Label(workers_frame, text="Navegadores paralelos:",
+                 font=('Segoe UI', 10),
+                 background='#34495e', foreground='#ecf0f1').pack(side=tk.LEFT)
+        self.num_workers_var = tk.IntVar(value=max(1, self.settings.workers))
+        tk.Spinbox(workers_frame, from_=1, to=8, width=4,
+                   textvariable=self.num_workers_var,
+                   font=('Segoe UI', 10)).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Label(workers_frame, text="Abas por navegador:",
+                 font=('Segoe UI', 10),
+                 background='#34495e', foreground='#ecf0f1').pack(side=tk.LEFT, padx=(15, 0))
+        self.num_abas_var = tk.IntVar(value=max(1, self.settings.abas))
+        tk.Spinbox(workers_frame, from_=1, to=6, width=4,
+                   textvariable=self.num_abas_var,
+                   font=('Segoe UI', 10)).pack(side=tk.LEFT, padx=(5, 0))
+        
+        # Modo do lote (completo ou em duas fases)
+        ttk.Label(config_frame, text="Modo do lote:",
+                 font=('Segoe UI', 10),
+                 background='#34495e', foreground='#ecf0f1').pack(anchor=tk.W, padx=10, pady=(5, 0))
+        self.modo_lote_var = tk.StringVar(value=self.MODOS_LOTE[0])
+        ttk.Combobox(config_frame,
+                     textvariable=self.modo_lote_var,
+                     values=self.MODOS_LOTE,
+                     state='readonly',
+                     font=('Segoe UI', 10)).pack(fill=tk.X, padx=10, pady=5)
+        
     def create_right_panel(self, parent):
         """Cria o painel direito com log e dados"""
         # Abas
@@ -804,15 +879,54 @@ class ModernMainWindow:
             )
             self.license_info_label.config(text="")
     
+    def iniciar_aquecimento(self):
+        """Resolve o driver, abre o Chrome e (opcionalmente) faz login em segundo plano, sem bloquear a interface"""
+        def aquecer():
+            inicio = time.perf_counter()
+            try:
+                automacao = self.webiss_automation(self.settings)
+                if not automacao.setup_driver():
+                    self.log_message("⚠️ Aquecimento: falha ao abrir o navegador (use Conectar WebISS)", "WARNING")
+                    return
+                self.automation = automacao
+                self.log_message(f"🔥 Navegador pronto em {time.perf_counter() - inicio:.1f}s", "INFO")
+                if not (self.settings.aquecer_login and self.settings.username and self.settings.password):
+                    return
+                if automacao.login():
+                    self.update_webiss_status(True)
+                    self.log_message(f"🔥 Sessão do WebISS pronta em {time.perf_counter() - inicio:.1f}s "
+                                     "(desde a abertura: "
+                                     f"{time.perf_counter() - self.inicio_app:.1f}s)", "SUCCESS")
+                else:
+                    self.log_message("⚠️ Aquecimento: login não concluído (use Conectar WebISS)", "WARNING")
+            except Exception as e:
+                self.log_message(f"⚠️ Erro no aquecimento do navegador: {e}", "WARNING")
+        
+        self.log_message("🔥 Aquecendo o navegador em segundo plano...", "INFO")
+        self.aquecimento_thread = threading.Thread(target=aquecer, name="aquecimento", daemon=True)
+        self.aquecimento_thread.start()
+    
+    def aguardar_aquecimento(self):
+        """Espera o aquecimento em andamento (chamado fora da thread da interface)"""
+        if self.aquecimento_thread and self.aquecimento_thread.is_alive():
+            self.log_message("⏳ Aguardando o aquecimento do navegador terminar...", "INFO")
+            self.aquecimento_thread.join()
+    
     def connect_webiss(self):
-        """Conecta ao WebISS"""
+        """Conecta ao WebISS (reaproveitando o navegador aquecido, se houver)"""
         def connect_thread():
             try:
-                self.log_message("Conectando ao WebISS...", "INFO")
-                self.automation = self.webiss_automation(self.settings)
-                if not self.automation.setup_driver():
-                    self.log_message("❌ Falha ao configurar driver", "ERROR")
+                self.aguardar_aquecimento()
+                if self.automation and self.automation.is_logged_in:
+                    self.update_webiss_status(True)
+                    self.log_message("✅ WebISS já conectado (sessão aquecida)", "SUCCESS")
                     return
+                self.log_message("Conectando ao WebISS...", "INFO")
+                if not self.automation or not self.automation.driver:
+                    self.automation = self.webiss_automation(self.settings)
+                    if not self.automation.setup_driver():
+                        self.log_message("❌ Falha ao configurar driver", "ERROR")
+                        return
                 if not self.automation.login():
                     self.log_message("❌ Falha no login", "ERROR")
                     return
@@ -832,11 +946,12 @@ class ModernMainWindow:
         
         self.log_message(f"📊 Dados carregados: {len(self.current_data)} registros", "INFO")
         
-        if not self.automation:
+        aquecendo = self.aquecimento_thread is not None and self.aquecimento_thread.is_alive()
+        if not self.automation and not aquecendo:
             self.log_message("❌ Conecte ao WebISS primeiro!", "ERROR")
             return
         
-        self.log_message("✅ WebISS conectado", "INFO")
+        self.log_message("✅ WebISS conectado" if self.automation else "🔥 WebISS em aquecimento", "INFO")
         
         # Verificar se há boletos selecionados
         self.log_message("🔍 Verificando boletos selecionados...", "INFO")
@@ -869,7 +984,13 @@ class ModernMainWindow:
             try:
                 self.log_message("🔄 Iniciando thread de automação...", "INFO")
                 self.processing = True
+                self.inicio_automacao = time.perf_counter()
                 self.update_ui_state()
+                self.aguardar_aquecimento()
+                if not self.automation or not self.automation.login():
+                    self.log_message("❌ WebISS não conectado - use Conectar WebISS", "ERROR")
+                    return
+                self.update_webiss_status(True)
                 # Processar todos os boletos
                 self.process_all_boletos()
             except Exception as e:
@@ -908,164 +1029,583 @@ class ModernMainWindow:
         
         self.log_message(f"✅ Lista criada com {len(boletos_para_processar)} boletos", "INFO")
         
-        for posicao, (indice_real, row) in enumerate(boletos_para_processar, 1):
-            if not self.processing:  # Verificar se foi interrompido
-                self.log_message("⏹️ Processamento interrompido", "WARNING")
-                break
-            
-            self.log_message(f"=== PROCESSANDO BOLETO {posicao}/{total_boletos} (Índice original: {indice_real}) ===", "INFO")
-            
-            # Processar um boleto
-            success = self.process_single_boleto(row, posicao, total_boletos, indice_real)
-            
-            if success:
-                self.log_message(f"✅ Boleto {posicao} processado com sucesso!", "SUCCESS")
-            else:
-                self.log_message(f"❌ Erro ao processar boleto {posicao}", "ERROR")
-                continue
+        # Emissões indeterminadas de execuções anteriores só voltam depois de conferidas no WebISS
+        boletos_para_processar = self.filtrar_pendentes_verificacao(boletos_para_processar)
+        total_boletos = len(boletos_para_processar)
+        
+        self.automation.inscricao_cache.iniciar_lote()
+        self.automation.ressincronizacoes = 0
+        self.automation.relogins = 0
+        self.automation.reciclagens = 0
+        
+        # Fase 2: emitir a partir da lista de rascunhos do WebISS
+        self.modo_lote = self.modo_lote_var.get()
+        if self.modo_lote == self.MODO_FASE_EMISSAO:
+            self.emitir_rascunhos_lote(boletos_para_processar)
+            return
+        if self.modo_lote == self.MODO_ABRASF:
+            self.emitir_lote_abrasf(boletos_para_processar)
+            return
+        if self.modo_lote == self.MODO_FASE_RASCUNHOS:
+            self.log_message("📝 Fase 1: apenas criando rascunhos (a emissão fica para a fase 2)", "INFO")
+        
+        # Modo de emissão vale para o lote inteiro
+        self.emitir_direto_lote = self.emitir_direto_var.get() and self.modo_lote == self.MODO_COMPLETO
+        self.metricas_emissao = {
+            'direto': {'notas': 0, 'segundos': 0.0},
+            'rascunho': {'notas': 0, 'segundos': 0.0},
+            'fase 1': {'notas': 0, 'segundos': 0.0},
+            'pipeline': {'notas': 0, 'segundos': 0.0},
+            'http': {'notas': 0, 'segundos': 0.0}
+        }
+        if self.emitir_direto_lote:
+            self.log_message("⚡ Lote em modo de emissão direta (rascunho apenas para registros arriscados)", "INFO")
+        
+        # Motor HTTP primeiro; o que ele não emitir segue pelo Selenium
+        if self.motor_http_var.get() and self.modo_lote == self.MODO_COMPLETO:
+            boletos_para_processar = self.processar_via_http(boletos_para_processar)
+            total_boletos = len(boletos_para_processar)
+        
+        num_workers = int(self.num_workers_var.get())
+        num_abas = int(self.num_abas_var.get())
+        if not boletos_para_processar:
+            self.log_message("✅ Nenhum boleto restante para o Selenium", "INFO")
+        elif num_workers > 1:
+            self.processar_em_paralelo(boletos_para_processar, num_workers)
+        elif num_abas > 1:
+            self.processar_em_abas(boletos_para_processar, num_abas)
+        elif self.pipeline_var.get() and self.modo_lote == self.MODO_COMPLETO and total_boletos > 1:
+            self.processar_em_pipeline(boletos_para_processar)
+        else:
+            for posicao, (indice_real, row) in enumerate(boletos_para_processar, 1):
+                if not self.processing:  # Verificar se foi interrompido
+                    self.log_message("⏹️ Processamento interrompido", "WARNING")
+                    break
+                
+                self.log_message(f"=== PROCESSANDO BOLETO {posicao}/{total_boletos} (Índice original: {indice_real}) ===", "INFO")
+                
+                success = self.processar_boleto_medido(self.automation, row, posicao, total_boletos, indice_real)
+                
+                if success:
+                    self.log_message(f"✅ Boleto {posicao} processado com sucesso!", "SUCCESS")
+                else:
+                    self.log_message(f"❌ Erro ao processar boleto {posicao}", "ERROR")
+                    continue
+        
+        for modo, metrica in self.metricas_emissao.items():
+            if metrica['notas']:
+                media = metrica['segundos'] / metrica['notas']
+                self.log_message(
+                    f"📈 Modo {modo}: {metrica['notas']} notas, {media:.1f}s por nota "
+                    f"({60 / media:.1f} notas/min)", "INFO"
+                )
+        
+        if self.automation.reciclagens:
+            self.log_message(f"♻️ Navegador reciclado {self.automation.reciclagens}x no lote", "INFO")
+        if self.automation.relogins:
+            self.log_message(f"🔐 Sessão restabelecida {self.automation.relogins}x no lote", "INFO")
+        if self.automation.ressincronizacoes:
+            self.log_message(f"🧭 Wizard ressincronizado {self.automation.ressincronizacoes}x no lote", "INFO")
+        
+        resumo_cache = self.automation.inscricao_cache.resumo_lote()
+        if resumo_cache['consultas']:
+            self.log_message(
+                f"💾 Cache de inscrições: {resumo_cache['acertos']}/{resumo_cache['consultas']} acertos "
+                f"({resumo_cache['taxa_acerto']:.0%}), {resumo_cache['divergencias']} divergências, "
+                f"{resumo_cache['ausentes']} sem cache", "INFO"
+            )
         
         self.log_message("🎉 Processamento dos boletos selecionados concluído!", "SUCCESS")
     
-    def process_single_boleto(self, row_data, posicao, total_boletos, indice_real=None):
-        """Processa um único boleto"""
+    def processar_boleto_medido(self, automation, row, posicao, total_boletos, indice_real):
+        """Processa um boleto contabilizando comandos WebDriver e tempo por modo de emissão"""
+        automation.profiler.iniciar_boleto(indice_real)
+        inicio_boleto = time.perf_counter()
+        success = self.process_single_boleto(row, posicao, total_boletos, indice_real, automation)
+        automation.profiler.finalizar_boleto(success, {'rss_mb': automation.contabilizar_nota()})
+        if success:
+            with self.metricas_lock:
+                metrica = self.metricas_emissao[self.estado_thread.modo]
+                metrica['notas'] += 1
+                metrica['segundos'] += time.perf_counter() - inicio_boleto
+        return success
+    
+    def processar_em_paralelo(self, boletos_para_processar, num_workers):
+        """Distribui os boletos entre várias sessões do Chrome (uma fila compartilhada)"""
+        import copy
+        from utils.worker_pool import WorkerPool, parse_credenciais
+        
+        credenciais = parse_credenciais(self.settings.worker_credentials)
+        self.log_message(f"🧵 Processando com {num_workers} navegadores em paralelo", "INFO")
+        
+        def criar_automacao(indice):
+            # O primeiro worker reaproveita a sessão já conectada
+            if indice == 0:
+                return self.automation
+            settings_worker = copy.copy(self.settings)
+            if indice < len(credenciais):
+                settings_worker.username, settings_worker.password = credenciais[indice]
+            if self.settings.chrome_debug_port:
+                # Cada navegador do pool anexa ao próprio Chrome de longa duração (porta e perfil próprios)
+                perfil_base = self.settings.chrome_perfil_dir or os.path.join(self.settings.data_directory, 'chrome_perfil')
+                settings_worker.chrome_debug_port = self.settings.chrome_debug_port + indice
+                settings_worker.chrome_perfil_dir = os.path.join(perfil_base, f'navegador{indice + 1}')
+            automacao = self.webiss_automation(settings_worker)
+            # Caches compartilhados entre as sessões (thread-safe)
+            automacao.selector_cache = self.automation.selector_cache
+            automacao.inscricao_cache = self.automation.inscricao_cache
+            if not automacao.setup_driver() or not automacao.login():
+                self.log_message(f"❌ Navegador {indice + 1}: falha ao conectar", "ERROR")
+                automacao.close()
+                return None
+            self.log_message(f"✅ Navegador {indice + 1} conectado", "SUCCESS")
+            return automacao
+        
+        def processar(automacao, item, posicao, ha_proximo):
+            indice_real, row = item
+            self.log_message(f"=== [{threading.current_thread().name}] BOLETO {indice_real}: "
+                             f"{row.get('nome_cliente', 'N/A')} ===", "INFO")
+            return self.processar_boleto_medido(
+                automacao, row, posicao, posicao + 1 if ha_proximo else posicao, indice_real
+            )
+        
+        def encerrar(indice, automacao):
+            if automacao is not self.automation:
+                automacao.close()
+        
+        pool = WorkerPool(num_workers, criar_automacao, processar,
+                          continuar=lambda: self.processing, encerrar_automacao=encerrar)
+        resumo = pool.executar(boletos_para_processar)
+        
+        for resultado in resumo['resultados']:
+            if not resultado['sucesso']:
+                indice_real, row = resultado['item']
+                self.log_message(f"❌ Erro no boleto {indice_real} ({row.get('nome_cliente', 'N/A')}) "
+                                 f"- navegador {resultado['worker']}", "ERROR")
+        self.log_message(f"📊 Pool: {resumo['sucesso']} sucesso, {resumo['falha']} falha, "
+                         f"{resumo['nao_processados']} não processados", "INFO")
+    
+    def processar_em_abas(self, boletos_para_processar, num_abas):
+        """Processa os boletos em várias abas da sessão já conectada (um wizard por aba)"""
+        import queue
+        from utils.tab_scheduler import AgendadorAbas
+        
+        fila = queue.Queue()
+        for item in boletos_para_processar:
+            fila.put(item)
+        contagem = {'sucesso': 0, 'falha': 0}
+        
+        agendador = AgendadorAbas(self.automation.driver)
+        handles = agendador.abrir_abas(num_abas, url=self.automation.driver.current_url)
+        self.log_message(f"🗂️ Processando com {len(handles)} abas na mesma sessão", "INFO")
+        
+        def tarefa_aba(numero):
+            automacao = self.automation.criar_sessao_aba(agendador)
+            posicao = 0
+            while self.processing:
+                try:
+                    indice_real, row = fila.get_nowait()
+                except queue.Empty:
+                    break
+                posicao += 1
+                self.log_message(f"=== [aba {numero}] BOLETO {indice_real}: {row.get('nome_cliente', 'N/A')} ===", "INFO")
+                success = self.processar_boleto_medido(
+                    automacao, row, posicao, posicao + 1 if not fila.empty() else posicao, indice_real
+                )
+                with self.metricas_lock:
+                    contagem['sucesso' if success else 'falha'] += 1
+                if not success:
+                    self.log_message(f"❌ [aba {numero}] Erro ao processar boleto {indice_real}", "ERROR")
+            return posicao
+        
         try:
-            import time
-            # Preparar dados do boleto
-            test_data = row_data.to_dict()
-            
-            # Log do índice real para debug
-            if indice_real is not None:
-                self.log_message(f"📋 Processando boleto com índice original: {indice_real}", "INFO")
+            agendador.executar({
+                handle: (lambda numero=numero: tarefa_aba(numero))
+                for numero, handle in enumerate(handles, 1)
+            })
+        finally:
+            agendador.fechar_abas(handles)
+        
+        self.log_message(f"📊 Abas: {contagem['sucesso']} sucesso, {contagem['falha']} falha, "
+                         f"{fila.qsize()} não processados, {agendador.trocas} trocas de aba", "INFO")
+    
+    def processar_via_http(self, boletos_para_processar):
+        """
+        Emite os boletos pelo motor HTTP, reaproveitando os cookies do login do Selenium
+        
+        Returns:
+            Boletos que devem seguir pelo Selenium (registros arriscados e falhas do motor HTTP)
+        """
+        from utils.http_engine import MotorHTTP
+        
+        motor = MotorHTTP(self.settings, inscricao_cache=self.automation.inscricao_cache)
+        if not motor.importar_cookies(self.automation.driver):
+            self.log_message("⚠️ Motor HTTP indisponível - usando o Selenium para todos os boletos", "WARNING")
+            return boletos_para_processar
+        
+        self.log_message("🌐 Emitindo pelo motor HTTP (Selenium como reserva)", "INFO")
+        restantes = []
+        indeterminados = 0
+        for indice_real, row in boletos_para_processar:
+            if not self.processing:
+                self.log_message("⏹️ Processamento interrompido", "WARNING")
+                return []
+            if motor.desativado:
+                # Recusas seguidas: endpoint ou campos de motor_http.json não batem com o WebISS
+                restantes.append((indice_real, row))
+                continue
+            processed_data = self.preparar_dados_boleto(row)
+            motivos_risco = self.motivos_risco(processed_data)
+            if motivos_risco:
+                # Registros arriscados passam pelo wizard, com rascunho
+                self.log_message(f"⚠️ Boleto {indice_real} arriscado ({', '.join(motivos_risco)}) - fica para o Selenium", "WARNING")
+                restantes.append((indice_real, row))
+                continue
             
-            # Extrair turma do campo descrição
-            turma = ''
-            if 'descricao' in test_data and test_data['descricao']:
-                import re
-                turma_match = re.search(r'TURMA:\s*([A-Z0-9]+)', test_data['descricao'])
-                if turma_match:
-                    turma = turma_match.group(1)
+            inicio = time.perf_counter()
+            nota = motor.emitir(processed_data)
+            if not nota:
+                # None: o post de emissão não foi enviado ou foi recusado, o Selenium pode tentar
+                self.log_message(f"⚠️ Boleto {indice_real}: motor HTTP falhou - fica para o Selenium", "WARNING")
+                restantes.append((indice_real, row))
+                if motor.desativado:
+                    self.log_message(f"⚠️ Motor HTTP desativado após {motor.recusas_seguidas} recusas seguidas "
+                                     f"(confira motor_http.json) - restante do lote pelo Selenium", "WARNING")
+                continue
+            if nota.get('indeterminado'):
+                # O post foi enviado: reemitir pelo Selenium poderia duplicar a NFS-e
+                self.registrar_verificacao_manual(processed_data, nota, indice_real)
+                indeterminados += 1
+                continue
+            self.registrar_nota_emitida(processed_data, nota, indice_real)
+            with self.metricas_lock:
+                self.metricas_emissao['http']['notas'] += 1
+                self.metricas_emissao['http']['segundos'] += time.perf_counter() - inicio
+            self.log_message(f"✅ Boleto {indice_real}: nota {nota['numero'] or 'sem número'} emitida via HTTP", "SUCCESS")
+        
+        self.log_message(f"📊 Motor HTTP: {len(boletos_para_processar) - len(restantes) - indeterminados} emitidas, "
+                         f"{indeterminados} a verificar, {len(restantes)} para o Selenium", "INFO")
+        return restantes
+    
+    def processar_em_pipeline(self, boletos_para_processar):
+        """
+        Processa os boletos em duas abas: enquanto uma nota é emitida, a próxima é preenchida na outra aba
+        
+        A aba que emitiu só recebe o foco de volta para confirmar o resultado,
+        depois que a nota seguinte já está pronta para emitir. Cada nota tem o
+        seu próprio perfil (do preenchimento à confirmação), e a sessão e a
+        reciclagem do navegador são conferidas antes de preencher cada aba.
+        """
+        from utils.tab_scheduler import AgendadorAbas
+        
+        automation = self.automation
+        agendador = AgendadorAbas(automation.driver)
+        handles = agendador.abrir_abas(2, url=automation.driver.current_url)
+        self.log_message("🔀 Pipeline: preenchendo a próxima nota enquanto a atual é emitida", "INFO")
+        
+        usadas = set()
+        sujas = set()
+        em_voo = None  # (aba, contexto da emissão, dados, índice original, perfil suspenso)
+        ultimo_fim = time.perf_counter()
+        contagem = {'sucesso': 0, 'falha': 0}
+        
+        def fechar_perfil(sucesso):
+            automation.profiler.finalizar_boleto(sucesso, {'rss_mb': automation.contabilizar_nota()})
+        
+        def confirmar(emissao):
+            nonlocal ultimo_fim
+            aba, contexto, dados, indice_real, perfil = emissao
+            # Os comandos da confirmação contam para o boleto emitido, não para o que está sendo preenchido
+            atual = automation.profiler.suspender_boleto()
+            automation.profiler.retomar_boleto(perfil)
+            agendador.focar(aba)
+            nota = automation.confirmar_emissao(contexto)
+            emitida = bool(nota) and self.registrar_nota_emitida(dados, nota, indice_real)
+            fechar_perfil(emitida)
+            automation.profiler.retomar_boleto(atual)
+            if emitida:
+                agora = time.perf_counter()
+                with self.metricas_lock:
+                    self.metricas_emissao['pipeline']['notas'] += 1
+                    self.metricas_emissao['pipeline']['segundos'] += agora - ultimo_fim
+                ultimo_fim = agora
+                contagem['sucesso'] += 1
+                self.log_message(f"✅ Boleto {indice_real}: nota emitida ({dados['nome_cliente']})", "SUCCESS")
+            else:
+                contagem['falha'] += 1
+                if not nota:
+                    self.log_message(f"❌ Boleto {indice_real}: falha ao emitir nota fiscal", "ERROR")
+        
+        try:
+            for posicao, (indice_real, row) in enumerate(boletos_para_processar, 1):
+                if not self.processing:
+                    self.log_message("⏹️ Processamento interrompido", "WARNING")
+                    break
+                
+                # Preencher na aba que não está com emissão em andamento
+                aba = handles[0] if em_voo is None or em_voo[0] != handles[0] else handles[1]
+                agendador.focar(aba)
+                self.log_message(f"=== PIPELINE {posicao}/{len(boletos_para_processar)} (Índice original: {indice_real}) ===", "INFO")
+                
+                # Navegador e sessão conferidos antes de cada nota, como no processamento sequencial.
+                # A emissão em andamento é confirmada antes de trocar o navegador ou refazer o login.
+                motivo = automation.motivo_reciclagem()
+                if motivo or not automation.sessao_ativa():
+                    if em_voo:
+                        confirmar(em_voo)
+                        em_voo = None
+                    if motivo:
+                        pronto = automation.reciclar_navegador(motivo)
+                        if pronto:
+                            agendador = AgendadorAbas(automation.driver)
+                            handles = agendador.abrir_abas(2, url=automation.driver.current_url)
+                            aba = handles[0]
+                    else:
+                        pronto = automation.reconectar()
+                    if not pronto:
+                        contagem['falha'] += 1
+                        self.log_message(f"❌ Boleto {indice_real}: sessão do WebISS indisponível", "ERROR")
+                        continue
+                    # Todas as abas recomeçam de um wizard limpo
+                    usadas = set(handles)
+                    sujas = set(handles)
+                    agendador.focar(aba)
+                
+                automation.profiler.iniciar_boleto(indice_real)
+                processed_data = self.preparar_dados_boleto(row)
+                if aba in sujas:
+                    aberto = automation.ressincronizar_wizard()
+                elif aba in usadas:
+                    aberto = automation.navegar_para_proxima_nota()
+                else:
+                    aberto = automation.navigate_to_new_nfse()
+                usadas.add(aba)
+                preenchido = (aberto and self.preencher_nota(automation, processed_data)
+                              and self.salvar_rascunho_conforme_risco(automation, processed_data))
+                # Aba com wizard pela metade é ressincronizada antes da próxima nota
+                if preenchido:
+                    sujas.discard(aba)
+                else:
+                    sujas.add(aba)
+                
+                # Só agora voltar à aba anterior para confirmar a emissão em andamento
+                if em_voo:
+                    confirmar(em_voo)
+                    em_voo = None
+                
+                if not preenchido:
+                    fechar_perfil(False)
+                    contagem['falha'] += 1
+                    self.log_message(f"❌ Erro ao preencher boleto {indice_real}", "ERROR")
+                    continue
+                
+                agendador.focar(aba)
+                self.log_message("🚀 Disparando emissão (a próxima nota será preenchida em paralelo)...", "INFO")
+                contexto = automation.disparar_emissao()
+                if contexto is None:
+                    fechar_perfil(False)
+                    sujas.add(aba)
+                    contagem['falha'] += 1
+                    self.log_message(f"❌ Boleto {indice_real}: falha ao emitir nota fiscal", "ERROR")
+                    continue
+                em_voo = (aba, contexto, processed_data, indice_real, automation.profiler.suspender_boleto())
             
-            # Preparar dados para o teste
-            processed_data = {
-                'cpf_cnpj': test_data.get('cpf_cnpj', '').replace('.', '').replace('-', ''),
-                'nome_cliente': test_data.get('nome_cliente', ''),
-                'endereco': test_data.get('endereco', ''),
-                'valor': test_data.get('valor', ''),
-                'vencimento': test_data.get('vencimento', ''),
-                'descricao': test_data.get('descricao', ''),
-                'turma': turma
-            }
+            if em_voo:
+                confirmar(em_voo)
+        finally:
+            # Boleto interrompido por exceção no meio do preenchimento
+            automation.profiler.finalizar_boleto(False)
+            agendador.fechar_abas(handles)
+        
+        self.log_message(f"📊 Pipeline: {contagem['sucesso']} sucesso, {contagem['falha']} falha", "INFO")
+    
+    def preparar_dados_boleto(self, row_data):
+        """Monta os dados do formulário (turma, CEP, CNAE) a partir da linha do CSV"""
+        # Preparar dados do boleto
+        test_data = row_data.to_dict()
+        
+        # Extrair turma do campo descrição
+        turma = ''
+        if 'descricao' in test_data and test_data['descricao']:
+            import re
+            turma_match = re.search(r'TURMA:\s*([A-Z0-9]+)', test_data['descricao'])
+            if turma_match:
+                turma = turma_match.group(1)
+        
+        # Preparar dados para o teste
+        processed_data = {
+            'cpf_cnpj': test_data.get('cpf_cnpj', '').replace('.', '').replace('-', ''),
+            'nome_cliente': test_data.get('nome_cliente', ''),
+            'endereco': test_data.get('endereco', ''),
+            'valor': test_data.get('valor', ''),
+            'vencimento': test_data.get('vencimento', ''),
+            'descricao': test_data.get('descricao', ''),
+            'turma': turma,
+            'cnae': test_data.get('cnae', ''),
+            'atividade': test_data.get('atividade', '')
+        }
+        
+        # Extrair CEP do endereço se disponível (múltiplas estratégias)
+        if 'endereco' in processed_data and processed_data['endereco']:
+            import re
             
-            # Extrair CEP do endereço se disponível (múltiplas estratégias)
-            if 'endereco' in processed_data and processed_data['endereco']:
-                import re
-                
-                # Estratégia 1: CEP no formato padrão (5 dígitos + hífen + 3 dígitos)
-                cep_match = re.search(r'(\d{5})-?(\d{3})', processed_data['endereco'])
+            # Estratégia 1: CEP no formato padrão (5 dígitos + hífen + 3 dígitos)
+            cep_match = re.search(r'(\d{5})-?(\d{3})', processed_data['endereco'])
+            if cep_match:
+                processed_data['cep'] = f"{cep_match.group(1)}-{cep_match.group(2)}"
+                self.log_message(f"✅ CEP extraído do endereço: {processed_data['cep']}", "INFO")
+            else:
+                # Estratégia 2: CEP sem hífen (8 dígitos consecutivos)
+                cep_match = re.search(r'(\d{8})', processed_data['endereco'])
                 if cep_match:
-                    processed_data['cep'] = f"{cep_match.group(1)}-{cep_match.group(2)}"
-                    self.log_message(f"✅ CEP extraído do endereço: {processed_data['cep']}", "INFO")
+                    cep = cep_match.group(1)
+                    processed_data['cep'] = f"{cep[:5]}-{cep[5:]}"
+                    self.log_message(f"✅ CEP extraído do endereço (sem hífen): {processed_data['cep']}", "INFO")
                 else:
-                    # Estratégia 2: CEP sem hífen (8 dígitos consecutivos)
-                    cep_match = re.search(r'(\d{8})', processed_data['endereco'])
+                    # Estratégia 3: Buscar CEP em qualquer lugar do texto
+                    cep_match = re.search(r'(\d{5})[.\-\s]*(\d{3})', processed_data['endereco'])
                     if cep_match:
-                        cep = cep_match.group(1)
-                        processed_data['cep'] = f"{cep[:5]}-{cep[5:]}"
-                        self.log_message(f"✅ CEP extraído do endereço (sem hífen): {processed_data['cep']}", "INFO")
+                        processed_data['cep'] = f"{cep_match.group(1)}-{cep_match.group(2)}"
+                        self.log_message(f"✅ CEP extraído do endereço (padrão alternativo): {processed_data['cep']}", "INFO")
                     else:
-                        # Estratégia 3: Buscar CEP em qualquer lugar do texto
-                        cep_match = re.search(r'(\d{5})[.\-\s]*(\d{3})', processed_data['endereco'])
-                        if cep_match:
-                            processed_data['cep'] = f"{cep_match.group(1)}-{cep_match.group(2)}"
-                            self.log_message(f"✅ CEP extraído do endereço (padrão alternativo): {processed_data['cep']}", "INFO")
-                        else:
-                            self.log_message(f"⚠️ CEP não encontrado no endereço: {processed_data['endereco']}", "WARNING")
-                            # Tentar extrair do texto completo se disponível
-                            if 'descricao' in processed_data and processed_data['descricao']:
-                                cep_match = re.search(r'(\d{5})-?(\d{3})', processed_data['descricao'])
-                                if cep_match:
-                                    processed_data['cep'] = f"{cep_match.group(1)}-{cep_match.group(2)}"
-                                    self.log_message(f"✅ CEP extraído da descrição: {processed_data['cep']}", "INFO")
+                        self.log_message(f"⚠️ CEP não encontrado no endereço: {processed_data['endereco']}", "WARNING")
+                        # Tentar extrair do texto completo se disponível
+                        if 'descricao' in processed_data and processed_data['descricao']:
+                            cep_match = re.search(r'(\d{5})-?(\d{3})', processed_data['descricao'])
+                            if cep_match:
+                                processed_data['cep'] = f"{cep_match.group(1)}-{cep_match.group(2)}"
+                                self.log_message(f"✅ CEP extraído da descrição: {processed_data['cep']}", "INFO")
+        else:
+            self.log_message("⚠️ Endereço não disponível para extrair CEP", "WARNING")
+        
+        # Log dos dados processados para debug
+        self.log_message(f"Dados processados: {processed_data}", "INFO")
+        
+        self.log_message(f"Processando: {processed_data['nome_cliente']}", "INFO")
+        
+        return processed_data
+    
+    def preencher_nota(self, automation, processed_data):
+        """Preenche Tomador, Serviços e Valores do wizard já aberto (cada etapa com uma nova tentativa)"""
+        from utils.wizard_state import ESTADO_PASSO_2, ESTADO_PASSO_3, ESTADO_PASSO_4
+        
+        def avancar_apos_servicos():
+            # Aguardar a página processar os campos preenchidos antes de avançar
+            automation.waits.aguardar_ajax_ocioso()
+            return automation.click_proximo()
+        
+        etapas = [
+            ("Preenchimento do tomador (Step 2)", lambda: automation.fill_nfse_form(processed_data),
+             ESTADO_PASSO_2, None),
+            ("Avanço para Step 3", automation.click_proximo, ESTADO_PASSO_2, ESTADO_PASSO_3),
+            ("Preenchimento dos serviços (Step 3)", lambda: automation.fill_nfse_servicos_sem_scroll(processed_data),
+             ESTADO_PASSO_3, None),
+            ("Avanço para Step 4", avancar_apos_servicos, ESTADO_PASSO_3, ESTADO_PASSO_4),
+            ("Preenchimento dos valores (Step 4)", lambda: automation.fill_nfse_valores(processed_data),
+             ESTADO_PASSO_4, None),
+        ]
+        for descricao, acao, estado, destino in etapas:
+            self.log_message(f"=== {descricao.upper()} ===", "INFO")
+            if not automation.executar_etapa(descricao, acao, estado, destino):
+                self.log_message(f"❌ Falha: {descricao}", "ERROR")
+                return False
+        return True
+    
+    def salvar_rascunho_conforme_risco(self, automation, processed_data):
+        """Salva o rascunho, a menos que o lote emita direto e o registro seja seguro"""
+        motivos_risco = self.motivos_risco(processed_data)
+        emitir_direto = self.emitir_direto_lote and not motivos_risco
+        self.estado_thread.modo = 'direto' if emitir_direto else 'rascunho'
+        if emitir_direto:
+            self.log_message("⚡ Emitindo direto, sem salvar rascunho", "INFO")
+            return True
+        if self.emitir_direto_lote:
+            self.log_message(f"⚠️ Registro arriscado ({', '.join(motivos_risco)}) - salvando rascunho antes", "WARNING")
+        self.log_message("💾 Salvando rascunho da nota...", "INFO")
+        if not automation.salvar_rascunho():
+            self.log_message("❌ Falha ao salvar rascunho", "ERROR")
+            return False
+        return True
+    
+    def process_single_boleto(self, row_data, posicao, total_boletos, indice_real=None, automation=None):
+        """Processa um único boleto (na automação informada ou na sessão principal)"""
+        automation = automation or self.automation
+        success = self.processar_boleto_no_wizard(row_data, posicao, total_boletos, indice_real, automation)
+        if not success and posicao < total_boletos and self.processing:
+            # Deixar um wizard limpo para o próximo boleto, em vez de propagar a falha
+            self.log_message("🧭 Ressincronizando wizard para o próximo boleto...", "WARNING")
+            # Navegador encerrado pelo watchdog: relançar em vez de tentar usar o driver morto
+            pronto = automation.verificar_reciclagem() if automation.travado else automation.ressincronizar_wizard()
+            if pronto:
+                self.log_message("✅ Wizard pronto para o próximo boleto", "SUCCESS")
             else:
-                self.log_message("⚠️ Endereço não disponível para extrair CEP", "WARNING")
+                self.log_message("❌ Falha ao ressincronizar o wizard", "ERROR")
+        return success
+    
+    def processar_boleto_no_wizard(self, row_data, posicao, total_boletos, indice_real, automation):
+        """Percorre o wizard para um boleto: preencher, salvar/emitir e preparar a próxima nota"""
+        from utils.wizard_state import ESTADO_PASSO_2, ESTADO_DESCONHECIDO
+        
+        self.estado_thread.modo = 'rascunho'
+        try:
+            # Sessão expirada durante o lote: novo login e wizard limpo, sem intervenção
+            if not automation.garantir_sessao():
+                self.log_message("❌ Sessão do WebISS expirada e não foi possível reconectar", "ERROR")
+                return False
             
-            # Log dos dados processados para debug
-            self.log_message(f"Dados processados: {processed_data}", "INFO")
+            # Log do índice real para debug
+            if indice_real is not None:
+                self.log_message(f"📋 Processando boleto com índice original: {indice_real}", "INFO")
             
-            self.log_message(f"Processando: {processed_data['nome_cliente']}", "INFO")
+            processed_data = self.preparar_dados_boleto(row_data)
             
             # Navegar para nova NFSe apenas no primeiro boleto
             if posicao == 1:  # Primeiro boleto
                 self.log_message("🔄 Primeiro boleto - navegando para nova NFSe...", "INFO")
-                if not self.automation.navigate_to_new_nfse():
+                if not automation.navigate_to_new_nfse():
                     self.log_message("❌ Falha ao navegar para nova NFSe", "ERROR")
                     return False
-                time.sleep(1)  # Aguardar carregamento completo
             else:
-                self.log_message(f"🔄 Boleto {posicao} - usando nota já criada...", "INFO")
-                # Para os demais boletos, não navegar aqui - apenas após emitir a nota anterior
+                # Os demais usam a nota preparada após a anterior, se a página estiver mesmo no Tomador
+                estado = automation.estado_pagina()['estado']
+                if estado in (ESTADO_PASSO_2, ESTADO_DESCONHECIDO):
+                    self.log_message(f"🔄 Boleto {posicao} - usando nota já criada...", "INFO")
+                else:
+                    self.log_message(f"🧭 Boleto {posicao} - página em '{estado}', ressincronizando wizard...", "WARNING")
+                    if not automation.ressincronizar_wizard():
+                        self.log_message("❌ Falha ao ressincronizar o wizard", "ERROR")
+                        return False
 
-            # Preencher formulário do tomador (Step 2)
-            self.log_message("=== PREENCHENDO STEP 2 - TOMADOR ===", "INFO")
-            if not self.automation.fill_nfse_form(processed_data):
-                self.log_message("❌ Falha ao preencher formulário do tomador", "ERROR")
-                return False
-            
-            # Avançar para Step 3
-            self.log_message("=== AVANÇANDO PARA STEP 3 ===", "INFO")
-            if not self.automation.click_proximo():
-                self.log_message("❌ Falha ao avançar para Step 3", "ERROR")
-                return False
-            
-            # Aguardar carregamento do Step 3
-            time.sleep(1)
-            
-            # Preencher Step 3 usando a função sem scroll
-            self.log_message("=== PREENCHENDO STEP 3 SEM SCROLL ===", "INFO")
-            if not self.automation.fill_nfse_servicos_sem_scroll(processed_data):
-                self.log_message("❌ Falha ao preencher Step 3 sem scroll", "ERROR")
-                return False
-            
-            # Aguardar um pouco para garantir que tudo foi processado
-            time.sleep(1)
-            
-            # Avançar para Step 4
-            self.log_message("=== AVANÇANDO PARA STEP 4 ===", "INFO")
-            if not self.automation.click_proximo():
-                self.log_message("❌ Falha ao avançar para Step 4", "ERROR")
-                return False
-            
-            # Aguardar carregamento do Step 4
-            time.sleep(1)
-            
-            # Preencher Step 4 (valores)
-            self.log_message("=== PREENCHENDO STEP 4 - VALORES ===", "INFO")
-            if not self.automation.fill_nfse_valores(processed_data):
-                self.log_message("❌ Falha ao preencher Step 4", "ERROR")
+            if not self.preencher_nota(automation, processed_data):
                 return False
 
-            # Clicar em Salvar rascunho
-            self.log_message("💾 Salvando rascunho da nota...", "INFO")
-            if not self.automation.salvar_rascunho():
-                self.log_message("❌ Falha ao salvar rascunho", "ERROR")
+            if not self.salvar_rascunho_conforme_risco(automation, processed_data):
                 return False
 
-            # Aguardar um pouco para o rascunho ser salvo
-            time.sleep(2)
+            # Fase 1: parar no rascunho e seguir para a próxima nota
+            if self.modo_lote == self.MODO_FASE_RASCUNHOS:
+                self.log_message("📝 Rascunho criado - emissão na fase 2", "SUCCESS")
+                self.estado_thread.modo = 'fase 1'
+                if posicao < total_boletos:
+                    if not automation.navegar_para_proxima_nota():
+                        self.log_message("❌ Falha ao preparar próxima nota", "ERROR")
+                        return False
+                return True
 
             # Clicar em Emitir nota fiscal
             self.log_message("🚀 Emitindo nota fiscal...", "INFO")
-            if not self.automation.emitir_nota_fiscal():
+            nota = automation.emitir_nota_fiscal()
+            if not nota:
                 self.log_message("❌ Falha ao emitir nota fiscal", "ERROR")
                 return False
-
-            # Aguardar emissão da nota
-            time.sleep(3)
+            if not self.registrar_nota_emitida(processed_data, nota, indice_real):
+                # Emissão indeterminada: não conta como sucesso; o wizard é ressincronizado
+                return False
 
             # Clicar em "Criar" para preparar a próxima nota (apenas se não for o último boleto)
             if posicao < total_boletos:  # Se não for o último boleto
                 self.log_message("🔄 Preparando próxima nota...", "INFO")
-                if not self.automation.navegar_para_proxima_nota():
+                if not automation.navegar_para_proxima_nota():
                     self.log_message("❌ Falha ao preparar próxima nota", "ERROR")
                     return False  # Falhar se não conseguir preparar próxima nota
                 self.log_message("✅ Próxima nota preparada", "SUCCESS")
@@ -1077,6 +1617,217 @@ class ModernMainWindow:
             return False
 
     
+    def emitir_lote_abrasf(self, boletos_para_processar):
+        """Emite os boletos em lotes RPS pelo webservice ABRASF e associa as NFS-e retornadas aos boletos"""
+        from utils.abrasf import ClienteABRASF
+        
+        if not self.settings.abrasf_url or not self.settings.prestador_cnpj:
+            self.log_message("❌ Configure ABRASF_URL e PRESTADOR_CNPJ no .env para usar o lote ABRASF", "ERROR")
+            return
+        
+        boletos = []
+        for indice_real, row in boletos_para_processar:
+            processed_data = self.preparar_dados_boleto(row)
+            motivos_risco = self.motivos_risco(processed_data)
+            if motivos_risco:
+                self.log_message(f"⚠️ Boleto {indice_real} fora do lote ({', '.join(motivos_risco)})", "WARNING")
+                continue
+            processed_data['indice'] = indice_real
+            boletos.append(processed_data)
+        if not boletos:
+            self.log_message("❌ Nenhum boleto válido para o lote ABRASF", "ERROR")
+            return
+        
+        self.log_message(f"📨 Enviando {len(boletos)} RPS ao webservice ABRASF...", "INFO")
+        inicio = time.perf_counter()
+        resultado = ClienteABRASF(self.settings).emitir(boletos)
+        
+        for boleto, nota in resultado['emitidas']:
+            self.registrar_nota_emitida(boleto, nota, boleto['indice'])
+        for boleto, motivo in resultado['falhas']:
+            self.log_message(f"❌ Boleto {boleto['indice']} ({boleto['nome_cliente']}): {motivo}", "ERROR")
+        # Lote enviado sem resultado: não reenviar (geraria outra NFS-e) antes de conferir no WebISS
+        for boleto, nota in resultado['indeterminadas']:
+            self.registrar_verificacao_manual(boleto, nota, boleto['indice'])
+        
+        duracao = time.perf_counter() - inicio
+        self.log_message(f"🎉 Lote ABRASF: {len(resultado['emitidas'])} notas emitidas, "
+                         f"{len(resultado['falhas'])} falhas, {len(resultado['indeterminadas'])} a verificar "
+                         f"em {duracao:.0f}s", "SUCCESS")
+    
+    def emitir_rascunhos_lote(self, boletos_para_processar):
+        """Fase 2: emite, a partir da lista de rascunhos do WebISS, os rascunhos dos boletos selecionados"""
+        from utils.conciliacao_rascunhos import conciliar_rascunhos
+        
+        self.log_message("🧾 Fase 2: lendo a lista de rascunhos do WebISS...", "INFO")
+        rascunhos = self.automation.listar_rascunhos()
+        if not rascunhos:
+            self.log_message("❌ Nenhum rascunho encontrado na lista", "ERROR")
+            return
+        
+        boletos = []
+        for indice_real, row in boletos_para_processar:
+            dados = row.to_dict()
+            boletos.append({
+                'indice': indice_real,
+                'nome_cliente': dados.get('nome_cliente', ''),
+                'cpf_cnpj': str(dados.get('cpf_cnpj', '')).replace('.', '').replace('-', ''),
+                'valor': dados.get('valor', '')
+            })
+        
+        pares, sem_rascunho = conciliar_rascunhos(boletos, rascunhos)
+        for boleto in sem_rascunho:
+            self.log_message(f"⚠️ Sem rascunho para {boleto['nome_cliente']} (R$ {boleto['valor']})", "WARNING")
+        self.log_message(f"🔗 {len(pares)} rascunhos conciliados com os boletos selecionados", "INFO")
+        
+        inicio_fase = time.perf_counter()
+        emitidas = 0
+        for posicao, (boleto, rascunho) in enumerate(pares, 1):
+            if not self.processing:
+                self.log_message("⏹️ Processamento interrompido", "WARNING")
+                break
+            
+            self.log_message(f"=== EMITINDO RASCUNHO {posicao}/{len(pares)}: {boleto['nome_cliente']} ===", "INFO")
+            self.automation.profiler.iniciar_boleto(boleto['indice'])
+            nota = self.automation.emitir_rascunho(rascunho)
+            emitida = bool(nota) and self.registrar_nota_emitida(boleto, nota, boleto['indice'])
+            self.automation.profiler.finalizar_boleto(emitida)
+            if emitida:
+                emitidas += 1
+            elif not nota:
+                self.log_message(f"❌ Falha ao emitir rascunho de {boleto['nome_cliente']}", "ERROR")
+        
+        if emitidas:
+            media = (time.perf_counter() - inicio_fase) / emitidas
+            self.log_message(f"📈 Fase 2: {emitidas} notas, {media:.1f}s por nota ({60 / media:.1f} notas/min)", "INFO")
+        self.log_message("🎉 Emissão dos rascunhos concluída!", "SUCCESS")
+    
+    def motivos_risco(self, processed_data):
+        """Lista os motivos que tornam o registro arriscado para emissão direta (vazia = seguro)"""
+        import re
+        motivos = []
+        if not str(processed_data.get('nome_cliente') or '').strip():
+            motivos.append('sem nome')
+        if len(re.sub(r'\D', '', str(processed_data.get('cpf_cnpj') or ''))) not in (11, 14):
+            motivos.append('CPF/CNPJ inválido')
+        if not processed_data.get('cep'):
+            motivos.append('sem CEP')
+        for campo in ('cnae', 'atividade'):
+            if str(processed_data.get(campo) or '').strip().lower() in ('', 'nan'):
+                motivos.append(f'sem {campo}')
+        try:
+            if float(str(processed_data.get('valor') or '0').replace(',', '.')) <= 0:
+                motivos.append('valor zerado')
+        except ValueError:
+            motivos.append('valor inválido')
+        return motivos
+    
+    def registrar_nota_emitida(self, processed_data, nota, indice_real=None):
+        """
+        Acrescenta a nota emitida (número e código de verificação) em notas_emitidas.csv
+        
+        Returns:
+            True se a nota conta como emitida; False para emissão indeterminada,
+            que vai para notas_verificar.csv em vez do registro de notas emitidas
+        """
+        if nota.get('indeterminado'):
+            self.registrar_verificacao_manual(processed_data, nota, indice_real)
+            return False
+        try:
+            import csv
+            caminho = os.path.join(self.get_app_base_path(), 'notas_emitidas.csv')
+            novo_arquivo = not os.path.exists(caminho)
+            with open(caminho, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f, delimiter=';')
+                if novo_arquivo:
+                    writer.writerow(['data_hora', 'indice', 'nome_cliente', 'cpf_cnpj', 'valor',
+                                     'numero_nfse', 'codigo_verificacao', 'confirmado', 'url'])
+                writer.writerow([
+                    datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    indice_real if indice_real is not None else '',
+                    processed_data.get('nome_cliente', ''),
+                    processed_data.get('cpf_cnpj', ''),
+                    processed_data.get('valor', ''),
+                    nota.get('numero') or '',
+                    nota.get('codigo_verificacao') or '',
+                    'sim' if nota.get('confirmado') else 'nao',
+                    nota.get('url') or ''
+                ])
+            self.registrar_tempo_primeira_nota()
+            if nota.get('numero'):
+                self.log_message(f"🧾 NFS-e nº {nota['numero']} (verificação: {nota.get('codigo_verificacao') or '-'})", "SUCCESS")
+            else:
+                self.log_message("⚠️ Número da NFS-e não identificado na confirmação", "WARNING")
+        except Exception as e:
+            self.log_message(f"⚠️ Erro ao registrar nota emitida: {e}", "WARNING")
+        return True
+    
+    def registrar_verificacao_manual(self, processed_data, nota, indice_real=None):
+        """
+        Acrescenta em notas_verificar.csv uma emissão de resultado indeterminado
+        
+        O boleto não é contado como emitido nem reenviado: enquanto a linha
+        estiver no arquivo, filtrar_pendentes_verificacao o deixa fora dos lotes.
+        """
+        try:
+            import csv
+            caminho = os.path.join(self.get_app_base_path(), 'notas_verificar.csv')
+            novo_arquivo = not os.path.exists(caminho)
+            with open(caminho, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f, delimiter=';')
+                if novo_arquivo:
+                    writer.writerow(['data_hora', 'indice', 'nome_cliente', 'cpf_cnpj', 'valor', 'motivo', 'url'])
+                writer.writerow([
+                    datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    indice_real if indice_real is not None else '',
+                    processed_data.get('nome_cliente', ''),
+                    processed_data.get('cpf_cnpj', ''),
+                    processed_data.get('valor', ''),
+                    nota.get('mensagem') or '',
+                    nota.get('url') or ''
+                ])
+            self.log_message(f"🔎 Boleto {indice_real}: emissão indeterminada - confira no WebISS antes de reemitir "
+                             f"(registrado em notas_verificar.csv)", "WARNING")
+        except Exception as e:
+            self.log_message(f"⚠️ Erro ao registrar emissão indeterminada: {e}", "WARNING")
+    
+    def filtrar_pendentes_verificacao(self, boletos_para_processar):
+        """Remove do lote os boletos (CPF/CNPJ e valor) ainda listados em notas_verificar.csv"""
+        caminho = os.path.join(self.get_app_base_path(), 'notas_verificar.csv')
+        if not os.path.exists(caminho):
+            return boletos_para_processar
+        try:
+            import csv
+            with open(caminho, newline='', encoding='utf-8') as f:
+                pendentes = {
+                    (''.join(filter(str.isdigit, linha.get('cpf_cnpj') or '')), str(linha.get('valor') or ''))
+                    for linha in csv.DictReader(f, delimiter=';')
+                }
+        except Exception as e:
+            self.log_message(f"⚠️ Erro ao ler notas_verificar.csv: {e}", "WARNING")
+            return boletos_para_processar
+        
+        restantes = []
+        for indice_real, row in boletos_para_processar:
+            dados = self.preparar_dados_boleto(row)
+            chave = (''.join(filter(str.isdigit, str(dados.get('cpf_cnpj') or ''))), str(dados.get('valor') or ''))
+            if chave in pendentes:
+                self.log_message(f"⏸️ Boleto {indice_real} aguarda verificação manual em notas_verificar.csv "
+                                 f"- remova a linha após conferir no WebISS", "WARNING")
+                continue
+            restantes.append((indice_real, row))
+        return restantes
+    
+    def registrar_tempo_primeira_nota(self):
+        """Informa, uma vez por execução do aplicativo, quanto tempo levou até a primeira nota emitida"""
+        with self.metricas_lock:
+            if self.primeira_nota_registrada:
+                return
+            self.primeira_nota_registrada = True
+        agora = time.perf_counter()
+        desde_inicio = f", {agora - self.inicio_automacao:.1f}s após Iniciar" if self.inicio_automacao else ""
+        self.log_message(f"⏱️ Primeira nota emitida {agora - self.inicio_app:.1f}s após abrir o aplicativo{desde_inicio}", "INFO")
+    
     def stop_automation(self):
         """Para a automação"""
         self.processing = False
@@ -1106,6 +1857,10 @@ class ModernMainWindow:
         # Atualizar status da licença
         self.update_license_status()
         
+        # Aquecer o navegador logo depois que a janela aparecer
+        if self.settings.aquecer_navegador:
+            self.root.after(200, self.iniciar_aquecimento)
+        
         try:
             self.root.mainloop()
         except KeyboardInterrupt:
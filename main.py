@@ -16,6 +16,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config.settings import Settings
 from webiss_automation import WebISSAutomation
+from utils.log_pipeline import configurar_logging
 
 # Configurar logging
 def get_log_path():
@@ -35,13 +36,13 @@ def get_log_path():
     
     return os.path.join(logs_dir, 'automacao_webiss.log')
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(get_log_path(), encoding='utf-8'),
-        logging.StreamHandler()
-    ]
+_settings_log = Settings()
+configurar_logging(
+    os.path.dirname(get_log_path()), 'automacao_webiss',
+    nivel=_settings_log.log_nivel,
+    max_mb=_settings_log.log_max_mb,
+    backups=_settings_log.log_backups,
+    json_lines=_settings_log.log_json
 )
 
 logger = logging.getLogger(__name__)
@@ -92,7 +93,9 @@ def carregar_dados_reais():
             'valor': dados.get('valor', ''),
             'vencimento': dados.get('vencimento', ''),
             'descricao': dados.get('descricao', ''),
-            'turma': turma
+            'turma': turma,
+            'cnae': dados.get('cnae', ''),
+            'atividade': dados.get('atividade', '')
         }
         
         # Extrair CEP do endereço se disponível (múltiplas estratégias)
@@ -159,6 +162,9 @@ def main():
             logger.error("❌ Falha no login")
             return False
         
+        # Contabilizar comandos WebDriver do boleto de teste
+        automation.profiler.iniciar_boleto('teste')
+        
         # Navegar para nova NFSe
         if not automation.navigate_to_new_nfse():
             logger.error("❌ Falha ao navegar para nova NFSe")
@@ -176,17 +182,14 @@ def main():
             logger.error("❌ Falha ao avançar para Step 3")
             return False
         
-        # Aguardar carregamento do Step 3
-        time.sleep(1)
-        
         # Preencher Step 3 usando a função sem scroll
         logger.info("=== PREENCHENDO STEP 3 SEM SCROLL ===")
         if not automation.fill_nfse_servicos_sem_scroll(test_data):
             logger.error("❌ Falha ao preencher Step 3 sem scroll")
             return False
         
-        # Aguardar um pouco para garantir que tudo foi processado
-        time.sleep(1)
+        # Aguardar a página processar os campos preenchidos
+        automation.waits.aguardar_ajax_ocioso()
         
         # Avançar para Step 4
         logger.info("=== AVANÇANDO PARA STEP 4 ===")
@@ -194,17 +197,15 @@ def main():
             logger.error("❌ Falha ao avançar para Step 4")
             return False
         
-        # Aguardar carregamento do Step 4
-        time.sleep(1)
-        
         # Preencher Step 4 (valores)
         logger.info("=== PREENCHENDO STEP 4 - VALORES ===")
         if not automation.fill_nfse_valores(test_data):
             logger.error("❌ Falha ao preencher Step 4")
             return False
         
-        # Aguardar um pouco para ver o resultado
-        time.sleep(2)
+        # Aguardar a página processar os valores antes de inspecionar
+        automation.waits.aguardar_ajax_ocioso()
+        automation.profiler.finalizar_boleto(True)
         
         logger.info("✅ Automação concluída com sucesso!")
         # Determinar o caminho dos logs
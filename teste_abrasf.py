@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script de teste da emissão em lote ABRASF contra um servidor SOAP local que simula o webservice
+"""
+
+import os
+import re
+import sys
+import logging
+import tempfile
+import time
+import threading
+import xml.etree.ElementTree as ET
+from types import SimpleNamespace
+from xml.sax.saxutils import escape
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+# Adicionar o diretório atual ao path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.abrasf import ClienteABRASF, NS_ABRASF, assinar_lote, gerar_lote_rps, CONFIGURACAO_PADRAO
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+NS = {'n': NS_ABRASF}
+
+
+def responder_soap(operacao, xml_resposta):
+    """Envelope SOAP com a resposta ABRASF escapada em <outputXML>"""
+    return (f'<?xml version="1.0" encoding="utf-8"?>'
+            f'<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+            f'<{operacao}Response xmlns="http://nfse.abrasf.org.br">'
+            f'<outputXML>{escape(xml_resposta)}</outputXML>'
+            f'</{operacao}Response></soap:Body></soap:Envelope>').encode('utf-8')
+
+
+class MockWebservice(BaseHTTPRequestHandler):
+    """Recebe lotes (protocolo), responde E4 na primeira consulta e depois as NFS-e de cada RPS"""
+
+    lotes = {}
+    consultas = {}
+    proxima_nfse = 5000
+    # 'normal', 'recusar' (E1 no envio), 'sem_resposta' (envio demora além do timeout)
+    # ou 'fila' (protocolo aceito, lote nunca processado)
+    modo = 'normal'
+
+    def do_POST(self):
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        conteudo = self.rfile.read(tamanho)
+        acao = self.headers.get('SOAPAction', '')
+        dados = extrair_dados(conteudo)
+
+        if acao.endswith('RecepcionarLoteRps') and MockWebservice.modo == 'sem_resposta':
+            time.sleep(1.5)
+            return
+        if acao.endswith('RecepcionarLoteRps') and MockWebservice.modo == 'recusar':
+            corpo = ('<EnviarLoteRpsResposta xmlns="%s"><ListaMensagemRetorno><MensagemRetorno>'
+                     '<Codigo>E160</Codigo><Mensagem>Assinatura inválida</Mensagem></MensagemRetorno>'
+                     '</ListaMensagemRetorno></EnviarLoteRpsResposta>' % NS_ABRASF)
+            resposta = responder_soap('RecepcionarLoteRps', corpo)
+        elif acao.endswith('RecepcionarLoteRps'):
+            numeros = [e.text for e in dados.findall('.//n:IdentificacaoRps/n:Numero', NS)]
+            if not numeros or dados.find('.//n:ListaRps', NS) is None:
+                corpo = ('<EnviarLoteRpsResposta xmlns="%s"><ListaMensagemRetorno><MensagemRetorno>'
+                         '<Codigo>E1</Codigo><Mensagem>Lote vazio</Mensagem></MensagemRetorno>'
+                         '</ListaMensagemRetorno></EnviarLoteRpsResposta>' % NS_ABRASF)
+            else:
+                protocolo = f"PROT{len(MockWebservice.lotes) + 1}"
+                MockWebservice.lotes[protocolo] = numeros
+                corpo = (f'<EnviarLoteRpsResposta xmlns="{NS_ABRASF}"><NumeroLote>1</NumeroLote>'
+                         f'<Protocolo>{protocolo}</Protocolo></EnviarLoteRpsResposta>')
+            resposta = responder_soap('RecepcionarLoteRps', corpo)
+        else:
+            protocolo = dados.find('.//n:Protocolo', NS).text
+            MockWebservice.consultas[protocolo] = MockWebservice.consultas.get(protocolo, 0) + 1
+            if MockWebservice.consultas[protocolo] == 1 or MockWebservice.modo == 'fila':
+                corpo = ('<ConsultarLoteRpsResposta xmlns="%s"><ListaMensagemRetorno><MensagemRetorno>'
+                         '<Codigo>E4</Codigo><Mensagem>Lote ainda não processado</Mensagem></MensagemRetorno>'
+                         '</ListaMensagemRetorno></ConsultarLoteRpsResposta>' % NS_ABRASF)
+            else:
+                notas = ''
+                for numero_rps in MockWebservice.lotes[protocolo]:
+                    MockWebservice.proxima_nfse += 1
+                    notas += (f'<CompNfse><Nfse><InfNfse><Numero>{MockWebservice.proxima_nfse}</Numero>'
+                              f'<CodigoVerificacao>CV{numero_rps}</CodigoVerificacao>'
+                              f'<DeclaracaoPrestacaoServico><InfDeclaracaoPrestacaoServico><Rps>'
+                              f'<IdentificacaoRps><Numero>{numero_rps}</Numero><Serie>1</Serie><Tipo>1</Tipo>'
+                              f'</IdentificacaoRps></Rps></InfDeclaracaoPrestacaoServico></DeclaracaoPrestacaoServico>'
+                              f'</InfNfse></Nfse></CompNfse>')
+                corpo = (f'<ConsultarLoteRpsResposta xmlns="{NS_ABRASF}"><Situacao>4</Situacao>'
+                         f'<ListaNfse>{notas}</ListaNfse></ConsultarLoteRpsResposta>')
+            resposta = responder_soap('ConsultarLoteRps', corpo)
+
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/xml; charset=utf-8')
+            self.send_header('Content-Length', str(len(resposta)))
+            self.end_headers()
+            self.wfile.write(resposta)
+        except BrokenPipeError:
+            pass
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def extrair_dados(envelope):
+    """XML ABRASF enviado em <nfseDadosMsg>"""
+    for item in ET.fromstring(envelope).iter():
+        if item.tag.endswith('nfseDadosMsg'):
+            return ET.fromstring(item.text.encode('utf-8'))
+    return None
+
+
+def criar_boletos(quantidade):
+    return [{
+        'indice': i,
+        'cpf_cnpj': f"{i:011d}",
+        'nome_cliente': f"ALUNO TESTE {i}",
+        'valor': '850,00',
+        'vencimento': '10/03/2025',
+        'cep': '77016-640',
+        'cnae': 8520100,
+        'atividade': '801'
+    } for i in range(1, quantidade + 1)]
+
+
+def testar_geracao():
+    """Confere a estrutura do lote gerado"""
+    prestador = {'cnpj': '12.345.678/0001-90', 'inscricao_municipal': '123456', 'codigo_municipio': '1721000'}
+    xml, mapa = gerar_lote_rps(criar_boletos(3), 7, 100, prestador, dict(CONFIGURACAO_PADRAO))
+    raiz = ET.fromstring(xml)
+    servico = raiz.find('.//n:Servico', NS)
+    verificacoes = [
+        (raiz.find('n:LoteRps/n:QuantidadeRps', NS).text, '3'),
+        (sorted(mapa), ['100', '101', '102']),
+        (servico.find('n:Valores/n:ValorServicos', NS).text, '850.00'),
+        (servico.find('n:ItemListaServico', NS).text, '08.01'),
+        (servico.find('n:CodigoCnae', NS).text, '8520100'),
+        (raiz.find('.//n:Competencia', NS).text, '2025-03-01'),
+    ]
+    for obtido, esperado in verificacoes:
+        if obtido != esperado:
+            logger.error(f"❌ Lote gerado: esperado {esperado}, obtido {obtido}")
+            return False
+    logger.info("✅ Geração do lote OK")
+    return True
+
+
+def testar_assinatura():
+    """Assina um lote com um certificado autoassinado e verifica as assinaturas (requer signxml)"""
+    try:
+        import datetime
+        from signxml import XMLVerifier, SignatureConfiguration, SignatureMethod, DigestAlgorithm
+        from cryptography import x509
+        from cryptography.x509.oid import NameOID
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from cryptography.hazmat.primitives.serialization import pkcs12
+    except ImportError:
+        logger.info("ℹ️ signxml/cryptography não instalados - teste de assinatura ignorado")
+        return True
+
+    chave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    nome = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'Teste Emite Nota')])
+    agora = datetime.datetime.now(datetime.timezone.utc)
+    certificado = (x509.CertificateBuilder().subject_name(nome).issuer_name(nome)
+                   .public_key(chave.public_key()).serial_number(1)
+                   .not_valid_before(agora).not_valid_after(agora + datetime.timedelta(days=1))
+                   .sign(chave, hashes.SHA256()))
+    pfx = pkcs12.serialize_key_and_certificates(b'teste', chave, certificado, None,
+                                                serialization.BestAvailableEncryption(b'senha'))
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'certificado.pfx')
+        with open(caminho, 'wb') as f:
+            f.write(pfx)
+        prestador = {'cnpj': '12345678000190', 'inscricao_municipal': '123456', 'codigo_municipio': '1721000'}
+        xml, _ = gerar_lote_rps(criar_boletos(2), 1, 1, prestador, dict(CONFIGURACAO_PADRAO))
+        assinado = assinar_lote(xml, caminho, 'senha')
+
+    if not assinado or assinado.count(b'<ds:SignatureValue>') != 3:
+        logger.error("❌ Lote deveria ter 3 assinaturas (2 RPS + lote)")
+        return False
+    # Verifica a assinatura do lote (a última, na raiz), aceitando o RSA-SHA1 do leiaute ABRASF
+    certificado_pem = certificado.public_bytes(serialization.Encoding.PEM)
+    configuracao = SignatureConfiguration(location='./', signature_methods=frozenset({SignatureMethod.RSA_SHA1}),
+                                          digest_algorithms=frozenset({DigestAlgorithm.SHA1}))
+    XMLVerifier().verify(assinado, x509_cert=certificado_pem, expect_config=configuracao)
+    logger.info("✅ Assinatura do lote OK")
+    return True
+
+
+def emitir_no_mock(servidor, boletos, prazo_consulta=5, timeout=10):
+    """Emite os boletos contra o webservice simulado com uma pasta de dados temporária"""
+    with tempfile.TemporaryDirectory() as pasta:
+        with open(os.path.join(pasta, 'abrasf.json'), 'w', encoding='utf-8') as f:
+            f.write('{"tamanho_lote": 50, "intervalo_consulta": 0.05, "prazo_consulta": %s}' % prazo_consulta)
+        settings = SimpleNamespace(
+            abrasf_url=f"http://127.0.0.1:{servidor.server_port}/nfse.asmx", abrasf_certificado='',
+            abrasf_senha_certificado='', prestador_cnpj='12345678000190',
+            prestador_inscricao_municipal='123456', codigo_municipio='1721000',
+            timeout=timeout, data_directory=pasta
+        )
+        return ClienteABRASF(settings).emitir(boletos)
+
+
+def testar_envio_e_consulta(quantidade=120):
+    """Envia os lotes ao webservice simulado e confere o mapeamento NFS-e -> boleto"""
+    servidor = HTTPServer(('127.0.0.1', 0), MockWebservice)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    try:
+        resultado = emitir_no_mock(servidor, criar_boletos(quantidade))
+
+        if resultado['falhas'] or resultado['indeterminadas'] or len(resultado['emitidas']) != quantidade:
+            logger.error(f"❌ Esperadas {quantidade} notas: {len(resultado['emitidas'])} emitidas, "
+                         f"falhas: {resultado['falhas'][:3]}")
+            return False
+        if len(MockWebservice.lotes) != 3:
+            logger.error(f"❌ Esperados 3 lotes, enviados {len(MockWebservice.lotes)}")
+            return False
+        numeros = {nota['numero'] for _, nota in resultado['emitidas']}
+        indices = {boleto['indice'] for boleto, _ in resultado['emitidas']}
+        if len(numeros) != quantidade or indices != set(range(1, quantidade + 1)):
+            logger.error("❌ Mapeamento NFS-e -> boleto inconsistente")
+            return False
+        for boleto, nota in resultado['emitidas']:
+            rps = re.search(r'RPS (\d+)', nota['mensagem']).group(1)
+            if nota['codigo_verificacao'] != f"CV{rps}":
+                logger.error(f"❌ Código de verificação trocado no boleto {boleto['indice']}")
+                return False
+        logger.info(f"✅ {quantidade} notas emitidas em {len(MockWebservice.lotes)} lotes")
+        return True
+    finally:
+        servidor.shutdown()
+
+
+def testar_indeterminados():
+    """Lote recusado é falha; envio sem resposta e protocolo sem resultado no prazo são indeterminados"""
+    servidor = HTTPServer(('127.0.0.1', 0), MockWebservice)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    try:
+        casos = [
+            ('recusar', {}, 'falhas'),
+            ('sem_resposta', {'timeout': 0.5}, 'indeterminadas'),
+            ('fila', {'prazo_consulta': 0.3}, 'indeterminadas'),
+        ]
+        for modo, parametros, esperado in casos:
+            MockWebservice.modo = modo
+            resultado = emitir_no_mock(servidor, criar_boletos(3), **parametros)
+            obtido = {chave: len(resultado[chave]) for chave in ('emitidas', 'falhas', 'indeterminadas')}
+            if obtido[esperado] != 3 or sum(obtido.values()) != 3:
+                logger.error(f"❌ Modo '{modo}': esperadas 3 em '{esperado}', obtido {obtido}")
+                return False
+            for _, nota in resultado['indeterminadas']:
+                if not nota.get('indeterminado') or f"Lote {nota['lote']}" not in nota['mensagem']:
+                    logger.error(f"❌ Modo '{modo}': nota indeterminada sem lote/protocolo: {nota}")
+                    return False
+        logger.info("✅ Lotes recusados e indeterminados separados corretamente")
+        return True
+    finally:
+        MockWebservice.modo = 'normal'
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    success = (testar_geracao() and testar_assinatura() and testar_envio_e_consulta()
+               and testar_indeterminados())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script de teste da resolução paralela de inscrições municipais contra um mock local do endpoint de endereço
+"""
+
+import os
+import sys
+import json
+import logging
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Adicionar o diretório atual ao path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.inscricao_resolver import escolher_opcao, deduzir_modelo_url, resolver_inscricoes, selecionar_opcao
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Inscrições do tomador de teste: valor da opção -> CEP
+INSCRICOES = {
+    '101': '77001-002',
+    '102': '77016-640',
+    '103': '77020-010',
+}
+
+PAGINA = """<!DOCTYPE html>
+<html><body>
+<select id="comboInscricao">
+  <option value="">Selecione uma inscrição...</option>
+  <option value="101">Inscrição 101</option>
+  <option value="102">Inscrição 102</option>
+  <option value="103">Inscrição 103</option>
+</select>
+<input id="cep" name="cep">
+<script>
+document.getElementById('comboInscricao').addEventListener('change', function() {
+  fetch('/Inscricao/Endereco?id=' + this.value)
+    .then(function(r) { return r.json(); })
+    .then(function(d) { document.getElementById('cep').value = d.Endereco.Cep; });
+});
+</script>
+</body></html>"""
+
+
+class MockWebISS(BaseHTTPRequestHandler):
+    """Serve a página de teste e o endpoint de endereço da inscrição"""
+
+    requisicoes = 0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/Inscricao/Endereco':
+            MockWebISS.requisicoes += 1
+            valor = parse_qs(url.query).get('id', [''])[0]
+            corpo = json.dumps({'Endereco': {'Cep': INSCRICOES.get(valor, '')}}).encode('utf-8')
+            tipo = 'application/json'
+        else:
+            corpo = PAGINA.encode('utf-8')
+            tipo = 'text/html; charset=utf-8'
+        self.send_response(200)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def testar_funcoes_auxiliares():
+    """Testa a escolha da opção e a dedução do endpoint sem navegador"""
+    resultados = [{'valor': v, 'texto': f'Inscrição {v}', 'cep': c} for v, c in INSCRICOES.items()]
+
+    escolhida = escolher_opcao(resultados, '77016640')
+    if not escolhida or escolhida['valor'] != '102':
+        logger.error(f"❌ escolher_opcao retornou {escolhida}")
+        return False
+    if escolher_opcao(resultados, '77999-999') is not None:
+        logger.error("❌ escolher_opcao deveria retornar None para CEP inexistente")
+        return False
+
+    modelo = deduzir_modelo_url(['/Outro/Recurso?x=1', '/Inscricao/Endereco?id=102'], '102')
+    if modelo != '/Inscricao/Endereco?id={valor}':
+        logger.error(f"❌ deduzir_modelo_url retornou {modelo}")
+        return False
+    if deduzir_modelo_url(['/Inscricao/Endereco?id=1020'], '102') is not None:
+        logger.error("❌ deduzir_modelo_url não deveria casar valor parcial")
+        return False
+
+    logger.info("✅ Funções auxiliares OK")
+    return True
+
+
+def testar_resolucao_paralela():
+    """Testa a resolução paralela em um Chrome headless contra o mock local"""
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.chrome.options import Options
+
+    servidor = HTTPServer(('127.0.0.1', 0), MockWebISS)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{servidor.server_port}"
+
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    driver = webdriver.Chrome(options=chrome_options)
+
+    try:
+        driver.set_script_timeout(15)
+        driver.get(base + '/')
+        select = driver.find_element(By.ID, 'comboInscricao')
+
+        resultados = resolver_inscricoes(driver, select, '/Inscricao/Endereco?id={valor}', timeout=10)
+        logger.info(f"📋 Resultados: {resultados}")
+        if MockWebISS.requisicoes != len(INSCRICOES):
+            logger.error(f"❌ Esperadas {len(INSCRICOES)} consultas, feitas {MockWebISS.requisicoes}")
+            return False
+
+        escolhida = escolher_opcao(resultados, '77016-640')
+        if not escolhida or not selecionar_opcao(driver, select, escolhida['valor']):
+            logger.error("❌ Falha ao selecionar a inscrição")
+            return False
+
+        if select.get_attribute('value') != '102':
+            logger.error(f"❌ Valor selecionado incorreto: {select.get_attribute('value')}")
+            return False
+
+        logger.info("✅ Resolução paralela OK")
+        return True
+    finally:
+        driver.quit()
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    success = testar_funcoes_auxiliares() and testar_resolucao_paralela()
+    sys.exit(0 if success else 1)
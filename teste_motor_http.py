@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script de teste do motor de emissão HTTP contra um mock local dos posts do wizard do WebISS
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+import threading
+from types import SimpleNamespace
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Adicionar o diretório atual ao path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.http_engine import MotorHTTP, CAMPO_TOKEN
+from utils.inscricao_cache import InscricaoCache
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+COOKIE_SESSAO = 'sessao-teste'
+TOKEN = 'token-antiforgery-123'
+
+# Inscrições do tomador de teste: valor da opção -> CEP
+INSCRICOES = {'101': '77001-002', '102': '77016-640'}
+
+WIZARD = """<!DOCTYPE html>
+<html><body><form>
+<input type="hidden" name="__RequestVerificationToken" value="%s">
+<input type="hidden" name="Prestador_Id" value="42">
+<select id="MesDaCompetencia"><option value="">Selecione</option>%s</select>
+<select id="lista-de-servicos-prestador"><option value="">Selecione</option>
+  <option value="7">08.01 - Ensino regular</option></select>
+<select id="CnaeAtividade_Id"><option value="">Selecione</option>
+  <option value="31">8513-9/00 - Ensino fundamental</option>
+  <option value="32">8520-1/00 - Ensino médio</option></select>
+</form></body></html>""" % (TOKEN, ''.join(f'<option value="{m}">Mês {m}</option>' for m in range(1, 13)))
+
+
+class MockWebISS(BaseHTTPRequestHandler):
+    """Reproduz o wizard, a consulta de inscrições e o post de emissão"""
+
+    emitidas = []
+    requisicoes = 0
+
+    def _responder(self, status, corpo, tipo='application/json'):
+        corpo = corpo.encode('utf-8')
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', tipo)
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Cliente desistiu por timeout
+
+    def _logado(self):
+        return f'sessao={COOKIE_SESSAO}' in (self.headers.get('Cookie') or '')
+
+    def do_GET(self):
+        MockWebISS.requisicoes += 1
+        url = urlparse(self.path)
+        if not self._logado():
+            self._responder(200, '<html><form id="login"></form></html>', 'text/html')
+        elif url.path == '/NotaFiscal/Criar':
+            self._responder(200, WIZARD, 'text/html; charset=utf-8')
+        elif url.path == '/Pessoa/Inscricoes':
+            self._responder(200, json.dumps([{'Id': v, 'Text': f'Inscrição {v}'} for v in INSCRICOES]))
+        elif url.path == '/Inscricao/Endereco':
+            valor = parse_qs(url.query).get('id', [''])[0]
+            self._responder(200, json.dumps({'Endereco': {'Cep': INSCRICOES.get(valor, '')}}))
+        else:
+            self._responder(404, '{}')
+
+    def do_POST(self):
+        MockWebISS.requisicoes += 1
+        if urlparse(self.path).path == '/Conta/Login':
+            # Sessão expirada: o post cai na página de login (200 sem mensagem de erro)
+            self._responder(200, '<html><form><input type="password" name="Senha"></form></html>', 'text/html')
+            return
+        if urlparse(self.path).path not in ('/NotaFiscal/Emitir', '/NotaFiscal/EmitirLento'):
+            self._responder(404, '<html><body>Página não encontrada</body></html>', 'text/html; charset=utf-8')
+            return
+        if urlparse(self.path).path == '/NotaFiscal/EmitirLento':
+            # Processa a emissão, mas só responde depois do timeout do cliente
+            time.sleep(1.5)
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(tamanho).decode('utf-8')).items()}
+        if not self._logado() or form.get(CAMPO_TOKEN) != TOKEN or self.headers.get('RequestVerificationToken') != TOKEN:
+            self._responder(200, json.dumps({'Sucesso': False, 'Erros': ['Token inválido']}))
+            return
+        obrigatorios = ('Tomador.CpfCnpj', 'Tomador.Inscricao_Id', 'MesDaCompetencia',
+                        'ItemListaServico_Id', 'CnaeAtividade_Id', 'ValorServicos', 'Prestador_Id')
+        faltando = [c for c in obrigatorios if not form.get(c)]
+        if form.get('ValorServicos') == '0,01':
+            self._responder(200, json.dumps({'Sucesso': False, 'Erros': ['Valor abaixo do mínimo']}))
+            return
+        if faltando:
+            self._responder(200, json.dumps({'Sucesso': False, 'Erros': [f'Campo obrigatório: {c}' for c in faltando]}))
+            return
+        MockWebISS.emitidas.append(form)
+        numero = 1000 + len(MockWebISS.emitidas)
+        self._responder(200, json.dumps({'Sucesso': True, 'Nota': {'Numero': numero, 'CodigoVerificacao': f'AB{numero}'}}))
+
+    def log_message(self, formato, *args):
+        pass
+
+
+class DriverLogado:
+    """Fornece os cookies e a URL de uma sessão já logada (como o WebDriver após o login)"""
+
+    def __init__(self, base):
+        self.current_url = base + '/'
+
+    def get_cookies(self):
+        return [{'name': 'sessao', 'value': COOKIE_SESSAO, 'path': '/'}]
+
+    def execute_script(self, script):
+        return 'Mozilla/5.0 (teste)'
+
+
+def testar_motor_http(quantidade=50):
+    """Emite 'quantidade' notas pelo motor HTTP e confere os campos postados"""
+    servidor = HTTPServer(('127.0.0.1', 0), MockWebISS)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{servidor.server_port}"
+
+    try:
+        with tempfile.TemporaryDirectory() as pasta:
+            settings = SimpleNamespace(webiss_url=base + '/', timeout=10, data_directory=pasta)
+            cache = InscricaoCache(os.path.join(pasta, 'inscricoes_cache.json'))
+            motor = MotorHTTP(settings, inscricao_cache=cache)
+
+            dados = {'cpf_cnpj': '123.456.789-09', 'cep': '77016-640', 'vencimento': '10/03/2025',
+                     'atividade': '801', 'cnae': 8520100, 'valor': '850.00'}
+
+            # Sem cookies da sessão, o motor deve desistir (o chamador usa o Selenium)
+            if motor.emitir(dados) is not None:
+                logger.error("❌ Emissão sem sessão deveria falhar")
+                return False
+
+            if not motor.importar_cookies(DriverLogado(base)):
+                logger.error("❌ Falha ao importar cookies")
+                return False
+
+            inicio = time.perf_counter()
+            for _ in range(quantidade):
+                nota = motor.emitir(dados)
+                if not nota or not nota['numero']:
+                    logger.error(f"❌ Emissão falhou: {nota}")
+                    return False
+            duracao = time.perf_counter() - inicio
+
+            form = MockWebISS.emitidas[-1]
+            esperado = {'Tomador.Inscricao_Id': '102', 'MesDaCompetencia': '3', 'AnoDaCompetencia': '2025',
+                        'ItemListaServico_Id': '7', 'CnaeAtividade_Id': '32', 'ValorServicos': '850,00',
+                        'Tomador.CpfCnpj': '12345678909'}
+            for campo, valor in esperado.items():
+                if form.get(campo) != valor:
+                    logger.error(f"❌ Campo {campo}: esperado {valor}, postado {form.get(campo)}")
+                    return False
+
+            # Post enviado sem resposta a tempo: indeterminado, nunca None (o Selenium reemitiria a nota)
+            emitidas_antes = len(MockWebISS.emitidas)
+            motor.config['endpoints']['emitir'] = '/NotaFiscal/EmitirLento'
+            settings.timeout = 0.5
+            nota = motor.emitir(dados)
+            settings.timeout = 10
+            motor.config['endpoints']['emitir'] = '/NotaFiscal/Emitir'
+            time.sleep(1.5)
+            if not nota or not nota.get('indeterminado') or nota['confirmado']:
+                logger.error(f"❌ Timeout após o post deveria ser indeterminado: {nota}")
+                return False
+            if len(MockWebISS.emitidas) != emitidas_antes + 1:
+                logger.error("❌ O mock deveria ter processado o post lento")
+                return False
+
+            # Página 200 sem confirmação (login) não é nota emitida
+            motor.config['endpoints']['emitir'] = '/Conta/Login'
+            nota = motor.emitir(dados)
+            motor.config['endpoints']['emitir'] = '/NotaFiscal/Emitir'
+            if not nota or not nota.get('indeterminado'):
+                logger.error(f"❌ Resposta sem confirmação deveria ser indeterminada: {nota}")
+                return False
+
+            # Recusa explícita (404 de endpoint errado, erros de validação): None, o Selenium assume
+            motor.config['endpoints']['emitir'] = '/NotaFiscal/Inexistente'
+            recusas = [motor.emitir(dados)]
+            motor.config['endpoints']['emitir'] = '/NotaFiscal/Emitir'
+            recusas.append(motor.emitir(dict(dados, valor='0.01')))
+            if any(r is not None for r in recusas) or motor.desativado:
+                logger.error(f"❌ Recusas explícitas deveriam retornar None: {recusas}")
+                return False
+            motor.emitir(dict(dados, valor='0.01'))
+            if not motor.desativado:
+                logger.error("❌ Motor deveria ser desativado após recusas seguidas")
+                return False
+            if not motor.emitir(dados) or motor.desativado:
+                logger.error("❌ Emissão confirmada deveria zerar as recusas seguidas")
+                return False
+
+            logger.info(f"✅ {quantidade} notas em {duracao:.2f}s ({quantidade / duracao:.1f} notas/s, "
+                        f"{MockWebISS.requisicoes} requisições)")
+            return True
+    finally:
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    success = testar_motor_http()
+    sys.exit(0 if success else 1)
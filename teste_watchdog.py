@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script de teste do watchdog do WebDriver com um driver simulado que trava em um comando
+"""
+
+import os
+import sys
+import time
+import logging
+import tempfile
+import threading
+
+# Adicionar o diretório atual ao path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.watchdog import WatchdogDriver
+from utils.webdriver_profiler import WebDriverProfiler
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class DriverTravado:
+    """Responde na hora, exceto 'get', que só retorna quando o navegador é 'encerrado'"""
+
+    def __init__(self):
+        self.encerrado = threading.Event()
+
+    def execute(self, comando, params=None):
+        if comando == 'get' and not self.encerrado.wait(timeout=30):
+            return {'value': None}
+        if self.encerrado.is_set():
+            raise ConnectionError("navegador encerrado")
+        return {'value': None}
+
+
+def testar_watchdog():
+    """O comando travado deve ser interrompido perto do prazo; os rápidos não disparam o watchdog"""
+    driver = DriverTravado()
+    disparos = []
+
+    def ao_travar(comando, duracao):
+        disparos.append(comando)
+        driver.encerrado.set()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        profiler = WebDriverProfiler(os.path.join(pasta, 'perfil.jsonl'))
+        profiler.instalar(driver)
+        watchdog = WatchdogDriver(limite=0.5, ao_travar=ao_travar, intervalo=0.1)
+        profiler.watchdog = watchdog
+        watchdog.iniciar()
+        try:
+            for _ in range(20):
+                driver.execute('executeScript')
+            if disparos:
+                logger.error("❌ Watchdog disparou para comandos rápidos")
+                return False
+
+            inicio = time.perf_counter()
+            try:
+                driver.execute('get')
+                logger.error("❌ Comando travado deveria falhar após o encerramento")
+                return False
+            except ConnectionError:
+                duracao = time.perf_counter() - inicio
+        finally:
+            watchdog.parar()
+
+    if disparos != ['get'] or duracao > 2:
+        logger.error(f"❌ Esperado um disparo para 'get' em ~0.5s: {disparos}, {duracao:.2f}s")
+        return False
+    logger.info(f"✅ Comando travado interrompido em {duracao:.2f}s")
+    return True
+
+
+if __name__ == "__main__":
+    success = testar_watchdog()
+    sys.exit(0 if success else 1)
@@ -5,5 +5,22 @@ Módulo Utils - Utilitários do Emite Nota
 
 from .data_processor import DataProcessor
 from .license_checker import LicenseChecker
+from .wait_engine import WaitEngine
+from .selector_cache import SelectorCache
+from .page_probe import sondar_seletores, preencher_em_lote
+from .webdriver_profiler import WebDriverProfiler
+from .inscricao_cache import InscricaoCache
+from .inscricao_resolver import resolver_inscricoes
+from .option_catalog import CatalogoOpcoes
+from .conciliacao_rascunhos import conciliar_rascunhos
+from .worker_pool import WorkerPool
+from .tab_scheduler import AgendadorAbas
+from .http_engine import MotorHTTP
+from .abrasf import ClienteABRASF
+from .wizard_state import detectar_estado_pagina
+from .watchdog import WatchdogDriver
+from .chrome_remoto import garantir_chrome_remoto
+from .screenshot_writer import GravadorScreenshots
+from .log_pipeline import configurar_logging
 
-__all__ = ['DataProcessor', 'LicenseChecker'] 
\ No newline at end of file
+__all__ = ['DataProcessor', 'LicenseChecker', 'WaitEngine', 'SelectorCache', 'sondar_seletores', 'preencher_em_lote', 'WebDriverProfiler', 'InscricaoCache', 'resolver_inscricoes', 'CatalogoOpcoes', 'conciliar_rascunhos', 'WorkerPool', 'AgendadorAbas', 'MotorHTTP', 'ClienteABRASF', 'detectar_estado_pagina', 'WatchdogDriver', 'garantir_chrome_remoto', 'GravadorScreenshots', 'configurar_logging']
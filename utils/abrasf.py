@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lote RPS ABRASF - Emite as notas em lote pelo webservice ABRASF (EnviarLoteRps / ConsultarLoteRps)
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from xml.sax.saxutils import escape
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+import urllib3
+
+from utils.option_catalog import normalizar_codigo
+from utils.conciliacao_rascunhos import valor_float
+
+logger = logging.getLogger(__name__)
+
+NS_ABRASF = 'http://www.abrasf.org.br/nfse.xsd'
+NS_SOAP = 'http://schemas.xmlsoap.org/soap/envelope/'
+
+# Parâmetros fixos do lote; sobrescritos por data/abrasf.json
+CONFIGURACAO_PADRAO = {
+    'versao': '2.02',
+    'serie': '1',
+    'tipo_rps': '1',
+    'optante_simples': '2',
+    'incentivo_fiscal': '2',
+    'exigibilidade_iss': '1',
+    'iss_retido': '2',
+    'discriminacao': 'prestação de serviços educacionais',
+    'tamanho_lote': 50,
+    'intervalo_consulta': 5,
+    'prazo_consulta': 600,
+    'soap_action': 'http://nfse.abrasf.org.br/{operacao}',
+    'operacao_envio': 'RecepcionarLoteRps',
+    'operacao_consulta': 'ConsultarLoteRps'
+}
+
+# Situação do lote em ConsultarSituacaoLoteRps/ConsultarLoteRps (ABRASF)
+SITUACAO_NAO_PROCESSADO = ('1', '2')
+
+
+def carregar_configuracao(caminho: str) -> Dict[str, Any]:
+    """Configuração padrão mesclada com o arquivo JSON (se existir)"""
+    configuracao = dict(CONFIGURACAO_PADRAO)
+    try:
+        if caminho and os.path.exists(caminho):
+            with open(caminho, 'r', encoding='utf-8') as f:
+                configuracao.update(json.load(f))
+            logger.info("Configuração ABRASF carregada de %s", caminho)
+    except Exception as e:
+        logger.warning("Erro ao carregar configuração ABRASF: %s", e)
+    return configuracao
+
+
+def formatar_item_lista(codigo) -> str:
+    """Item da lista de serviços no formato ABRASF ('801' ou '08.01' -> '08.01')"""
+    digitos = normalizar_codigo(codigo)
+    if len(digitos) < 3:
+        return ''
+    return f"{int(digitos[:-2]):02d}.{digitos[-2:]}"
+
+
+def _filho(pai, tag: str, texto=None):
+    elemento = ET.SubElement(pai, f'{{{NS_ABRASF}}}{tag}')
+    if texto is not None:
+        elemento.text = str(texto)
+    return elemento
+
+
+class NumeracaoRps:
+    """Numeração persistente de RPS e de lotes (um número nunca é reutilizado)"""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self.proximo_rps = 1
+        self.proximo_lote = 1
+        try:
+            if os.path.exists(caminho):
+                with open(caminho, 'r', encoding='utf-8') as f:
+                    conteudo = json.load(f)
+                self.proximo_rps = int(conteudo.get('proximo_rps', 1))
+                self.proximo_lote = int(conteudo.get('proximo_lote', 1))
+        except Exception as e:
+            logger.warning("Erro ao carregar numeração de RPS: %s", e)
+
+    def reservar(self, quantidade_rps: int) -> Tuple[int, int]:
+        """Reserva um número de lote e 'quantidade_rps' números de RPS; retorna (lote, primeiro RPS)"""
+        with self._lock:
+            lote, primeiro = self.proximo_lote, self.proximo_rps
+            self.proximo_lote += 1
+            self.proximo_rps += quantidade_rps
+            diretorio = os.path.dirname(self.caminho)
+            if diretorio and not os.path.exists(diretorio):
+                os.makedirs(diretorio)
+            with open(self.caminho, 'w', encoding='utf-8') as f:
+                json.dump({'proximo_rps': self.proximo_rps, 'proximo_lote': self.proximo_lote,
+                           'atualizado_em': datetime.now().isoformat(timespec='seconds')}, f, indent=2)
+        return lote, primeiro
+
+
+def gerar_lote_rps(boletos: List[Dict], numero_lote: int, primeiro_rps: int,
+                   prestador: Dict[str, str], config: Dict[str, Any]) -> Tuple[bytes, Dict[str, Dict]]:
+    """
+    Monta o XML EnviarLoteRpsEnvio com um RPS por boleto
+
+    Args:
+        boletos: Dados já preparados ('cpf_cnpj', 'nome_cliente', 'valor', 'vencimento', 'cep', 'cnae', 'atividade')
+        numero_lote: Número do lote
+        primeiro_rps: Número do primeiro RPS (os seguintes são consecutivos)
+        prestador: {'cnpj', 'inscricao_municipal', 'codigo_municipio'}
+
+    Returns:
+        Tupla (XML do lote, {número do RPS: boleto})
+    """
+    ET.register_namespace('', NS_ABRASF)
+    raiz = ET.Element(f'{{{NS_ABRASF}}}EnviarLoteRpsEnvio')
+    lote = _filho(raiz, 'LoteRps')
+    lote.set('Id', f'lote{numero_lote}')
+    lote.set('versao', config['versao'])
+    _filho(lote, 'NumeroLote', numero_lote)
+    _filho(_filho(lote, 'CpfCnpj'), 'Cnpj', re.sub(r'\D', '', prestador['cnpj']))
+    _filho(lote, 'InscricaoMunicipal', prestador['inscricao_municipal'])
+    _filho(lote, 'QuantidadeRps', len(boletos))
+    lista = _filho(lote, 'ListaRps')
+
+    mapa = {}
+    hoje = datetime.now().strftime('%Y-%m-%d')
+    for deslocamento, boleto in enumerate(boletos):
+        numero = primeiro_rps + deslocamento
+        mapa[str(numero)] = boleto
+
+        info = _filho(_filho(lista, 'Rps'), 'InfDeclaracaoPrestacaoServico')
+        info.set('Id', f'rps{numero}')
+        rps = _filho(info, 'Rps')
+        identificacao = _filho(rps, 'IdentificacaoRps')
+        _filho(identificacao, 'Numero', numero)
+        _filho(identificacao, 'Serie', config['serie'])
+        _filho(identificacao, 'Tipo', config['tipo_rps'])
+        _filho(rps, 'DataEmissao', hoje)
+        _filho(rps, 'Status', '1')
+
+        vencimento = str(boleto.get('vencimento') or '')
+        if vencimento.count('/') == 2:
+            _, mes, ano = vencimento.split('/')
+            _filho(info, 'Competencia', f"{ano}-{int(mes):02d}-01")
+        else:
+            _filho(info, 'Competencia', hoje)
+
+        servico = _filho(info, 'Servico')
+        _filho(_filho(servico, 'Valores'), 'ValorServicos', f"{valor_float(boleto.get('valor')) or 0:.2f}")
+        _filho(servico, 'IssRetido', config['iss_retido'])
+        _filho(servico, 'ItemListaServico', formatar_item_lista(boleto.get('atividade')))
+        _filho(servico, 'CodigoCnae', normalizar_codigo(boleto.get('cnae')))
+        _filho(servico, 'Discriminacao', config['discriminacao'])
+        _filho(servico, 'CodigoMunicipio', prestador['codigo_municipio'])
+        _filho(servico, 'ExigibilidadeISS', config['exigibilidade_iss'])
+
+        prestador_xml = _filho(info, 'Prestador')
+        _filho(_filho(prestador_xml, 'CpfCnpj'), 'Cnpj', re.sub(r'\D', '', prestador['cnpj']))
+        _filho(prestador_xml, 'InscricaoMunicipal', prestador['inscricao_municipal'])
+
+        tomador = _filho(info, 'Tomador')
+        documento = re.sub(r'\D', '', str(boleto.get('cpf_cnpj') or ''))
+        _filho(_filho(_filho(tomador, 'IdentificacaoTomador'), 'CpfCnpj'),
+               'Cnpj' if len(documento) == 14 else 'Cpf', documento)
+        _filho(tomador, 'RazaoSocial', str(boleto.get('nome_cliente') or '').strip()[:150])
+        cep = re.sub(r'\D', '', str(boleto.get('cep') or ''))
+        if cep:
+            _filho(_filho(tomador, 'Endereco'), 'Cep', cep)
+
+        _filho(info, 'OptanteSimplesNacional', config['optante_simples'])
+        _filho(info, 'IncentivoFiscal', config['incentivo_fiscal'])
+
+    return ET.tostring(raiz, encoding='utf-8', xml_declaration=False), mapa
+
+
+def assinar_lote(xml: bytes, caminho_certificado: str, senha: str) -> Optional[bytes]:
+    """
+    Assina cada RPS (InfDeclaracaoPrestacaoServico) e o LoteRps com o certificado A1 (.pfx)
+
+    Requer os pacotes opcionais signxml e cryptography.
+
+    Returns:
+        XML assinado, ou None se a assinatura não foi possível
+    """
+    try:
+        from lxml import etree
+        from signxml import XMLSigner, methods
+        from cryptography.hazmat.primitives.serialization import pkcs12, Encoding, PrivateFormat, NoEncryption
+    except ImportError as e:
+        logger.error("❌ Assinatura indisponível (%s) - instale: pip install signxml cryptography", e)
+        return None
+
+    try:
+        with open(caminho_certificado, 'rb') as f:
+            chave, certificado, _ = pkcs12.load_key_and_certificates(f.read(), (senha or '').encode('utf-8'))
+        chave_pem = chave.private_bytes(Encoding.PEM, PrivateFormat.PKCS8, NoEncryption())
+        certificado_pem = certificado.public_bytes(Encoding.PEM)
+
+        class AssinadorABRASF(XMLSigner):
+            # O leiaute ABRASF exige RSA-SHA1, que o signxml bloqueia por padrão
+            def check_deprecated_methods(self):
+                pass
+
+        def assinador():
+            return AssinadorABRASF(method=methods.enveloped, signature_algorithm='rsa-sha1', digest_algorithm='sha1',
+                                   c14n_algorithm='http://www.w3.org/TR/2001/REC-xml-c14n-20010315')
+
+        raiz = etree.fromstring(xml)
+        ns = {'n': NS_ABRASF}
+        # A assinatura de cada RPS fica no elemento Rps, ao lado da InfDeclaracaoPrestacaoServico
+        for rps in raiz.findall('.//n:ListaRps/n:Rps', ns):
+            info = rps.find('n:InfDeclaracaoPrestacaoServico', ns)
+            assinado = assinador().sign(rps, key=chave_pem, cert=certificado_pem,
+                                        reference_uri='#' + info.get('Id'))
+            rps.getparent().replace(rps, assinado)
+
+        lote = raiz.find('n:LoteRps', ns)
+        raiz = assinador().sign(raiz, key=chave_pem, cert=certificado_pem, reference_uri='#' + lote.get('Id'))
+        return etree.tostring(raiz, encoding='utf-8')
+    except Exception as e:
+        logger.error("❌ Erro ao assinar lote RPS: %s", e)
+        return None
+
+
+def envio_recusado(erro: Exception) -> bool:
+    """
+    Erro de envio que garante que o lote não foi recebido
+
+    Conexão recusada ou sem resposta ao conectar (o lote nem saiu) e resposta
+    HTTP de erro do webservice (4xx ou SOAP fault 500). Timeout de leitura,
+    conexão interrompida e gateway sem resposta (502-504) são indeterminados.
+    """
+    if isinstance(erro, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(erro, requests.exceptions.HTTPError) and erro.response is not None:
+        return erro.response.status_code <= 500
+    if isinstance(erro, requests.exceptions.ConnectionError):
+        causa = erro.args[0] if erro.args else None
+        return isinstance(getattr(causa, 'reason', causa), urllib3.exceptions.NewConnectionError)
+    return False
+
+
+def envelope_soap(operacao: str, dados: bytes, versao: str) -> bytes:
+    """Envelope SOAP 1.1 no padrão ABRASF 2.x (cabeçalho e dados como texto)"""
+    cabecalho = (f'<cabecalho xmlns="{NS_ABRASF}" versao="{versao}">'
+                 f'<versaoDados>{versao}</versaoDados></cabecalho>')
+    return (
+        f'<?xml version="1.0" encoding="utf-8"?>'
+        f'<soap:Envelope xmlns:soap="{NS_SOAP}"><soap:Body>'
+        f'<{operacao}Request xmlns="http://nfse.abrasf.org.br">'
+        f'<nfseCabecMsg>{escape(cabecalho)}</nfseCabecMsg>'
+        f'<nfseDadosMsg>{escape(dados.decode("utf-8"))}</nfseDadosMsg>'
+        f'</{operacao}Request></soap:Body></soap:Envelope>'
+    ).encode('utf-8')
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _texto(elemento, nome: str) -> Optional[str]:
+    """Texto do primeiro descendente com o nome local informado (ignora namespaces)"""
+    for item in elemento.iter():
+        if _local(item.tag) == nome and item.text:
+            return item.text.strip()
+    return None
+
+
+def extrair_resposta(conteudo: bytes) -> ET.Element:
+    """Abre o envelope SOAP e retorna o XML da resposta ABRASF (que pode vir como texto escapado)"""
+    envelope = ET.fromstring(conteudo)
+    for item in envelope.iter():
+        if _local(item.tag).endswith('Result') or _local(item.tag) == 'outputXML':
+            if len(item):
+                return item[0]
+            if item.text and item.text.strip().startswith('<'):
+                return ET.fromstring(item.text.strip().encode('utf-8'))
+    return envelope
+
+
+def interpretar_erros(resposta: ET.Element) -> List[str]:
+    """Mensagens de ListaMensagemRetorno ('código - mensagem')"""
+    erros = []
+    for item in resposta.iter():
+        if _local(item.tag) == 'MensagemRetorno':
+            erros.append(f"{_texto(item, 'Codigo') or ''} - {_texto(item, 'Mensagem') or ''}".strip(' -'))
+    return erros
+
+
+class ClienteABRASF:
+    """Cliente do webservice ABRASF: envio assíncrono de lotes e consulta do resultado"""
+
+    def __init__(self, settings, caminho_config: Optional[str] = None):
+        self.settings = settings
+        self.config = carregar_configuracao(
+            caminho_config or os.path.join(settings.data_directory, 'abrasf.json')
+        )
+        self.numeracao = NumeracaoRps(os.path.join(settings.data_directory, 'abrasf_numeracao.json'))
+        self.prestador = {
+            'cnpj': settings.prestador_cnpj,
+            'inscricao_municipal': settings.prestador_inscricao_municipal,
+            'codigo_municipio': settings.codigo_municipio
+        }
+        self.session = requests.Session()
+        self.timeout = max(30, settings.timeout)
+
+    def _chamar(self, operacao: str, dados: bytes) -> ET.Element:
+        resposta = self.session.post(
+            self.settings.abrasf_url,
+            data=envelope_soap(operacao, dados, self.config['versao']),
+            headers={'Content-Type': 'text/xml; charset=utf-8',
+                     'SOAPAction': self.config['soap_action'].format(operacao=operacao)},
+            timeout=self.timeout
+        )
+        resposta.raise_for_status()
+        return extrair_resposta(resposta.content)
+
+    def enviar_lote(self, boletos: List[Dict]) -> Dict[str, Any]:
+        """
+        Gera, assina e envia um lote
+
+        Returns:
+            {'lote', 'protocolo' (None se recusado), 'mapa' {número RPS: boleto}, 'erros',
+             'indeterminado' (True se o envio saiu sem resposta: o lote pode ter sido recebido)}
+        """
+        numero_lote, primeiro_rps = self.numeracao.reservar(len(boletos))
+        xml, mapa = gerar_lote_rps(boletos, numero_lote, primeiro_rps, self.prestador, self.config)
+        if self.settings.abrasf_certificado:
+            xml = assinar_lote(xml, self.settings.abrasf_certificado, self.settings.abrasf_senha_certificado)
+            if xml is None:
+                return {'lote': numero_lote, 'protocolo': None, 'mapa': mapa, 'erros': ['assinatura indisponível']}
+
+        try:
+            resposta = self._chamar(self.config['operacao_envio'], xml)
+        except Exception as e:
+            indeterminado = not envio_recusado(e)
+            if indeterminado:
+                logger.error("❌ Lote %s enviado sem resposta - conferir no WebISS antes de reenviar: %s",
+                             numero_lote, e)
+            return {'lote': numero_lote, 'protocolo': None, 'mapa': mapa, 'erros': [str(e)],
+                    'indeterminado': indeterminado}
+        protocolo = _texto(resposta, 'Protocolo')
+        erros = interpretar_erros(resposta)
+        if protocolo:
+            logger.info("📨 Lote %s enviado (%s RPS) - protocolo %s", numero_lote, len(boletos), protocolo)
+        else:
+            logger.error("❌ Lote %s recusado: %s", numero_lote, '; '.join(erros) or 'sem protocolo')
+        return {'lote': numero_lote, 'protocolo': protocolo, 'mapa': mapa, 'erros': erros}
+
+    def consultar_lote(self, protocolo: str) -> Dict[str, Any]:
+        """
+        Consulta o resultado do lote
+
+        Returns:
+            {'processado': bool, 'notas': [{'numero_rps', 'numero', 'codigo_verificacao'}], 'erros': [...]}
+        """
+        ET.register_namespace('', NS_ABRASF)
+        consulta = ET.Element(f'{{{NS_ABRASF}}}ConsultarLoteRpsEnvio')
+        prestador = _filho(consulta, 'Prestador')
+        _filho(_filho(prestador, 'CpfCnpj'), 'Cnpj', re.sub(r'\D', '', self.prestador['cnpj']))
+        _filho(prestador, 'InscricaoMunicipal', self.prestador['inscricao_municipal'])
+        _filho(consulta, 'Protocolo', protocolo)
+
+        resposta = self._chamar(self.config['operacao_consulta'], ET.tostring(consulta, encoding='utf-8'))
+        notas = []
+        for item in resposta.iter():
+            if _local(item.tag) == 'InfNfse':
+                identificacao = next((i for i in item.iter() if _local(i.tag) == 'IdentificacaoRps'), None)
+                notas.append({
+                    'numero': _texto(item, 'Numero'),
+                    'codigo_verificacao': _texto(item, 'CodigoVerificacao'),
+                    'numero_rps': _texto(identificacao, 'Numero') if identificacao is not None else None
+                })
+        erros = interpretar_erros(resposta)
+        # Situação 1/2 ou erro E4: o lote ainda está na fila do município
+        pendente = (_texto(resposta, 'Situacao') in SITUACAO_NAO_PROCESSADO
+                    or any(e.split(' - ')[0] == 'E4' for e in erros))
+        processado = bool(notas) or (bool(erros) and not pendente)
+        return {'processado': processado, 'notas': notas, 'erros': erros}
+
+    def aguardar_lote(self, envio: Dict[str, Any]) -> Dict[str, Any]:
+        """Consulta o lote até ser processado (ou até o prazo configurado)"""
+        prazo = time.monotonic() + float(self.config['prazo_consulta'])
+        while time.monotonic() < prazo:
+            time.sleep(float(self.config['intervalo_consulta']))
+            try:
+                resultado = self.consultar_lote(envio['protocolo'])
+            except Exception as e:
+                logger.warning("⚠️ Erro ao consultar lote %s: %s", envio['lote'], e)
+                continue
+            if resultado['processado']:
+                return resultado
+        return {'processado': False, 'notas': [], 'erros': ['prazo de consulta esgotado'], 'indeterminado': True}
+
+    def emitir(self, boletos: List[Dict]) -> Dict[str, Any]:
+        """
+        Emite os boletos em lotes: envia todos os lotes e consulta os protocolos em paralelo
+
+        Só um lote recusado pelo webservice conta como falha. Envio sem
+        resposta, protocolo sem resultado no prazo ou lote processado sem a
+        NFS-e do RPS (e sem erro) são indeterminados: a nota pode existir, e
+        reenviar geraria outra com um novo número de RPS.
+
+        Returns:
+            {'emitidas': [(boleto, nota)], 'falhas': [(boleto, motivo)],
+             'indeterminadas': [(boleto, nota com 'indeterminado' True, 'lote' e 'protocolo')]}
+        """
+        tamanho = max(1, int(self.config['tamanho_lote']))
+        lotes = [boletos[i:i + tamanho] for i in range(0, len(boletos), tamanho)]
+        emitidas, falhas, indeterminadas = [], [], []
+
+        with ThreadPoolExecutor(max_workers=min(8, len(lotes) or 1)) as executor:
+            envios = list(executor.map(self.enviar_lote, lotes))
+            for envio in envios:
+                if envio['protocolo']:
+                    continue
+                motivo = '; '.join(envio['erros'])
+                if envio.get('indeterminado'):
+                    indeterminadas.extend((b, self._indeterminada(envio, numero_rps, motivo))
+                                          for numero_rps, b in envio['mapa'].items())
+                else:
+                    falhas.extend((b, motivo) for b in envio['mapa'].values())
+            aceitos = [e for e in envios if e['protocolo']]
+            for envio, resultado in zip(aceitos, executor.map(self.aguardar_lote, aceitos)):
+                por_rps = {n['numero_rps']: n for n in resultado['notas']}
+                for numero_rps, boleto in envio['mapa'].items():
+                    nota = por_rps.get(numero_rps)
+                    if nota and nota['numero']:
+                        emitidas.append((boleto, {
+                            'numero': nota['numero'],
+                            'codigo_verificacao': nota['codigo_verificacao'],
+                            'mensagem': f"Lote {envio['lote']} / RPS {numero_rps}",
+                            'url': self.settings.abrasf_url,
+                            'confirmado': True
+                        }))
+                    elif resultado.get('indeterminado') or not resultado['erros']:
+                        motivo = '; '.join(resultado['erros']) or 'RPS sem NFS-e no retorno'
+                        indeterminadas.append((boleto, self._indeterminada(envio, numero_rps, motivo)))
+                    else:
+                        falhas.append((boleto, '; '.join(resultado['erros'])))
+
+        logger.info("📊 ABRASF: %s notas emitidas, %s falhas, %s indeterminadas em %s lotes",
+                    len(emitidas), len(falhas), len(indeterminadas), len(lotes))
+        return {'emitidas': emitidas, 'falhas': falhas, 'indeterminadas': indeterminadas}
+
+    def _indeterminada(self, envio: Dict[str, Any], numero_rps: str, motivo: str) -> Dict[str, Any]:
+        """Nota de resultado desconhecido (mesmo formato das emissões indeterminadas do Selenium/HTTP)"""
+        return {
+            'numero': None,
+            'codigo_verificacao': None,
+            'mensagem': f"Lote {envio['lote']} / RPS {numero_rps} / protocolo {envio['protocolo'] or 'sem protocolo'}: {motivo}",
+            'url': self.settings.abrasf_url,
+            'confirmado': False,
+            'indeterminado': True,
+            'lote': envio['lote'],
+            'protocolo': envio['protocolo']
+        }
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chrome Remoto - Chrome de longa duração com porta de depuração, reaproveitado entre execuções do aplicativo
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import subprocess
+import urllib.request
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Locais usuais do Chrome no Windows (o PATH é consultado antes)
+CAMINHOS_CHROME_WINDOWS = [
+    os.path.join(os.environ.get('PROGRAMFILES', r'C:\Program Files'), r'Google\Chrome\Application\chrome.exe'),
+    os.path.join(os.environ.get('PROGRAMFILES(X86)', r'C:\Program Files (x86)'), r'Google\Chrome\Application\chrome.exe'),
+    os.path.join(os.environ.get('LOCALAPPDATA', ''), r'Google\Chrome\Application\chrome.exe'),
+]
+
+
+def versao_remota(porta: int, timeout: float = 0.5) -> Optional[Dict]:
+    """
+    Consulta /json/version do Chrome na porta de depuração
+
+    Returns:
+        Dados da versão (Browser, webSocketDebuggerUrl...) ou None se não há Chrome escutando
+    """
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{porta}/json/version", timeout=timeout) as resposta:
+            return json.loads(resposta.read().decode('utf-8'))
+    except Exception:
+        return None
+
+
+def localizar_chrome() -> Optional[str]:
+    """Caminho do executável do Chrome (PATH primeiro, depois os locais padrão do Windows)"""
+    for nome in ('chrome', 'google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser'):
+        caminho = shutil.which(nome)
+        if caminho:
+            return caminho
+    if sys.platform == 'darwin':
+        caminho = '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome'
+        return caminho if os.path.exists(caminho) else None
+    for caminho in CAMINHOS_CHROME_WINDOWS:
+        if os.path.exists(caminho):
+            return caminho
+    return None
+
+
+def iniciar_chrome_remoto(porta: int, perfil_dir: str, argumentos: Optional[List[str]] = None,
+                          prazo: float = 20) -> bool:
+    """
+    Lança um Chrome independente do aplicativo, escutando na porta de depuração
+
+    O processo é desacoplado (sobrevive ao fechamento do aplicativo) e usa um
+    perfil próprio, onde ficam os cookies da sessão do WebISS.
+
+    Args:
+        porta: Porta de depuração remota
+        perfil_dir: Pasta do perfil dedicado (--user-data-dir)
+        argumentos: Argumentos extras da linha de comando do Chrome
+        prazo: Segundos aguardando a porta responder
+
+    Returns:
+        bool: True se o Chrome está respondendo na porta
+    """
+    executavel = localizar_chrome()
+    if not executavel:
+        logger.error("❌ Executável do Chrome não encontrado para o modo de depuração remota")
+        return False
+
+    os.makedirs(perfil_dir, exist_ok=True)
+    comando = [executavel, f"--remote-debugging-port={porta}", f"--user-data-dir={os.path.abspath(perfil_dir)}",
+               "--no-first-run", "--no-default-browser-check"] + (argumentos or [])
+    opcoes = {'stdin': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL}
+    if sys.platform == 'win32':
+        opcoes['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        opcoes['start_new_session'] = True
+
+    logger.info("🌐 Iniciando Chrome com depuração remota na porta %s...", porta)
+    subprocess.Popen(comando, **opcoes)
+    limite = time.monotonic() + prazo
+    while time.monotonic() < limite:
+        if versao_remota(porta):
+            logger.info("✅ Chrome escutando na porta %s", porta)
+            return True
+        time.sleep(0.2)
+    logger.error("❌ Chrome não respondeu na porta %s em %.0fs", porta, prazo)
+    return False
+
+
+def garantir_chrome_remoto(porta: int, perfil_dir: str, argumentos: Optional[List[str]] = None) -> bool:
+    """Reaproveita o Chrome já escutando na porta ou lança um novo"""
+    versao = versao_remota(porta)
+    if versao:
+        logger.info("🔗 Chrome já em execução na porta %s (%s)", porta, versao.get('Browser', '?'))
+        return True
+    return iniciar_chrome_remoto(porta, perfil_dir, argumentos)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Conciliação de Rascunhos - Associa os rascunhos do WebISS aos boletos pelo tomador e pelo valor
+"""
+
+import re
+import logging
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PADRAO_VALOR = re.compile(r'\d{1,3}(?:\.\d{3})*,\d{2}')
+PADRAO_DOCUMENTO = re.compile(r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}|\d{3}\.\d{3}\.\d{3}-\d{2}|\b\d{14}\b|\b\d{11}\b')
+
+
+def normalizar_nome(nome: str) -> str:
+    """Nome em maiúsculas, sem acentos e com espaços simples"""
+    texto = unicodedata.normalize('NFKD', str(nome or '')).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(texto.upper().split())
+
+
+def valor_float(valor) -> Optional[float]:
+    """Converte '1.234,56', '1234.56' ou número para float"""
+    texto = str(valor if valor is not None else '').strip()
+    if not texto or texto.lower() == 'nan':
+        return None
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    try:
+        return float(texto)
+    except ValueError:
+        return None
+
+
+def nome_contido(nome: str, texto_normalizado: str) -> bool:
+    """Nome normalizado presente no texto como palavras inteiras ('ANA SILVA' não casa com 'JOANA SILVA')"""
+    if not nome:
+        return False
+    return re.search(r'(?<![A-Z0-9])' + re.escape(nome) + r'(?![A-Z0-9])', texto_normalizado) is not None
+
+
+def interpretar_rascunho(linha: Dict) -> Dict:
+    """
+    Extrai documento, valor e nome do tomador do texto de uma linha da lista de rascunhos
+
+    Args:
+        linha: {'texto': texto da linha, 'href': link do rascunho, 'indice': posição, 'pagina': página da grade}
+    """
+    texto = linha.get('texto', '')
+    documento = PADRAO_DOCUMENTO.search(texto)
+    valores = PADRAO_VALOR.findall(texto)
+    return dict(linha,
+                documento=re.sub(r'\D', '', documento.group(0)) if documento else '',
+                valor=valor_float(valores[-1]) if valores else None,
+                texto_normalizado=normalizar_nome(texto))
+
+
+def conciliar_rascunhos(boletos: List[Dict], rascunhos: List[Dict]) -> Tuple[List[Tuple[Dict, Dict]], List[Dict]]:
+    """
+    Associa cada boleto a um rascunho com o mesmo tomador e o mesmo valor
+
+    O tomador é comparado pelo CPF/CNPJ quando a linha do rascunho o exibe e,
+    senão, pelo nome completo (palavras inteiras) no texto da linha. Um nome
+    que casa com mais de um rascunho não é conciliado. Cada rascunho é usado
+    uma vez.
+
+    Args:
+        boletos: [{'cpf_cnpj', 'nome_cliente', 'valor', ...}]
+        rascunhos: Linhas já interpretadas por interpretar_rascunho
+
+    Returns:
+        Tupla (pares (boleto, rascunho), boletos sem rascunho)
+    """
+    disponiveis = list(rascunhos)
+    pares = []
+    sem_rascunho = []
+    for boleto in boletos:
+        documento = re.sub(r'\D', '', str(boleto.get('cpf_cnpj') or ''))
+        nome = normalizar_nome(boleto.get('nome_cliente'))
+        valor = valor_float(boleto.get('valor'))
+
+        escolhido = None
+        por_nome = []
+        for rascunho in disponiveis:
+            if valor is None or rascunho.get('valor') is None or abs(rascunho['valor'] - valor) >= 0.005:
+                continue
+            if rascunho.get('documento'):
+                if documento and rascunho['documento'] == documento:
+                    escolhido = rascunho
+                    break
+            elif nome_contido(nome, rascunho.get('texto_normalizado', '')):
+                por_nome.append(rascunho)
+
+        if not escolhido and len(por_nome) == 1:
+            escolhido = por_nome[0]
+        elif not escolhido and len(por_nome) > 1:
+            logger.warning("⚠️ %s rascunhos de mesmo valor para o nome '%s' - boleto não conciliado", len(por_nome), nome)
+
+        if escolhido:
+            disponiveis.remove(escolhido)
+            pares.append((boleto, escolhido))
+        else:
+            sem_rascunho.append(boleto)
+
+    logger.info("Conciliação de rascunhos: %s pares, %s boletos sem rascunho, %s rascunhos sem boleto",
+                len(pares), len(sem_rascunho), len(disponiveis))
+    return pares, sem_rascunho
@@ -42,7 +42,7 @@ class DataProcessor:
                     for sep in separators:
                         try:
                             self.data = pd.read_csv(file_path, encoding=encoding, sep=sep)
-                            logger.info(f"CSV carregado com encoding {encoding} e separador '{sep}'")
+                            logger.info("CSV carregado com encoding %s e separador '%s'", encoding, sep)
                             break
                         except UnicodeDecodeError:
                             continue
@@ -58,14 +58,14 @@ class DataProcessor:
             elif file_path.suffix.lower() in ['.xlsx', '.xls']:
                 self.data = pd.read_excel(file_path)
             else:
-                logger.error(f"Formato de arquivo não suportado: {file_path.suffix}")
+                logger.error("Formato de arquivo não suportado: %s", file_path.suffix)
                 return False
                 
-            logger.info(f"Dados carregados com sucesso: {len(self.data)} registros")
+            logger.info("Dados carregados com sucesso: %s registros", len(self.data))
             return True
             
         except Exception as e:
-            logger.error(f"Erro ao carregar dados: {e}")
+            logger.error("Erro ao carregar dados: %s", e)
             return False
     
     def get_columns(self) -> List[str]:
@@ -100,17 +100,17 @@ class DataProcessor:
                     if data_column in row:
                         record[webiss_field] = row[data_column]
                     else:
-                        logger.warning(f"Coluna {data_column} não encontrada no registro {index}")
+                        logger.warning("Coluna %s não encontrada no registro %s", data_column, index)
                         record[webiss_field] = ""
                 
                 processed.append(record)
             
             self.processed_data = processed
-            logger.info(f"Dados processados: {len(processed)} registros")
+            logger.info("Dados processados: %s registros", len(processed))
             return processed
             
         except Exception as e:
-            logger.error(f"Erro ao processar dados: {e}")
+            logger.error("Erro ao processar dados: %s", e)
             return []
     
     def get_processed_data(self) -> List[Dict[str, Any]]:
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor HTTP - Emite a NFS-e repetindo os posts do wizard do WebISS sem navegador
+"""
+
+import os
+import re
+import json
+import time
+import logging
+from html import unescape
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+from urllib.parse import urljoin, quote
+
+import requests
+
+from utils.option_catalog import CatalogoOpcoes, SELECTS_CATALOGO
+from utils.inscricao_resolver import escolher_opcao, somente_digitos
+
+logger = logging.getLogger(__name__)
+
+# Endpoints e nomes de campos do wizard; sobrescritos por data/motor_http.json.
+# Os caminhos aceitam {cpf_cnpj} e {valor} (valor da opção da inscrição).
+CONFIGURACAO_PADRAO = {
+    'endpoints': {
+        'wizard': '/NotaFiscal/Criar',
+        'inscricoes': '/Pessoa/Inscricoes?cpfCnpj={cpf_cnpj}',
+        'endereco_inscricao': '/Inscricao/Endereco?id={valor}',
+        'emitir': '/NotaFiscal/Emitir'
+    },
+    'campos': {
+        'cpf_cnpj': 'Tomador.CpfCnpj',
+        'inscricao': 'Tomador.Inscricao_Id',
+        'ano': 'AnoDaCompetencia',
+        'mes': 'MesDaCompetencia',
+        'atividade': 'ItemListaServico_Id',
+        'cnae': 'CnaeAtividade_Id',
+        'valor': 'ValorServicos',
+        'descricao': 'Discriminacao'
+    },
+    'descricao': 'prestação de serviços educacionais'
+}
+
+CAMPO_TOKEN = '__RequestVerificationToken'
+
+# Texto que só aparece na confirmação de uma nota emitida (mensagem, código de verificação ou número da NFS-e)
+MARCADOR_SUCESSO = re.compile(
+    r'(?:nota\s+fiscal|nfs-?e)[^.]{0,40}\b(?:emitida|gerada)|emitida\s+com\s+sucesso'
+    r'|c[oó]digo\s+de\s+verifica[cç][aã]o|n[uú]mero\s+da\s+(?:nota|nfs-?e)[^\d]{0,20}\d+|nfs-?e\s*n[º°]\.?\s*\d+',
+    re.IGNORECASE
+)
+
+
+class LeitorFormulario(HTMLParser):
+    """Lê do HTML do wizard os campos ocultos (token anti-forgery incluído) e as opções dos selects"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.ocultos: Dict[str, str] = {}
+        self.selects: Dict[str, List[Dict]] = {}
+        self._select: Optional[str] = None
+        self._opcao: Optional[Dict] = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'input' and (attrs.get('type') or '').lower() == 'hidden' and attrs.get('name'):
+            self.ocultos[attrs['name']] = attrs.get('value') or ''
+        elif tag == 'select':
+            self._select = attrs.get('id') or attrs.get('name')
+            if self._select:
+                self.selects.setdefault(self._select, [])
+        elif tag == 'option' and self._select:
+            self._opcao = {'valor': attrs.get('value') or '', 'texto': ''}
+            self.selects[self._select].append(self._opcao)
+
+    def handle_data(self, data):
+        if self._opcao is not None:
+            self._opcao['texto'] += data
+
+    def handle_endtag(self, tag):
+        if tag == 'option' and self._opcao is not None:
+            self._opcao['texto'] = self._opcao['texto'].strip()
+            self._opcao = None
+        elif tag == 'select':
+            self._select = None
+
+
+def carregar_configuracao(caminho: str) -> Dict[str, Any]:
+    """Configuração padrão mesclada com o arquivo JSON (se existir)"""
+    configuracao = json.loads(json.dumps(CONFIGURACAO_PADRAO))
+    try:
+        if caminho and os.path.exists(caminho):
+            with open(caminho, 'r', encoding='utf-8') as f:
+                arquivo = json.load(f)
+            for chave, valor in arquivo.items():
+                if isinstance(valor, dict):
+                    configuracao.setdefault(chave, {}).update(valor)
+                else:
+                    configuracao[chave] = valor
+            logger.info("Configuração do motor HTTP carregada de %s", caminho)
+    except Exception as e:
+        logger.warning("Erro ao carregar configuração do motor HTTP: %s", e)
+    return configuracao
+
+
+def interpretar_resposta_emissao(resposta) -> Dict[str, Any]:
+    """
+    Interpreta a resposta do post de emissão (JSON ou HTML)
+
+    Só há sucesso com evidência positiva (número da NFS-e ou texto de
+    confirmação): uma página 200 qualquer, como o login após a sessão
+    expirar, não conta como nota emitida. Recusa é a rejeição explícita
+    (HTTP 4xx, erros/sucesso falso no JSON, alerta de erro na página):
+    a nota certamente não foi gerada.
+
+    Returns:
+        {'sucesso': bool, 'recusada': bool, 'numero', 'codigo_verificacao', 'mensagem'}
+    """
+    texto = resposta.text or ''
+    try:
+        dados = resposta.json()
+    except ValueError:
+        dados = None
+
+    if isinstance(dados, dict):
+        planos = {}
+        pilha = [dados]
+        while pilha:
+            item = pilha.pop()
+            for chave, valor in item.items():
+                if isinstance(valor, dict):
+                    pilha.append(valor)
+                else:
+                    planos.setdefault(chave.lower(), valor)
+        erros = planos.get('erros') or planos.get('errors') or planos.get('erro')
+        numero = next((v for c, v in planos.items() if 'numero' in c and 'rps' not in c and v), None)
+        sucesso = planos.get('sucesso', planos.get('success', numero is not None))
+        codigo = next((v for c, v in planos.items() if 'verificacao' in c and v), None)
+        mensagem = planos.get('mensagem') or planos.get('message') or (erros if erros else '')
+        recusada = 400 <= resposta.status_code < 500 or bool(erros) or sucesso is False
+        return {
+            'sucesso': resposta.ok and bool(sucesso) and not erros,
+            'recusada': recusada,
+            'numero': str(numero) if numero is not None else None,
+            'codigo_verificacao': str(codigo) if codigo is not None else None,
+            'mensagem': mensagem if isinstance(mensagem, str) else json.dumps(mensagem, ensure_ascii=False)
+        }
+
+    # HTML: mensagem de erro da página ou texto de confirmação
+    erro = re.search(r'class="[^"]*(?:alert-danger|validation-summary-errors)[^"]*"[^>]*>(.*?)</', texto, re.S)
+    login = re.search(r'<input[^>]+type=["\']?password', texto, re.IGNORECASE)
+    corpo = ' '.join(unescape(re.sub(r'<[^>]+>', ' ', texto)).split())
+    numero = re.search(r'(?:nfs-?e|n[uú]mero)[^\d]{0,20}(\d+)', corpo, re.IGNORECASE)
+    codigo = re.search(r'c[oó]digo\s+de\s+verifica[cç][aã]o\s*:?\s*([A-Z0-9\-]{4,})', corpo, re.IGNORECASE)
+    confirmada = bool(MARCADOR_SUCESSO.search(corpo))
+    return {
+        'sucesso': resposta.ok and not erro and not login and confirmada,
+        'recusada': 400 <= resposta.status_code < 500 or bool(erro),
+        'numero': numero.group(1) if numero else None,
+        'codigo_verificacao': codigo.group(1) if codigo else None,
+        'mensagem': ' '.join(unescape(re.sub(r'<[^>]+>', ' ', erro.group(1))).split()) if erro else corpo[:300]
+    }
+
+
+
+def resultado_indeterminado(mensagem: str, url: Optional[str] = None) -> Dict[str, Any]:
+    """Resultado de uma emissão enviada ao servidor sem confirmação (pode ou não ter gerado a NFS-e)"""
+    return {
+        'numero': None,
+        'codigo_verificacao': None,
+        'mensagem': mensagem,
+        'url': url,
+        'confirmado': False,
+        'indeterminado': True
+    }
+
+
+class MotorHTTP:
+    """
+    Emite notas com uma requests.Session que reaproveita os cookies do login feito no Selenium
+
+    Cada nota custa um GET do wizard (token anti-forgery e campos ocultos), a
+    consulta da inscrição do tomador (quando não está no cache) e o post de
+    emissão. Falhas antes do post e recusas explícitas do post retornam None
+    para que o chamador use o Selenium; depois do post, o resultado sem
+    confirmação nem recusa (timeout, 2xx ambíguo, 5xx) é indeterminado.
+    """
+
+    # Recusas seguidas do post de emissão que indicam endpoint ou campos errados em motor_http.json
+    LIMITE_RECUSAS = 3
+
+    def __init__(self, settings, inscricao_cache=None, caminho_config: Optional[str] = None):
+        self.settings = settings
+        self.inscricao_cache = inscricao_cache
+        self.config = carregar_configuracao(
+            caminho_config or os.path.join(settings.data_directory, 'motor_http.json')
+        )
+        self.base_url = settings.webiss_url
+        self.session = requests.Session()
+        self.session.headers.update({'X-Requested-With': 'XMLHttpRequest'})
+        self.catalogo = CatalogoOpcoes(None)
+        self.recusas_seguidas = 0
+
+    @property
+    def desativado(self) -> bool:
+        """True após LIMITE_RECUSAS recusas seguidas: o restante do lote deve ir para o Selenium"""
+        return self.recusas_seguidas >= self.LIMITE_RECUSAS
+
+    def importar_cookies(self, driver) -> bool:
+        """Copia os cookies e o user-agent da sessão logada no Selenium"""
+        try:
+            self.base_url = driver.current_url or self.base_url
+            cookies = driver.get_cookies()
+            for cookie in cookies:
+                self.session.cookies.set(cookie['name'], cookie['value'],
+                                         domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+            user_agent = driver.execute_script("return navigator.userAgent")
+            if user_agent:
+                self.session.headers['User-Agent'] = user_agent
+            logger.info("🍪 %s cookies da sessão Selenium importados para o motor HTTP", len(cookies))
+            return bool(cookies)
+        except Exception as e:
+            logger.error("Erro ao importar cookies do Selenium: %s", e)
+            return False
+
+    def _url(self, nome: str, **parametros) -> str:
+        caminho = self.config['endpoints'][nome]
+        for chave, valor in parametros.items():
+            caminho = caminho.replace('{' + chave + '}', quote(str(valor), safe=''))
+        return urljoin(self.base_url, caminho)
+
+    def abrir_wizard(self) -> Optional[LeitorFormulario]:
+        """Lê o formulário do wizard: campos ocultos e opções dos selects (catálogo da sessão)"""
+        resposta = self.session.get(self._url('wizard'), timeout=self.settings.timeout)
+        if not resposta.ok:
+            logger.error("Motor HTTP: wizard retornou %s", resposta.status_code)
+            return None
+        leitor = LeitorFormulario()
+        leitor.feed(resposta.text)
+        if CAMPO_TOKEN not in leitor.ocultos:
+            # Sem token o wizard provavelmente redirecionou para o login
+            logger.error("Motor HTTP: token anti-forgery ausente no wizard (sessão expirada?)")
+            return None
+        for select_id in SELECTS_CATALOGO:
+            if len(self.catalogo.catalogo.get(select_id, [])) <= 1 and leitor.selects.get(select_id):
+                self.catalogo.catalogo[select_id] = leitor.selects[select_id]
+        return leitor
+
+    def resolver_inscricao(self, cpf_cnpj: str, cep: str) -> Optional[str]:
+        """Valor da inscrição do tomador com o CEP informado (cache primeiro, depois o endpoint)"""
+        if self.inscricao_cache:
+            conhecida = self.inscricao_cache.consultar(cpf_cnpj, cep)
+            if conhecida:
+                self.inscricao_cache.registrar('acertos')
+                return conhecida['valor']
+
+        resposta = self.session.get(self._url('inscricoes', cpf_cnpj=cpf_cnpj), timeout=self.settings.timeout)
+        if not resposta.ok:
+            return None
+        lista = resposta.json()
+        if isinstance(lista, dict):
+            lista = next((v for v in lista.values() if isinstance(v, list)), [])
+        opcoes = []
+        for item in lista:
+            valor = str(item.get('Id') or item.get('id') or item.get('Value') or item.get('valor') or '')
+            texto = str(item.get('Text') or item.get('texto') or item.get('Descricao') or valor)
+            cep_item = item.get('Cep') or item.get('cep')
+            if valor and not cep_item:
+                endereco = self.session.get(self._url('endereco_inscricao', valor=valor), timeout=self.settings.timeout)
+                cep_item = re.search(r'\d{5}-?\d{3}', endereco.text or '') if endereco.ok else None
+                cep_item = cep_item.group(0) if cep_item else None
+            opcoes.append({'valor': valor, 'texto': texto, 'cep': cep_item})
+
+        escolhida = escolher_opcao(opcoes, cep)
+        if not escolhida and len(opcoes) == 1:
+            escolhida = opcoes[0]
+        if not escolhida:
+            logger.warning("Motor HTTP: nenhuma inscrição de %s com CEP %s", cpf_cnpj, cep)
+            return None
+        if self.inscricao_cache:
+            self.inscricao_cache.registrar('ausentes')
+            self.inscricao_cache.gravar(cpf_cnpj, cep, escolhida['valor'], escolhida['texto'])
+        return escolhida['valor']
+
+    def montar_formulario(self, leitor: LeitorFormulario, dados: Dict[str, Any],
+                          inscricao: Optional[str]) -> Optional[Dict[str, str]]:
+        """Formulário completo do wizard (campos ocultos + Tomador, Serviços e Valores)"""
+        campos = self.config['campos']
+        formulario = dict(leitor.ocultos)
+        formulario[campos['cpf_cnpj']] = somente_digitos(dados.get('cpf_cnpj'))
+        if inscricao:
+            formulario[campos['inscricao']] = inscricao
+
+        vencimento = str(dados.get('vencimento') or '')
+        if vencimento.count('/') == 2:
+            _, mes, ano = vencimento.split('/')
+            formulario[campos['ano']] = ano
+            opcao_mes = self.catalogo.buscar_por_codigo('MesDaCompetencia', int(mes))
+            formulario[campos['mes']] = opcao_mes['valor'] if opcao_mes else str(int(mes))
+
+        for chave, select_id in (('atividade', 'lista-de-servicos-prestador'), ('cnae', 'CnaeAtividade_Id')):
+            opcao = self.catalogo.buscar_por_codigo(select_id, dados.get(chave))
+            if not opcao:
+                logger.warning("Motor HTTP: opção de %s '%s' não encontrada", chave, dados.get(chave))
+                return None
+            formulario[campos[chave]] = opcao['valor']
+
+        valor = str(dados.get('valor') or '').strip()
+        if not valor:
+            return None
+        formulario[campos['valor']] = valor.replace('.', ',') if ',' not in valor else valor
+        formulario[campos['descricao']] = self.config.get('descricao', '')
+        return formulario
+
+    def emitir(self, dados: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Emite uma nota apenas com requisições HTTP
+
+        Returns:
+            Dict com 'numero', 'codigo_verificacao', 'mensagem', 'url' e
+            'confirmado' (mesmo formato de emitir_nota_fiscal); com
+            'indeterminado' True se o post de emissão foi enviado sem
+            confirmação (não reemitir sem conferir no WebISS); ou None se o
+            post não chegou a ser enviado ou foi recusado, e o Selenium pode
+            assumir o boleto
+        """
+        inicio = time.perf_counter()
+        try:
+            leitor = self.abrir_wizard()
+            if leitor is None:
+                return None
+            inscricao = self.resolver_inscricao(dados.get('cpf_cnpj', ''), dados.get('cep', ''))
+            formulario = self.montar_formulario(leitor, dados, inscricao)
+            if formulario is None:
+                return None
+        except Exception as e:
+            logger.error("❌ Motor HTTP: erro ao preparar a emissão: %s", e)
+            return None
+
+        # A partir daqui o servidor pode ter processado o post (timeout de leitura, conexão
+        # interrompida): qualquer resultado sem confirmação é indeterminado, nunca None
+        url_emissao = self._url('emitir')
+        try:
+            resposta = self.session.post(
+                url_emissao, data=formulario, timeout=self.settings.timeout,
+                headers={'RequestVerificationToken': leitor.ocultos[CAMPO_TOKEN]}
+            )
+            resultado = interpretar_resposta_emissao(resposta)
+        except Exception as e:
+            logger.error("❌ Motor HTTP: post de emissão sem resposta: %s", e)
+            return resultado_indeterminado(f"post de emissão sem resposta: {e}", url_emissao)
+
+        if resultado['recusada']:
+            self.recusas_seguidas += 1
+            logger.error("❌ Motor HTTP: emissão recusada (HTTP %s): %s",
+                         resposta.status_code, resultado['mensagem'])
+            return None
+        self.recusas_seguidas = 0
+        if not resultado['sucesso']:
+            logger.error("❌ Motor HTTP: emissão sem confirmação: %s", resultado['mensagem'])
+            return resultado_indeterminado(resultado['mensagem'] or 'emissão sem confirmação', resposta.url)
+
+        logger.info("✅ Motor HTTP: nota %s emitida em %.2fs",
+                    resultado['numero'] or 'sem número', time.perf_counter() - inicio)
+        return {
+            'numero': resultado['numero'],
+            'codigo_verificacao': resultado['codigo_verificacao'],
+            'mensagem': resultado['mensagem'],
+            'url': resposta.url,
+            'confirmado': bool(resultado['numero'])
+        }
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache de Inscrições - Lembra qual inscrição municipal corresponde a cada tomador/CEP
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def chave_inscricao(cpf_cnpj: str, cep: str) -> str:
+    """Chave do cache: dígitos do CPF/CNPJ e do CEP"""
+    digitos_doc = re.sub(r'\D', '', str(cpf_cnpj or ''))
+    digitos_cep = re.sub(r'\D', '', str(cep or ''))
+    return f"{digitos_doc}|{digitos_cep}"
+
+
+class InscricaoCache:
+    """Cache persistente (CPF/CNPJ, CEP) → opção da inscrição municipal, com taxa de acerto por lote"""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self.inscricoes: Dict[str, Dict] = {}
+        self.endpoint_endereco: Optional[str] = None
+        self._lock = threading.Lock()
+        self.iniciar_lote()
+        self.carregar()
+
+    def carregar(self):
+        """Carrega as inscrições aprendidas em execuções anteriores"""
+        try:
+            if os.path.exists(self.caminho):
+                with open(self.caminho, 'r', encoding='utf-8') as f:
+                    conteudo = json.load(f)
+                self.inscricoes = conteudo.get('inscricoes', {})
+                self.endpoint_endereco = conteudo.get('endpoint_endereco')
+                logger.info("Cache de inscrições carregado: %s tomadores", len(self.inscricoes))
+        except Exception as e:
+            logger.warning("Erro ao carregar cache de inscrições: %s", e)
+            self.inscricoes = {}
+
+    def salvar(self):
+        """Persiste o cache em disco"""
+        try:
+            diretorio = os.path.dirname(self.caminho)
+            if diretorio and not os.path.exists(diretorio):
+                os.makedirs(diretorio)
+            with self._lock:
+                conteudo = {
+                    'atualizado_em': datetime.now().isoformat(timespec='seconds'),
+                    'endpoint_endereco': self.endpoint_endereco,
+                    'inscricoes': dict(self.inscricoes)
+                }
+            with open(self.caminho, 'w', encoding='utf-8') as f:
+                json.dump(conteudo, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.warning("Erro ao salvar cache de inscrições: %s", e)
+
+    def consultar(self, cpf_cnpj: str, cep: str) -> Optional[Dict]:
+        """Retorna {'valor', 'texto'} da opção que casou da última vez, ou None"""
+        if not cpf_cnpj or not cep:
+            return None
+        return self.inscricoes.get(chave_inscricao(cpf_cnpj, cep))
+
+    def gravar(self, cpf_cnpj: str, cep: str, valor: str, texto: str):
+        """Registra a opção que corresponde ao tomador/CEP"""
+        if not cpf_cnpj or not cep:
+            return
+        with self._lock:
+            self.inscricoes[chave_inscricao(cpf_cnpj, cep)] = {
+                'valor': valor,
+                'texto': texto,
+                'atualizado_em': datetime.now().isoformat(timespec='seconds')
+            }
+        self.salvar()
+
+    def remover(self, cpf_cnpj: str, cep: str):
+        """Descarta uma entrada que não confere mais com a página"""
+        with self._lock:
+            removido = self.inscricoes.pop(chave_inscricao(cpf_cnpj, cep), None)
+        if removido:
+            self.salvar()
+
+    def gravar_endpoint(self, url_modelo: str):
+        """Registra o modelo de URL (com '{valor}') que a página usa para carregar o endereço da inscrição"""
+        if url_modelo and url_modelo != self.endpoint_endereco:
+            self.endpoint_endereco = url_modelo
+            logger.info("📌 Endpoint de endereço da inscrição aprendido: %s", url_modelo)
+            self.salvar()
+
+    def descartar_endpoint(self):
+        """Esquece o endpoint aprendido (a consulta paralela não conferiu) para que seja aprendido de novo"""
+        if self.endpoint_endereco:
+            logger.info("🗑️ Endpoint de endereço da inscrição descartado: %s", self.endpoint_endereco)
+            self.endpoint_endereco = None
+            self.salvar()
+
+    def iniciar_lote(self):
+        """Zera os contadores de acerto do lote"""
+        with self._lock:
+            self.lote = {'acertos': 0, 'divergencias': 0, 'ausentes': 0}
+
+    def registrar(self, resultado: str):
+        """Conta uma consulta do lote ('acertos', 'divergencias' ou 'ausentes')"""
+        with self._lock:
+            self.lote[resultado] = self.lote.get(resultado, 0) + 1
+
+    def resumo_lote(self) -> Dict:
+        """Contadores do lote e taxa de acerto (0 a 1, ou None sem consultas)"""
+        with self._lock:
+            resumo = dict(self.lote)
+        consultas = sum(resumo.values())
+        resumo['consultas'] = consultas
+        resumo['taxa_acerto'] = resumo['acertos'] / consultas if consultas else None
+        return resumo
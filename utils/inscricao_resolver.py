@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Resolvedor de Inscrições - Consulta em paralelo, dentro da página, o endereço de cada inscrição municipal
+"""
+
+import re
+import logging
+from typing import Dict, List, Optional
+from urllib.parse import unquote
+
+logger = logging.getLogger(__name__)
+
+# Função selectDe(alvo) compartilhada pelos scripts abaixo: o próprio <select>
+# ou o select por trás do container select2 ('s2id_...')
+SELECT_DE_JS = """
+function selectDe(alvo) {
+    if (!alvo || alvo.tagName === 'SELECT') { return alvo; }
+    return (alvo.id && document.getElementById(alvo.id.replace(/^s2id_/, ''))) ||
+           (alvo.nextElementSibling && alvo.nextElementSibling.tagName === 'SELECT' ? alvo.nextElementSibling : null);
+}
+"""
+
+# Recebe o <select> (ou o container select2 's2id_...'), o modelo de URL com
+# '{valor}' e o prazo em ms. Lê todas as opções, consulta o endpoint de
+# endereço de todas ao mesmo tempo (Promise.all) e devolve [{valor, texto, cep}].
+RESOLVER_JS = SELECT_DE_JS + """
+var alvo = arguments[0];
+var modelo = arguments[1];
+var prazo = arguments[2];
+var callback = arguments[arguments.length - 1];
+
+var select = selectDe(alvo);
+if (!select || !window.fetch || !window.Promise) { callback(null); return; }
+
+function extrairCep(texto) {
+    try {
+        var pilha = [JSON.parse(texto)];
+        while (pilha.length) {
+            var item = pilha.pop();
+            if (item && typeof item === 'object') {
+                for (var chave in item) {
+                    if (/cep/i.test(chave) && item[chave]) { return String(item[chave]); }
+                    pilha.push(item[chave]);
+                }
+            }
+        }
+    } catch (e) {}
+    var m = String(texto).match(/\\d{5}-?\\d{3}/);
+    return m ? m[0] : null;
+}
+
+var opcoes = Array.prototype.filter.call(select.options, function(o) {
+    return o.value && o.value !== '-1';
+});
+var tempo = setTimeout(function() { callback(null); }, prazo);
+
+Promise.all(opcoes.map(function(o) {
+    var url = modelo.replace('{valor}', encodeURIComponent(o.value));
+    return fetch(url, {credentials: 'same-origin', headers: {'X-Requested-With': 'XMLHttpRequest'}})
+        .then(function(r) { return r.ok ? r.text() : ''; })
+        .then(function(t) { return {valor: o.value, texto: o.text, cep: extrairCep(t)}; })
+        .catch(function() { return {valor: o.value, texto: o.text, cep: null}; });
+})).then(function(lista) {
+    clearTimeout(tempo);
+    callback(lista);
+});
+"""
+
+# Define a opção uma única vez (via jQuery quando existir, para atualizar o select2).
+# Valor que não está entre as opções: retorna false sem alterar a seleção.
+SELECIONAR_JS = SELECT_DE_JS + """
+var alvo = arguments[0];
+var valor = arguments[1];
+var select = selectDe(alvo);
+if (!select || !Array.prototype.some.call(select.options, function(o) { return o.value === valor; })) {
+    return false;
+}
+if (window.jQuery) {
+    window.jQuery(select).val(valor).trigger('change');
+} else {
+    select.value = valor;
+    select.dispatchEvent(new Event('change'));
+}
+select.dispatchEvent(new Event('input'));
+return select.value === valor;
+"""
+
+# Valor e texto da opção selecionada no <select> (ou no select por trás do container select2)
+OPCAO_SELECIONADA_JS = SELECT_DE_JS + """
+var alvo = arguments[0];
+var select = selectDe(alvo);
+if (!select || select.selectedIndex < 0) { return null; }
+var opcao = select.options[select.selectedIndex];
+return {valor: opcao.value, texto: opcao.text};
+"""
+
+
+def somente_digitos(valor) -> str:
+    """Remove tudo que não for dígito"""
+    return re.sub(r'\D', '', str(valor or ''))
+
+
+def escolher_opcao(resultados: List[Dict], cep_desejado: str) -> Optional[Dict]:
+    """Retorna a primeira opção cujo CEP (apenas dígitos) coincide com o desejado"""
+    alvo = somente_digitos(cep_desejado)
+    if not alvo:
+        return None
+    for resultado in resultados or []:
+        if somente_digitos(resultado.get('cep')) == alvo:
+            return resultado
+    return None
+
+
+def deduzir_modelo_url(urls: List[str], valor_opcao: str) -> Optional[str]:
+    """
+    Deduz o modelo do endpoint de endereço a partir das URLs requisitadas pela página
+
+    Procura, da mais recente para a mais antiga, a URL que contém o valor da
+    opção recém-selecionada e substitui esse valor por '{valor}'.
+    """
+    if not valor_opcao:
+        return None
+    padrao = re.compile(r'(?<![0-9A-Za-z])' + re.escape(str(valor_opcao)) + r'(?![0-9A-Za-z])')
+    for url in reversed(urls or []):
+        url = unquote(str(url))
+        if padrao.search(url):
+            return padrao.sub('{valor}', url, count=1)
+    return None
+
+
+def resolver_inscricoes(driver, elemento, url_modelo: str, timeout: float = 10) -> Optional[List[Dict]]:
+    """
+    Consulta o endereço de todas as inscrições do select em paralelo, dentro da página
+
+    Args:
+        driver: WebDriver ativo
+        elemento: <select> da inscrição ou container select2
+        url_modelo: URL do endpoint de endereço com '{valor}' no lugar do valor da opção
+        timeout: Prazo em segundos para todas as consultas
+
+    Returns:
+        Lista [{'valor', 'texto', 'cep'}] ou None se não foi possível consultar
+    """
+    if not url_modelo or '{valor}' not in url_modelo:
+        return None
+    return driver.execute_async_script(RESOLVER_JS, elemento, url_modelo, int(timeout * 1000))
+
+
+def selecionar_opcao(driver, elemento, valor: str) -> bool:
+    """Seleciona a opção pelo valor, disparando change uma única vez"""
+    return bool(driver.execute_script(SELECIONAR_JS, elemento, valor))
+
+
+def opcao_selecionada(driver, elemento) -> Optional[Dict]:
+    """Opção atualmente selecionada ({'valor', 'texto'}) ou None"""
+    return driver.execute_script(OPCAO_SELECIONADA_JS, elemento)
@@ -58,12 +58,12 @@ class LicenseChecker:
             dias_restantes = (data_expiracao - datetime.now()).days
             
             # Log da verificação
-            logger.info(f"Licença válida para {licenca['dados']['cliente']} - {dias_restantes} dias restantes")
+            logger.info("Licença válida para %s - %s dias restantes", licenca['dados']['cliente'], dias_restantes)
             
             return True, f"Licença válida - {dias_restantes} dias restantes"
             
         except Exception as e:
-            logger.error(f"Erro ao verificar licença: {e}")
+            logger.error("Erro ao verificar licença: %s", e)
             return False, f"Erro ao verificar licença: {e}"
     
     def _encontrar_arquivo_licenca(self):
@@ -104,5 +104,5 @@ class LicenseChecker:
             }
             
         except Exception as e:
-            logger.error(f"Erro ao obter informações da licença: {e}")
+            logger.error("Erro ao obter informações da licença: %s", e)
             return None 
\ No newline at end of file
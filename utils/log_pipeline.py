@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pipeline de Logging - Fila assíncrona, arquivos rotativos e saída estruturada em JSON-lines
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from datetime import date, datetime
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+FORMATO_TEXTO = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Contexto da thread atual (boleto e etapa do wizard), anexado a cada registro
+_contexto = threading.local()
+
+# Listener ativo (um por processo)
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler_fila: Optional[logging.handlers.QueueHandler] = None
+
+
+def definir_contexto(boleto_id=None, etapa=None):
+    """Define o boleto e a etapa anexados aos registros de log emitidos pela thread atual"""
+    _contexto.boleto_id = None if boleto_id is None else str(boleto_id)
+    _contexto.etapa = etapa
+
+
+class FiltroContexto(logging.Filter):
+    """Acrescenta boleto_id e etapa ao registro (executado na thread que emitiu o log)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.boleto_id = getattr(_contexto, 'boleto_id', None)
+        record.etapa = getattr(_contexto, 'etapa', None)
+        return True
+
+
+class FormatadorJSON(logging.Formatter):
+    """
+    Uma linha JSON por registro: data_hora, nivel, logger, mensagem, boleto_id, etapa e thread
+
+    O QueueHandler já mescla os argumentos e o traceback na mensagem antes de enfileirar.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        registro = {
+            'data_hora': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensagem': record.getMessage(),
+            'boleto_id': getattr(record, 'boleto_id', None),
+            'etapa': getattr(record, 'etapa', None),
+            'thread': record.threadName,
+        }
+        return json.dumps(registro, ensure_ascii=False)
+
+
+class ArquivoRotativo(logging.handlers.RotatingFileHandler):
+    """
+    Arquivo de log rotacionado por tamanho ou na virada do dia, o que ocorrer primeiro
+
+    Mantém um nome fixo (automacao_webiss.log, automacao_webiss.log.1, ...)
+    em vez de um arquivo novo por execução.
+    """
+
+    def __init__(self, caminho: str, max_mb: float = 10, backups: int = 5):
+        super().__init__(caminho, maxBytes=int(max_mb * 1024 * 1024), backupCount=backups,
+                         encoding='utf-8', delay=True)
+        self._dia = self._dia_arquivo()
+
+    def _dia_arquivo(self) -> date:
+        try:
+            return date.fromtimestamp(os.path.getmtime(self.baseFilename))
+        except OSError:
+            return date.today()
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if date.today() != self._dia and os.path.exists(self.baseFilename):
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        self._dia = date.today()
+
+
+def configurar_logging(pasta_logs: str, nome: str, nivel='INFO', max_mb: float = 10, backups: int = 5,
+                       json_lines: bool = True, console: bool = True) -> logging.handlers.QueueListener:
+    """
+    Instala o pipeline de logging no logger raiz
+
+    As chamadas de log só enfileiram o registro (QueueHandler); a escrita em
+    disco e no console acontece na thread do QueueListener, fora do caminho
+    crítico do wizard. Pode ser chamada de novo para trocar a configuração.
+
+    Args:
+        pasta_logs: Pasta dos arquivos de log
+        nome: Nome base dos arquivos (<nome>.log e <nome>.jsonl)
+        nivel: Nível mínimo ('INFO' no caminho crítico; 'DEBUG' inclui os dumps de HTML e opções)
+        max_mb: Tamanho máximo de cada arquivo antes da rotação
+        backups: Quantidade de arquivos rotacionados mantidos
+        json_lines: Grava também <nome>.jsonl com boleto_id e etapa
+        console: Replica os logs no stdout
+
+    Returns:
+        O QueueListener iniciado (encerrado automaticamente ao sair do processo)
+    """
+    global _listener, _handler_fila
+    encerrar_logging()
+
+    if isinstance(nivel, str):
+        nivel = logging.getLevelName(nivel.strip().upper())
+        if not isinstance(nivel, int):
+            nivel = logging.INFO
+
+    os.makedirs(pasta_logs, exist_ok=True)
+    texto = logging.Formatter(FORMATO_TEXTO)
+    destinos = []
+
+    arquivo = ArquivoRotativo(os.path.join(pasta_logs, f"{nome}.log"), max_mb, backups)
+    arquivo.setFormatter(texto)
+    destinos.append(arquivo)
+    if json_lines:
+        estruturado = ArquivoRotativo(os.path.join(pasta_logs, f"{nome}.jsonl"), max_mb, backups)
+        estruturado.setFormatter(FormatadorJSON())
+        destinos.append(estruturado)
+    if console and sys.stdout is not None:
+        saida = logging.StreamHandler(sys.stdout)
+        saida.setFormatter(texto)
+        destinos.append(saida)
+
+    fila: queue.Queue = queue.Queue(-1)
+    _handler_fila = logging.handlers.QueueHandler(fila)
+    _handler_fila.addFilter(FiltroContexto())
+
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+        handler.close()
+    raiz.addHandler(_handler_fila)
+    raiz.setLevel(nivel)
+
+    _listener = logging.handlers.QueueListener(fila, *destinos, respect_handler_level=True)
+    _listener.start()
+    logger.debug("Logging assíncrono ativo em %s (nível %s)", pasta_logs, logging.getLevelName(nivel))
+    return _listener
+
+
+def encerrar_logging():
+    """Esvazia a fila, para o listener e fecha os arquivos"""
+    global _listener, _handler_fila
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    if _handler_fila is not None:
+        logging.getLogger().removeHandler(_handler_fila)
+    _listener = None
+    _handler_fila = None
+
+
+atexit.register(encerrar_logging)
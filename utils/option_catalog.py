@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Catálogo de Opções - Lê uma vez por sessão as opções dos selects da etapa de Serviços
+"""
+
+import re
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Selects cujas opções não mudam durante a sessão
+SELECTS_CATALOGO = ('CnaeAtividade_Id', 'lista-de-servicos-prestador', 'MesDaCompetencia')
+
+# Lê as opções de todos os selects informados em uma única chamada
+CATALOGO_JS = """
+var catalogo = {};
+arguments[0].forEach(function(id) {
+    var select = document.getElementById(id);
+    if (!select) { return; }
+    catalogo[id] = Array.prototype.map.call(select.options, function(o) {
+        return {valor: o.value, texto: (o.text || '').trim()};
+    });
+});
+return catalogo;
+"""
+
+# Define o valor do select, atualiza o select2 (se houver) e dispara os eventos
+SELECIONAR_VALOR_JS = """
+var select = document.getElementById(arguments[0]);
+if (!select) { return false; }
+if (window.jQuery && window.jQuery(select).data('select2')) {
+    window.jQuery(select).val(arguments[1]).trigger('change');
+} else {
+    select.value = arguments[1];
+    select.dispatchEvent(new Event('change'));
+}
+select.dispatchEvent(new Event('input'));
+return select.value === arguments[1];
+"""
+
+
+def normalizar_codigo(valor) -> str:
+    """
+    Reduz um código (CNAE, item da lista de serviços, mês) aos dígitos significativos
+
+    Aceita o que vem do CSV lido pelo pandas (ex.: 801, 8513900.0, '08.01', 'nan').
+    """
+    texto = str(valor if valor is not None else '').strip()
+    if texto.lower() == 'nan':
+        return ''
+    texto = re.sub(r'\.0$', '', texto)
+    return re.sub(r'\D', '', texto).lstrip('0')
+
+
+class CatalogoOpcoes:
+    """Opções dos selects da etapa de Serviços, lidas uma vez por sessão"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.catalogo: Dict[str, List[Dict]] = {}
+
+    def carregar(self, forcar: bool = False) -> Dict[str, List[Dict]]:
+        """
+        Lê as opções de todos os selects do catálogo em uma única chamada
+
+        Selects ainda sem opções (página não carregada) são lidos de novo na próxima chamada.
+        """
+        faltando = [i for i in SELECTS_CATALOGO if forcar or len(self.catalogo.get(i, [])) <= 1]
+        if not faltando:
+            return self.catalogo
+        try:
+            lidos = self.driver.execute_script(CATALOGO_JS, faltando) or {}
+            self.catalogo.update(lidos)
+            for select_id, opcoes in lidos.items():
+                logger.info("📚 Catálogo '%s': %s opções", select_id, len(opcoes))
+        except Exception as e:
+            logger.warning("Erro ao ler catálogo de opções: %s", e)
+        return self.catalogo
+
+    def opcoes(self, select_id: str) -> List[Dict]:
+        """Opções do select (carregando o catálogo se necessário)"""
+        if len(self.catalogo.get(select_id, [])) <= 1:
+            self.carregar()
+        return self.catalogo.get(select_id, [])
+
+    def buscar_por_codigo(self, select_id: str, codigo) -> Optional[Dict]:
+        """
+        Procura a opção correspondente ao código (CNAE, item da lista de serviços ou mês)
+
+        Compara primeiro com o valor da opção e depois com o início do texto
+        (ex.: '8513-9/00 - Ensino fundamental' para o CNAE 8513900).
+        """
+        alvo = normalizar_codigo(codigo)
+        if not alvo:
+            return None
+        opcoes = [o for o in self.opcoes(select_id) if o.get('valor')]
+        for opcao in opcoes:
+            if normalizar_codigo(opcao['valor']) == alvo:
+                return opcao
+        for opcao in opcoes:
+            inicio = re.match(r'[\d.\-/\s]+', opcao.get('texto', ''))
+            if inicio and normalizar_codigo(inicio.group(0)) == alvo:
+                return opcao
+        return None
+
+    def buscar_por_indice(self, select_id: str, indice: int) -> Optional[Dict]:
+        """Opção na posição informada (comportamento antigo, usado quando não há código)"""
+        opcoes = self.opcoes(select_id)
+        return opcoes[indice] if len(opcoes) > indice else None
+
+    def selecionar(self, select_id: str, valor: str) -> bool:
+        """Seleciona a opção pelo valor em uma única chamada"""
+        return bool(self.driver.execute_script(SELECIONAR_VALOR_JS, select_id, valor))
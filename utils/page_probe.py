@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sonda de Seletores - Avalia seletores candidatos e preenche campos dentro da página em uma única chamada
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from utils.selector_cache import normalizar_candidato
+from utils.wait_engine import VISIVEL_JS
+
+logger = logging.getLogger(__name__)
+
+# Recebe [[tipo, valor], ...], o prazo em ms e se exige elemento visível/habilitado.
+# Reavalia os candidatos dentro da página até o prazo e devolve o primeiro que
+# casar, junto com o índice do candidato vencedor e o número de tentativas.
+SONDA_JS = VISIVEL_JS + """
+var candidatos = arguments[0];
+var prazo = Date.now() + arguments[1];
+var clicavel = arguments[2];
+var callback = arguments[arguments.length - 1];
+var tentativas = 0;
+
+function elementos(tipo, valor) {
+    if (tipo === 'xpath') {
+        var res = document.evaluate(valor, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        var lista = [];
+        for (var i = 0; i < res.snapshotLength; i++) { lista.push(res.snapshotItem(i)); }
+        return lista;
+    }
+    return Array.prototype.slice.call(document.querySelectorAll(valor));
+}
+
+function sondar() {
+    tentativas++;
+    for (var i = 0; i < candidatos.length; i++) {
+        var lista;
+        try {
+            lista = elementos(candidatos[i][0], candidatos[i][1]);
+        } catch (e) {
+            continue;
+        }
+        for (var j = 0; j < lista.length; j++) {
+            var el = lista[j];
+            if (!clicavel || (visivel(el) && !el.disabled)) {
+                callback({elemento: el, indice: i, tentativas: tentativas});
+                return;
+            }
+        }
+    }
+    if (Date.now() >= prazo) {
+        callback({elemento: null, indice: -1, tentativas: tentativas});
+        return;
+    }
+    setTimeout(sondar, 50);
+}
+
+sondar();
+"""
+
+
+def _para_css_ou_xpath(candidato) -> List[str]:
+    """Converte um candidato (By, valor) para o par [tipo, valor] entendido pela sonda"""
+    by, valor = normalizar_candidato(candidato)
+    if by == 'xpath':
+        return ['xpath', valor]
+    if by == 'css selector':
+        return ['css', valor]
+    if by == 'id':
+        return ['css', f'[id="{valor}"]']
+    if by == 'name':
+        return ['css', f'[name="{valor}"]']
+    if by == 'class name':
+        return ['css', f'.{valor}']
+    if by == 'tag name':
+        return ['css', valor]
+    # link text e similares: aproximação por XPath
+    return ['xpath', f"//a[normalize-space(.)='{valor}']"]
+
+
+def sondar_seletores(driver, candidatos: List, timeout: float = 0,
+                     clicavel: bool = True) -> Tuple[Optional[object], int, int]:
+    """
+    Avalia todos os candidatos (XPath e CSS) no navegador em uma única chamada
+
+    Args:
+        driver: WebDriver ativo
+        candidatos: Lista de XPaths ou tuplas (By, valor), em ordem de preferência
+        timeout: Prazo em segundos para a sondagem repetida dentro da página
+        clicavel: Exige elemento visível e habilitado (senão basta estar no DOM)
+
+    Returns:
+        Tupla (elemento ou None, índice do candidato vencedor ou -1, tentativas)
+    """
+    convertidos = [_para_css_ou_xpath(c) for c in candidatos]
+    resultado = driver.execute_async_script(SONDA_JS, convertidos, int(timeout * 1000), clicavel)
+    if not resultado:
+        return None, -1, 0
+    return resultado.get('elemento'), resultado.get('indice', -1), resultado.get('tentativas', 0)
+
+
+# Recebe {campo: {candidatos: [[tipo, valor], ...], valor: '...'}}. Para cada campo
+# localiza o primeiro elemento visível e habilitado, define o valor e dispara os
+# eventos input/change. Devolve um relatório por campo.
+PREENCHER_LOTE_JS = VISIVEL_JS + """
+var campos = arguments[0];
+var relatorio = {};
+
+function primeiro(candidatos) {
+    for (var i = 0; i < candidatos.length; i++) {
+        var tipo = candidatos[i][0], valor = candidatos[i][1], lista = [];
+        try {
+            if (tipo === 'xpath') {
+                var res = document.evaluate(valor, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+                for (var k = 0; k < res.snapshotLength; k++) { lista.push(res.snapshotItem(k)); }
+            } else {
+                lista = Array.prototype.slice.call(document.querySelectorAll(valor));
+            }
+        } catch (e) {
+            continue;
+        }
+        for (var j = 0; j < lista.length; j++) {
+            if (visivel(lista[j]) && !lista[j].disabled && !lista[j].readOnly) {
+                return {el: lista[j], indice: i};
+            }
+        }
+    }
+    return null;
+}
+
+Object.keys(campos).forEach(function(nome) {
+    var achado = primeiro(campos[nome].candidatos);
+    if (!achado) {
+        relatorio[nome] = {ok: false, indice: -1, motivo: 'nao_encontrado'};
+        return;
+    }
+    var el = achado.el;
+    try {
+        // Usa o setter nativo para que frameworks que observam 'value' percebam a mudança
+        var descritor = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(el), 'value');
+        if (descritor && descritor.set) { descritor.set.call(el, campos[nome].valor); }
+        else { el.value = campos[nome].valor; }
+        el.dispatchEvent(new Event('input', {bubbles: true}));
+        el.dispatchEvent(new Event('change', {bubbles: true}));
+        relatorio[nome] = {
+            ok: el.value === campos[nome].valor,
+            indice: achado.indice,
+            valor_final: el.value,
+            motivo: el.value === campos[nome].valor ? null : 'valor_divergente'
+        };
+    } catch (e) {
+        relatorio[nome] = {ok: false, indice: achado.indice, motivo: String(e)};
+    }
+});
+return relatorio;
+"""
+
+
+def preencher_em_lote(driver, mapa: Dict[str, Tuple[List, str]]) -> Dict[str, Dict]:
+    """
+    Preenche vários campos em uma única chamada ao navegador
+
+    Args:
+        driver: WebDriver ativo
+        mapa: {campo lógico: (lista de seletores candidatos, valor)}
+
+    Returns:
+        Relatório por campo: {campo: {'ok', 'indice', 'valor_final', 'motivo'}}
+    """
+    campos = {
+        nome: {'candidatos': [_para_css_ou_xpath(c) for c in candidatos], 'valor': str(valor)}
+        for nome, (candidatos, valor) in mapa.items()
+    }
+    return driver.execute_script(PREENCHER_LOTE_JS, campos) or {}
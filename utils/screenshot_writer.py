@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gravador de Screenshots - Política de captura e gravação em segundo plano com retenção limitada
+"""
+
+import os
+import re
+import time
+import queue
+import itertools
+import logging
+import threading
+from datetime import datetime
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Políticas de captura
+POLITICA_DESLIGADA = 'off'
+POLITICA_ERROS = 'erros'
+POLITICA_AMOSTRA = 'amostra'
+POLITICA_SEMPRE = 'sempre'
+POLITICAS = (POLITICA_DESLIGADA, POLITICA_ERROS, POLITICA_AMOSTRA, POLITICA_SEMPRE)
+
+# A retenção é reaplicada a cada tantas gravações
+GRAVACOES_POR_LIMPEZA = 20
+
+
+def nome_seguro(texto) -> str:
+    """Trecho de nome de arquivo sem caracteres problemáticos"""
+    return re.sub(r'[^\w\-]+', '_', str(texto)).strip('_')[:40] or 'x'
+
+
+class GravadorScreenshots:
+    """
+    Decide quais capturas fazer e grava os PNGs em uma thread própria
+
+    A captura (get_screenshot_as_png) continua na thread da automação, mas a
+    escrita em disco e a limpeza da pasta saem do caminho crítico do wizard.
+    """
+
+    def __init__(self, pasta: str, politica: str = POLITICA_ERROS, amostra: int = 20,
+                 max_mb: float = 200, max_dias: float = 7):
+        """
+        Args:
+            pasta: Pasta dos screenshots
+            politica: 'off', 'erros', 'amostra' (erros + 1 a cada N boletos) ou 'sempre'
+            amostra: N da política 'amostra'
+            max_mb: Tamanho máximo da pasta (os PNGs mais antigos são apagados primeiro)
+            max_dias: Idade máxima dos PNGs
+        """
+        self.pasta = pasta
+        self.politica = politica if politica in POLITICAS else POLITICA_ERROS
+        self.amostra = max(1, amostra)
+        self.max_mb = max_mb
+        self.max_dias = max_dias
+        self.gravados = 0
+        self._fila: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._boletos_vistos = 0
+        self._sequencia = itertools.count(1)
+        self._ultimo_boleto = None
+        self._lock = threading.Lock()
+
+    def deve_capturar(self, erro: bool, boleto=None) -> bool:
+        """Aplica a política: erros sempre (exceto 'off'); sucessos só em 'sempre' ou no boleto amostrado"""
+        if self.politica == POLITICA_DESLIGADA:
+            return False
+        if erro or self.politica == POLITICA_SEMPRE:
+            return True
+        if self.politica != POLITICA_AMOSTRA:
+            return False
+        with self._lock:
+            if boleto != self._ultimo_boleto:
+                self._ultimo_boleto = boleto
+                self._boletos_vistos += 1
+            return (self._boletos_vistos - 1) % self.amostra == 0
+
+    def nome_arquivo(self, nome: str, boleto=None, etapa=None) -> str:
+        """Nome único por boleto e etapa: 20250310_142501_123-0042_boleto-17_emitir_emitir_error.png"""
+        base = os.path.splitext(nome)[0]
+        partes = [f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]}-{next(self._sequencia):04d}"]
+        if boleto is not None:
+            partes.append(f"boleto-{nome_seguro(boleto)}")
+        if etapa:
+            partes.append(nome_seguro(etapa))
+        partes.append(nome_seguro(base))
+        return '_'.join(partes) + '.png'
+
+    def enviar(self, png: bytes, nome_arquivo: str) -> str:
+        """Enfileira o PNG para gravação e retorna o caminho final"""
+        self._iniciar()
+        caminho = os.path.join(self.pasta, nome_arquivo)
+        self._fila.put((caminho, png))
+        return caminho
+
+    def aguardar(self, timeout: float = 10):
+        """Espera a fila esvaziar (ao encerrar a automação)"""
+        limite = time.monotonic() + timeout
+        while self._fila.unfinished_tasks and time.monotonic() < limite:
+            time.sleep(0.05)
+
+    def _iniciar(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            os.makedirs(self.pasta, exist_ok=True)
+            self._thread = threading.Thread(target=self._gravar, name="gravador-screenshots", daemon=True)
+            self._thread.start()
+        self.aplicar_retencao()
+
+    def _gravar(self):
+        while True:
+            caminho, png = self._fila.get()
+            try:
+                with open(caminho, 'wb') as f:
+                    f.write(png)
+                self.gravados += 1
+                logger.debug("Screenshot gravado: %s", caminho)
+                if self.gravados % GRAVACOES_POR_LIMPEZA == 0:
+                    self.aplicar_retencao()
+            except Exception as e:
+                logger.warning("Erro ao gravar screenshot %s: %s", caminho, e)
+            finally:
+                self._fila.task_done()
+
+    def aplicar_retencao(self) -> int:
+        """Apaga PNGs mais velhos que max_dias e, depois, os mais antigos até caber em max_mb"""
+        try:
+            arquivos = []
+            for nome in os.listdir(self.pasta):
+                if nome.lower().endswith('.png'):
+                    caminho = os.path.join(self.pasta, nome)
+                    info = os.stat(caminho)
+                    arquivos.append((info.st_mtime, info.st_size, caminho))
+        except OSError:
+            return 0
+
+        arquivos.sort()
+        removidos = 0
+        limite_idade = time.time() - self.max_dias * 86400 if self.max_dias else None
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for mtime, tamanho, caminho in arquivos:
+            velho = limite_idade is not None and mtime < limite_idade
+            excedente = self.max_mb and total > self.max_mb * 1024 * 1024
+            if not velho and not excedente:
+                break
+            try:
+                os.remove(caminho)
+                total -= tamanho
+                removidos += 1
+            except OSError:
+                continue
+        if removidos:
+            logger.info("🧹 %s screenshots antigos removidos de %s", removidos, self.pasta)
+        return removidos
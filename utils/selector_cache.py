@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache de Seletores - Lembra qual seletor funcionou para cada elemento lógico
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Um candidato é uma tupla (By, valor) ou uma string XPath
+Candidato = Union[str, Tuple[str, str]]
+
+
+def normalizar_candidato(candidato: Candidato) -> Tuple[str, str]:
+    """Converte o candidato para a forma (By, valor)"""
+    if isinstance(candidato, str):
+        return ('xpath', candidato)
+    return (candidato[0], candidato[1])
+
+
+def chave_candidato(candidato: Candidato) -> str:
+    """Identificador textual do candidato (usado no arquivo de cache)"""
+    by, valor = normalizar_candidato(candidato)
+    return f"{by}={valor}"
+
+
+class SelectorCache:
+    """Cache persistente do seletor vencedor por elemento lógico, com estatísticas"""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self.vencedores: Dict[str, str] = {}
+        self.estatisticas: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.carregar()
+
+    def carregar(self):
+        """Carrega os vencedores salvos em execuções anteriores"""
+        try:
+            if os.path.exists(self.caminho):
+                with open(self.caminho, 'r', encoding='utf-8') as f:
+                    self.vencedores = json.load(f).get('vencedores', {})
+                logger.info("Cache de seletores carregado: %s elementos", len(self.vencedores))
+        except Exception as e:
+            logger.warning("Erro ao carregar cache de seletores: %s", e)
+            self.vencedores = {}
+
+    def salvar(self):
+        """Persiste os vencedores em disco"""
+        try:
+            diretorio = os.path.dirname(self.caminho)
+            if diretorio and not os.path.exists(diretorio):
+                os.makedirs(diretorio)
+            with self._lock:
+                conteudo = {
+                    'atualizado_em': datetime.now().isoformat(timespec='seconds'),
+                    'vencedores': dict(self.vencedores)
+                }
+            with open(self.caminho, 'w', encoding='utf-8') as f:
+                json.dump(conteudo, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.warning("Erro ao salvar cache de seletores: %s", e)
+
+    def ordenar(self, elemento: str, candidatos: List[Candidato]) -> List[Candidato]:
+        """Retorna os candidatos com o vencedor conhecido (se houver) em primeiro lugar"""
+        vencedor = self.vencedores.get(elemento)
+        if not vencedor:
+            return list(candidatos)
+        primeiros = [c for c in candidatos if chave_candidato(c) == vencedor]
+        return primeiros + [c for c in candidatos if chave_candidato(c) != vencedor]
+
+    def _stats(self, elemento: str) -> Dict:
+        return self.estatisticas.setdefault(elemento, {
+            'acertos': 0,
+            'falhas_cache': 0,
+            'sem_cache': 0,
+            'nao_encontrado': 0,
+            'busca_lenta': 0,
+            'vitorias': {}
+        })
+
+    def registrar_resultado(self, elemento: str, candidato: Candidato, busca_lenta: bool = False):
+        """
+        Registra o candidato que encontrou o elemento
+
+        Args:
+            elemento: Nome lógico do elemento (ex.: 'botao_proximo')
+            candidato: Seletor que encontrou o elemento
+            busca_lenta: True se foi necessário esperar (sondagem instantânea falhou)
+        """
+        chave = chave_candidato(candidato)
+        alterou = False
+        with self._lock:
+            stats = self._stats(elemento)
+            anterior = self.vencedores.get(elemento)
+            if anterior is None:
+                stats['sem_cache'] += 1
+            elif anterior == chave:
+                stats['acertos'] += 1
+            else:
+                stats['falhas_cache'] += 1
+            if busca_lenta:
+                stats['busca_lenta'] += 1
+            stats['vitorias'][chave] = stats['vitorias'].get(chave, 0) + 1
+            if anterior != chave:
+                self.vencedores[elemento] = chave
+                alterou = True
+        if alterou:
+            logger.info("📌 Novo seletor vencedor para '%s': %s", elemento, chave)
+            self.salvar()
+
+    def registrar_nao_encontrado(self, elemento: str):
+        """Registra que nenhum candidato encontrou o elemento"""
+        with self._lock:
+            self._stats(elemento)['nao_encontrado'] += 1
+
+    def exportar_estatisticas(self, caminho: str) -> bool:
+        """
+        Exporta as estatísticas de acerto/erro para revisão
+
+        Args:
+            caminho: Arquivo JSON de destino
+
+        Returns:
+            bool: True se exportado com sucesso
+        """
+        try:
+            with self._lock:
+                conteudo = {
+                    'gerado_em': datetime.now().isoformat(timespec='seconds'),
+                    'vencedores': dict(self.vencedores),
+                    'elementos': json.loads(json.dumps(self.estatisticas))
+                }
+            with open(caminho, 'w', encoding='utf-8') as f:
+                json.dump(conteudo, f, ensure_ascii=False, indent=2)
+            logger.info("Estatísticas de seletores exportadas: %s", caminho)
+            return True
+        except Exception as e:
+            logger.warning("Erro ao exportar estatísticas de seletores: %s", e)
+            return False
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agendador de Abas - Várias abas de uma mesma sessão do Chrome, cada uma com seu próprio wizard
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    StaleElementReferenceException,
+    JavascriptException,
+)
+
+logger = logging.getLogger(__name__)
+
+# Exceções que a condição pode lançar enquanto a página ainda não chegou ao estado esperado
+EXCECOES_IGNORADAS = (NoSuchElementException, StaleElementReferenceException, JavascriptException)
+
+
+class AgendadorAbas:
+    """
+    Compartilha um único WebDriver entre várias abas, uma thread de wizard por aba
+
+    Só uma thread usa o driver por vez (a que detém o foco). Quando a thread
+    de uma aba entra em uma espera (WaitEngine.aguardar), ela devolve o foco;
+    o laço do agendador avalia, aba por aba, as condições pendentes e entrega
+    o foco à primeira aba cuja espera foi satisfeita (ou expirou). Assim a
+    latência do servidor em uma aba é aproveitada para preencher as outras.
+    """
+
+    def __init__(self, driver, poll: float = 0.05):
+        self.driver = driver
+        self.poll = poll
+        self.trocas = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._pendentes: Dict[str, Dict] = {}
+        self._foco: Optional[str] = None
+        self._ativas = 0
+        self._aba_atual: Optional[str] = None
+        self._ultima: Optional[str] = None
+
+    def abrir_abas(self, quantidade: int, url: Optional[str] = None) -> List[str]:
+        """
+        Garante 'quantidade' abas na sessão (a aba atual é a primeira)
+
+        Args:
+            url: Página carregada nas abas novas (ex.: a página inicial logada)
+
+        Returns:
+            Lista de window handles, na ordem de abertura
+        """
+        handles = [self.driver.current_window_handle]
+        for _ in range(max(1, quantidade) - 1):
+            self.driver.switch_to.new_window('tab')
+            if url:
+                self.driver.get(url)
+            handles.append(self.driver.current_window_handle)
+        self.driver.switch_to.window(handles[0])
+        self._aba_atual = handles[0]
+        logger.info("🗂️ %s abas abertas na sessão", len(handles))
+        return handles
+
+    def fechar_abas(self, handles: List[str]):
+        """Fecha as abas extras, mantendo a primeira como aba da sessão"""
+        for handle in handles[1:]:
+            try:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            except Exception as e:
+                logger.warning("Erro ao fechar aba: %s", e)
+        if handles:
+            self.driver.switch_to.window(handles[0])
+            self._aba_atual = handles[0]
+
+    def focar(self, handle: str):
+        """Muda o foco do driver para a aba (sem comando se ela já está em foco)"""
+        if self._aba_atual != handle:
+            self.driver.switch_to.window(handle)
+            self._aba_atual = handle
+            self.trocas += 1
+
+    def aguardar(self, nome: str, condicao: Callable[[Any], Any], timeout: float) -> Any:
+        """
+        Espera da thread de uma aba: devolve o foco até a condição ser satisfeita
+
+        Mesma semântica de WaitEngine.aguardar: retorna o valor da condição, ou
+        False se o tempo expirou.
+        """
+        handle = self._local.handle
+        inicio = time.perf_counter()
+        with self._cond:
+            self._pendentes[handle] = {
+                'nome': nome,
+                'condicao': condicao,
+                'prazo': time.monotonic() + timeout,
+                'resultado': False,
+                'erro': None,
+                'liberada': False
+            }
+            self._foco = None
+            self._cond.notify_all()
+            while not self._pendentes[handle]['liberada']:
+                self._cond.wait()
+            espera = self._pendentes.pop(handle)
+
+        if espera['erro'] is not None:
+            raise espera['erro']
+        if espera['resultado']:
+            logger.info("⏱️ Espera '%s': %.2fs", nome, time.perf_counter() - inicio)
+        else:
+            logger.warning("⏱️ Espera '%s' expirou após %.2fs", nome, time.perf_counter() - inicio)
+        return espera['resultado']
+
+    def executar(self, tarefas: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+        """
+        Executa uma tarefa por aba e alterna o foco até todas terminarem
+
+        Args:
+            tarefas: {window handle: função sem argumentos que roda o wizard naquela aba}
+
+        Returns:
+            {window handle: valor retornado pela tarefa (None se lançou exceção)}
+        """
+        resultados: Dict[str, Any] = {}
+        self._ativas = len(tarefas)
+        threads = [
+            threading.Thread(target=self._rodar, args=(handle, tarefa, resultados),
+                             name=f"aba-{indice + 1}", daemon=True)
+            for indice, (handle, tarefa) in enumerate(tarefas.items())
+        ]
+        for thread in threads:
+            thread.start()
+
+        while True:
+            with self._cond:
+                while self._foco is not None:
+                    self._cond.wait()
+                if self._ativas == 0:
+                    break
+                pendentes = [(h, e) for h, e in self._pendentes.items() if not e['liberada']]
+
+            escolhida = self._avaliar(pendentes)
+            if escolhida is None:
+                time.sleep(self.poll)
+                continue
+            with self._cond:
+                self._foco = escolhida
+                self._ultima = escolhida
+                self._pendentes[escolhida]['liberada'] = True
+                self._cond.notify_all()
+
+        for thread in threads:
+            thread.join()
+        logger.info("🗂️ Agendador de abas finalizado (%s trocas de aba)", self.trocas)
+        return resultados
+
+    def _avaliar(self, pendentes: List) -> Optional[str]:
+        """Avalia as esperas pendentes (a partir da aba seguinte à última atendida) e retorna a aba liberada"""
+        handles = [h for h, _ in pendentes]
+        if self._ultima in handles:
+            inicio = handles.index(self._ultima) + 1
+            pendentes = pendentes[inicio:] + pendentes[:inicio]
+
+        for handle, espera in pendentes:
+            try:
+                self.focar(handle)
+                resultado = espera['condicao'](self.driver)
+            except EXCECOES_IGNORADAS:
+                resultado = None
+            except Exception as e:
+                espera['erro'] = e
+                return handle
+            if resultado:
+                espera['resultado'] = resultado
+                return handle
+            if time.monotonic() >= espera['prazo']:
+                return handle
+        return None
+
+    def _rodar(self, handle: str, tarefa: Callable[[], Any], resultados: Dict[str, Any]):
+        self._local.handle = handle
+        try:
+            # Só começa quando o agendador entregar o foco desta aba
+            self.aguardar("foco da aba", lambda d: True, float('inf'))
+            resultados[handle] = tarefa()
+        except Exception as e:
+            logger.error("[%s] Erro na aba: %s", threading.current_thread().name, e)
+            resultados[handle] = None
+        finally:
+            with self._cond:
+                self._ativas -= 1
+                self._foco = None
+                self._cond.notify_all()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de Esperas - Aguarda condições reais da página em vez de pausas fixas
+"""
+
+import time
+import logging
+from typing import Any, Callable, List, Optional, Union
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import (
+    TimeoutException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+    JavascriptException,
+)
+
+logger = logging.getLogger(__name__)
+
+# Função visivel(el) compartilhada pelos scripts de página (sonda de seletores,
+# estado do wizard, esperas): elemento renderizado e não oculto por CSS
+VISIVEL_JS = """
+function visivel(el) {
+    if (!el || !el.getClientRects().length) { return false; }
+    var estilo = window.getComputedStyle(el);
+    return estilo.visibility !== 'hidden' && estilo.display !== 'none';
+}
+"""
+
+# Instala (uma única vez por página) contadores de XHR/fetch pendentes, o
+# histórico das últimas URLs requisitadas e um MutationObserver que registra
+# o instante da última alteração do DOM.
+MONITOR_JS = """
+if (!window.__emiteNotaMonitor) {
+    window.__emiteNotaMonitor = true;
+    window.__emiteNotaPendentes = 0;
+    window.__emiteNotaUltimaMutacao = Date.now();
+    window.__emiteNotaUrls = [];
+    var registrarUrl = function(url) {
+        window.__emiteNotaUrls.push(String(url));
+        if (window.__emiteNotaUrls.length > 20) { window.__emiteNotaUrls.shift(); }
+    };
+    var openOriginal = XMLHttpRequest.prototype.open;
+    XMLHttpRequest.prototype.open = function(metodo, url) {
+        registrarUrl(url);
+        return openOriginal.apply(this, arguments);
+    };
+    var sendOriginal = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function() {
+        window.__emiteNotaPendentes++;
+        this.addEventListener('loadend', function() {
+            window.__emiteNotaPendentes = Math.max(0, window.__emiteNotaPendentes - 1);
+        });
+        return sendOriginal.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var fetchOriginal = window.fetch;
+        window.fetch = function(recurso) {
+            registrarUrl(recurso && recurso.url ? recurso.url : recurso);
+            window.__emiteNotaPendentes++;
+            return fetchOriginal.apply(this, arguments).finally(function() {
+                window.__emiteNotaPendentes = Math.max(0, window.__emiteNotaPendentes - 1);
+            });
+        };
+    }
+    if (window.MutationObserver && document.documentElement) {
+        new MutationObserver(function() {
+            window.__emiteNotaUltimaMutacao = Date.now();
+        }).observe(document.documentElement, {
+            childList: true, subtree: true, attributes: true, characterData: true
+        });
+    }
+}
+"""
+
+# Aba ativa do wizard de emissão (abas bootstrap '#tab4-N')
+SELETOR_ETAPA_ATIVA = '.nav li.active > a[href^="#tab"], .wizard li.active a, .steps li.active a'
+
+# Retorna um retrato do estado da página em uma única chamada
+ESTADO_JS = MONITOR_JS + VISIVEL_JS + """
+var ativo = document.querySelector('""" + SELETOR_ETAPA_ATIVA + """');
+var mascara = document.getElementById('select2-drop-mask');
+var dropAberto = Array.prototype.some.call(
+    document.querySelectorAll('.select2-drop-active, .select2-drop'),
+    visivel
+);
+return {
+    pronto: document.readyState === 'complete',
+    jquery: window.jQuery ? window.jQuery.active : 0,
+    pendentes: window.__emiteNotaPendentes || 0,
+    quieto_ms: Date.now() - (window.__emiteNotaUltimaMutacao || 0),
+    select2_aberto: dropAberto || visivel(mascara),
+    etapa: ativo ? ativo.getAttribute('href') : null
+};
+"""
+
+# Lê o valor do primeiro campo visível entre os XPaths informados
+VALOR_JS = MONITOR_JS + VISIVEL_JS + """
+var xpaths = arguments[0];
+for (var i = 0; i < xpaths.length; i++) {
+    var el = document.evaluate(xpaths[i], document, null,
+        XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (visivel(el)) {
+        return {
+            valor: el.value || '',
+            ocioso: (!window.jQuery || window.jQuery.active === 0) && !window.__emiteNotaPendentes,
+            quieto_ms: Date.now() - (window.__emiteNotaUltimaMutacao || 0)
+        };
+    }
+}
+return null;
+"""
+
+
+class WaitEngine:
+    """Esperas limitadas por condições reais da página (AJAX, select2, DOM, URL, etapa)"""
+
+    def __init__(self, driver, timeout: float = 15, poll: float = 0.1, agendador=None):
+        self.driver = driver
+        self.timeout = timeout
+        self.poll = poll
+        # Com várias abas na mesma sessão, as esperas devolvem o foco ao AgendadorAbas
+        self.agendador = agendador
+
+    def aguardar(self, nome: str, condicao: Callable[[Any], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Aguarda uma condição com limite de tempo e registra quanto tempo levou
+
+        Args:
+            nome: Descrição da espera (aparece no log de tempos)
+            condicao: Função que recebe o driver e retorna valor verdadeiro quando satisfeita
+            timeout: Limite em segundos (padrão: timeout do motor)
+
+        Returns:
+            Valor retornado pela condição, ou False se o tempo expirou
+        """
+        limite = self.timeout if timeout is None else timeout
+        if self.agendador is not None:
+            return self.agendador.aguardar(nome, condicao, limite)
+        inicio = time.perf_counter()
+        try:
+            resultado = WebDriverWait(
+                self.driver, limite, poll_frequency=self.poll,
+                ignored_exceptions=(NoSuchElementException, StaleElementReferenceException, JavascriptException)
+            ).until(condicao)
+            logger.info("⏱️ Espera '%s': %.2fs", nome, time.perf_counter() - inicio)
+            return resultado
+        except TimeoutException:
+            logger.warning("⏱️ Espera '%s' expirou após %.2fs", nome, time.perf_counter() - inicio)
+            return False
+
+    def estado_pagina(self) -> dict:
+        """Retorna o estado atual da página (AJAX, DOM, select2 e etapa do wizard)"""
+        return self.driver.execute_script(ESTADO_JS) or {}
+
+    def urls_recentes(self) -> List[str]:
+        """Retorna as últimas URLs requisitadas pela página via XHR/fetch"""
+        try:
+            return self.driver.execute_script(MONITOR_JS + "return window.__emiteNotaUrls || [];") or []
+        except Exception:
+            return []
+
+    def etapa_atual(self) -> Optional[str]:
+        """Retorna o identificador da aba ativa do wizard (ex.: '#tab4-2')"""
+        try:
+            return self.estado_pagina().get('etapa')
+        except Exception:
+            return None
+
+    def aguardar_documento_pronto(self, timeout: Optional[float] = None) -> bool:
+        """Aguarda document.readyState == 'complete'"""
+        return bool(self.aguardar(
+            "documento pronto",
+            lambda d: d.execute_script("return document.readyState") == 'complete',
+            timeout
+        ))
+
+    def aguardar_ajax_ocioso(self, timeout: Optional[float] = None, quieto_ms: int = 0) -> bool:
+        """
+        Aguarda não haver requisições jQuery/XHR/fetch pendentes
+
+        Args:
+            quieto_ms: Exige também que o DOM esteja sem mutações por esse intervalo
+        """
+        def condicao(d):
+            estado = d.execute_script(ESTADO_JS)
+            return (estado['pronto'] and estado['jquery'] == 0 and estado['pendentes'] == 0
+                    and estado['quieto_ms'] >= quieto_ms)
+
+        return bool(self.aguardar("AJAX ocioso", condicao, timeout))
+
+    def aguardar_dom_estavel(self, quieto_ms: int = 300, timeout: Optional[float] = None) -> bool:
+        """Aguarda o DOM ficar sem mutações por quieto_ms milissegundos"""
+        return bool(self.aguardar(
+            f"DOM estável ({quieto_ms}ms)",
+            lambda d: d.execute_script(ESTADO_JS)['quieto_ms'] >= quieto_ms,
+            timeout
+        ))
+
+    def aguardar_select2_fechado(self, timeout: Optional[float] = None) -> bool:
+        """Aguarda o dropdown/máscara do select2 fechar"""
+        return bool(self.aguardar(
+            "select2 fechado",
+            lambda d: not d.execute_script(ESTADO_JS)['select2_aberto'],
+            timeout
+        ))
+
+    def ler_valor(self, xpaths: Union[str, List[str]]) -> str:
+        """Lê (sem esperar) o valor do primeiro campo visível entre os XPaths"""
+        if isinstance(xpaths, str):
+            xpaths = [xpaths]
+        try:
+            info = self.driver.execute_script(VALOR_JS, xpaths)
+            return info['valor'] if info else ''
+        except Exception:
+            return ''
+
+    def aguardar_valor(self, xpaths: Union[str, List[str]], diferente_de: Optional[str] = None,
+                       timeout: Optional[float] = None, quieto_ms: int = 400) -> Union[str, bool]:
+        """
+        Aguarda um campo receber valor (ex.: CEP preenchido pelo AJAX da página)
+
+        Args:
+            xpaths: XPath ou lista de XPaths candidatos do campo
+            diferente_de: Valor anterior; exige que o valor mude, a menos que a
+                página fique ociosa e estável por quieto_ms (valor repetido legítimo)
+
+        Returns:
+            Valor do campo, ou False se o tempo expirou
+        """
+        if isinstance(xpaths, str):
+            xpaths = [xpaths]
+
+        def condicao(d):
+            info = d.execute_script(VALOR_JS, xpaths)
+            if not info or not info['valor']:
+                return False
+            if diferente_de is None or info['valor'] != diferente_de:
+                return info['valor']
+            if info['ocioso'] and info['quieto_ms'] >= quieto_ms:
+                return info['valor']
+            return False
+
+        return self.aguardar("valor do campo preenchido", condicao, timeout)
+
+    def aguardar_elemento_visivel(self, xpaths: Union[str, List[str]], timeout: Optional[float] = None,
+                                  nome: str = "elemento visível"):
+        """
+        Aguarda o primeiro elemento visível entre os XPaths candidatos
+
+        Returns:
+            WebElement encontrado, ou False se o tempo expirou
+        """
+        if isinstance(xpaths, str):
+            xpaths = [xpaths]
+
+        def condicao(d):
+            return d.execute_script(VISIVEL_JS + """
+                var xpaths = arguments[0];
+                for (var i = 0; i < xpaths.length; i++) {
+                    var el = document.evaluate(xpaths[i], document, null,
+                        XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+                    if (visivel(el)) { return el; }
+                }
+                return null;
+            """, xpaths)
+
+        return self.aguardar(nome, condicao, timeout)
+
+    def aguardar_clicavel(self, xpath: str, timeout: Optional[float] = None, nome: str = "elemento clicável"):
+        """
+        Aguarda um elemento visível e habilitado (ex.: itens do menu lateral)
+
+        Returns:
+            WebElement encontrado, ou False se o tempo expirou
+        """
+        return self.aguardar(nome, EC.element_to_be_clickable((By.XPATH, xpath)), timeout)
+
+    def aguardar_mudanca_url(self, url_anterior: str, timeout: Optional[float] = None) -> bool:
+        """Aguarda a URL mudar em relação à informada"""
+        return bool(self.aguardar(
+            "mudança de URL",
+            lambda d: d.current_url != url_anterior,
+            timeout
+        ))
+
+    def aguardar_mudanca_etapa(self, etapa_anterior: Optional[str], timeout: Optional[float] = None) -> bool:
+        """Aguarda a aba ativa do wizard mudar em relação à informada"""
+        def condicao(d):
+            estado = d.execute_script(ESTADO_JS)
+            return estado['etapa'] is not None and estado['etapa'] != etapa_anterior
+
+        return bool(self.aguardar("mudança de etapa", condicao, timeout))
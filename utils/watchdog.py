@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Watchdog do WebDriver - Prazo máximo por comando enviado ao navegador e memória do Chrome
+"""
+
+import time
+import logging
+import itertools
+import threading
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WatchdogDriver:
+    """
+    Vigia os comandos WebDriver em andamento e dispara uma ação quando um deles estoura o prazo
+
+    Os comandos são registrados pelo envoltório de driver.execute do
+    WebDriverProfiler. Um comando travado (Chrome congelado, página que nunca
+    termina de carregar) bloquearia a thread da automação indefinidamente; ao
+    estourar o prazo, 'ao_travar' é chamado uma única vez por comando, em
+    geral para encerrar os processos do navegador e destravar a chamada.
+    """
+
+    def __init__(self, limite: float, ao_travar: Callable[[str, float], None],
+                 limites: Optional[Dict[str, float]] = None, intervalo: float = 1.0):
+        """
+        Args:
+            limite: Prazo padrão em segundos para qualquer comando
+            ao_travar: Chamado com (comando, segundos decorridos) quando o prazo estoura
+            limites: Prazos específicos por comando WebDriver (ex.: {'get': 120})
+            intervalo: Periodicidade da verificação em segundos
+        """
+        self.limite = limite
+        self.limites = limites or {}
+        self.ao_travar = ao_travar
+        self.intervalo = intervalo
+        self.disparos = 0
+        self._em_curso: Dict[int, list] = {}
+        self._tokens = itertools.count(1)
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def iniciar(self):
+        """Inicia a thread de vigilância (daemon)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._vigiar, name="watchdog-webdriver", daemon=True)
+        self._thread.start()
+        logger.info("🐕 Watchdog do WebDriver ativo (prazo de %gs por comando)", self.limite)
+
+    def parar(self):
+        """Encerra a thread de vigilância"""
+        self._parar.set()
+        if self._thread:
+            self._thread.join(timeout=self.intervalo * 2)
+            self._thread = None
+
+    def inicio_comando(self, comando: str) -> int:
+        """Registra um comando enviado ao navegador e retorna o token para fim_comando"""
+        token = next(self._tokens)
+        with self._lock:
+            self._em_curso[token] = [comando, time.monotonic(), False]
+        return token
+
+    def fim_comando(self, token: int):
+        """Marca o comando como concluído (com sucesso ou exceção)"""
+        with self._lock:
+            self._em_curso.pop(token, None)
+
+    def _vigiar(self):
+        while not self._parar.wait(self.intervalo):
+            agora = time.monotonic()
+            estourados = []
+            with self._lock:
+                for item in self._em_curso.values():
+                    comando, inicio, disparado = item
+                    if not disparado and agora - inicio > self.limites.get(comando, self.limite):
+                        item[2] = True
+                        estourados.append((comando, agora - inicio))
+            for comando, duracao in estourados:
+                self.disparos += 1
+                try:
+                    self.ao_travar(comando, duracao)
+                except Exception as e:
+                    logger.error("Erro na ação do watchdog: %s", e)
+
+
+def processos_navegador(driver) -> list:
+    """Processo do ChromeDriver e seus descendentes (Chrome e renderizadores); requer psutil"""
+    import psutil
+    processo = psutil.Process(driver.service.process.pid)
+    return [processo] + processo.children(recursive=True)
+
+
+def memoria_navegador_mb(driver) -> Optional[float]:
+    """
+    Memória residente (RSS) somada do ChromeDriver e do Chrome, em MB
+
+    Returns:
+        MB, ou None se psutil não estiver instalado ou o processo não for acessível
+    """
+    try:
+        import psutil
+    except ImportError:
+        return None
+    try:
+        total = 0
+        for processo in processos_navegador(driver):
+            try:
+                total += processo.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def encerrar_processos_navegador(driver) -> bool:
+    """
+    Mata o Chrome e o ChromeDriver sem passar pelo protocolo WebDriver (que pode estar travado)
+
+    Com psutil, encerra toda a árvore de processos; sem ele, apenas o ChromeDriver,
+    o que já faz a chamada pendente falhar com erro de conexão.
+    """
+    try:
+        try:
+            processos = processos_navegador(driver)
+        except ImportError:
+            processos = []
+        for processo in reversed(processos):
+            try:
+                processo.kill()
+            except Exception:
+                continue
+        if not processos:
+            driver.service.process.kill()
+        return True
+    except Exception as e:
+        logger.warning("Erro ao encerrar processos do navegador: %s", e)
+        return False
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perfilador WebDriver - Conta e cronometra os comandos enviados ao navegador por etapa
+"""
+
+import json
+import time
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+from utils.log_pipeline import definir_contexto
+
+logger = logging.getLogger(__name__)
+
+# Comandos do protocolo WebDriver agrupados pelo tipo que interessa medir.
+# No Selenium 4, get_attribute e is_displayed são enviados como executeScript.
+TIPOS_COMANDO = {
+    'findElement': 'find_element',
+    'findElements': 'find_element',
+    'findChildElement': 'find_element',
+    'findChildElements': 'find_element',
+    'executeScript': 'execute_script',
+    'executeAsyncScript': 'execute_script',
+    'getElementAttribute': 'get_attribute',
+    'getElementProperty': 'get_attribute',
+    'getElementValue': 'get_attribute',
+    'getElementText': 'get_attribute',
+    'clickElement': 'click',
+    'screenshot': 'screenshot',
+    'elementScreenshot': 'screenshot',
+}
+
+ETAPA_PADRAO = 'geral'
+
+
+def tipo_comando(comando: str) -> str:
+    """Classifica o comando WebDriver (find_element, execute_script, get_attribute, click, screenshot, outro)"""
+    return TIPOS_COMANDO.get(comando, 'outro')
+
+
+def perfilar_etapa(nome: str):
+    """Decorador de métodos da automação: atribui os comandos executados à etapa informada"""
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltorio(self, *args, **kwargs):
+            with self.profiler.etapa(nome):
+                return metodo(self, *args, **kwargs)
+        return envoltorio
+    return decorador
+
+
+class WebDriverProfiler:
+    """
+    Instrumenta driver.execute para contar e cronometrar comandos por etapa e por boleto
+
+    Etapa, boleto e contadores são mantidos por thread, de modo que várias
+    abas processadas em threads sobre o mesmo driver não misturam os números.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        # WatchdogDriver opcional: recebe o início/fim de cada comando para impor prazos
+        self.watchdog = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _estado(self):
+        """Estado da thread atual (criado na primeira chamada)"""
+        estado = self._local
+        if not hasattr(estado, 'contadores'):
+            estado.etapa_atual = ETAPA_PADRAO
+            estado.boleto_atual = None
+            estado.inicio_boleto = None
+            estado.contadores = {}
+        return estado
+
+    def instalar(self, driver):
+        """Substitui driver.execute (na instância) por uma versão que registra cada comando"""
+        if getattr(driver, '_perfilador_instalado', False):
+            return
+        execute_original = driver.execute
+
+        def execute(comando, params=None):
+            watchdog = self.watchdog
+            token = watchdog.inicio_comando(comando) if watchdog else None
+            inicio = time.perf_counter()
+            try:
+                return execute_original(comando, params)
+            finally:
+                if token is not None:
+                    watchdog.fim_comando(token)
+                self.registrar(comando, time.perf_counter() - inicio)
+
+        driver.execute = execute
+        driver._perfilador_instalado = True
+        logger.info("Perfilador de comandos WebDriver instalado")
+
+    def registrar(self, comando: str, duracao: float):
+        """Acumula um comando na etapa atual"""
+        estado = self._estado()
+        with self._lock:
+            por_tipo = estado.contadores.setdefault(estado.etapa_atual, {})
+            item = por_tipo.setdefault(tipo_comando(comando), {'n': 0, 'ms': 0.0})
+            item['n'] += 1
+            item['ms'] += duracao * 1000
+
+    def contexto_atual(self):
+        """Boleto e etapa em andamento na thread atual (boleto None fora de um boleto)"""
+        estado = self._estado()
+        return estado.boleto_atual, estado.etapa_atual
+
+    @contextmanager
+    def etapa(self, nome: str):
+        """Atribui à etapa 'nome' os comandos executados dentro do bloco"""
+        estado = self._estado()
+        anterior = estado.etapa_atual
+        estado.etapa_atual = nome
+        definir_contexto(estado.boleto_atual, nome)
+        try:
+            yield
+        finally:
+            estado.etapa_atual = anterior
+            definir_contexto(estado.boleto_atual, anterior)
+
+    def iniciar_boleto(self, boleto_id):
+        """Começa a contagem de um boleto (comandos anteriores, como o login, são gravados à parte)"""
+        estado = self._estado()
+        if estado.contadores:
+            self._gravar('sessao', None, None)
+        estado.boleto_atual = str(boleto_id)
+        estado.inicio_boleto = time.perf_counter()
+        definir_contexto(estado.boleto_atual, estado.etapa_atual)
+
+    def finalizar_boleto(self, sucesso: bool, extras: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Grava o resumo do boleto atual no arquivo JSON-lines e zera os contadores
+
+        Args:
+            extras: Campos adicionais do resumo (ex.: {'rss_mb': memória do navegador})
+        """
+        estado = self._estado()
+        if estado.boleto_atual is None:
+            return None
+        duracao = time.perf_counter() - estado.inicio_boleto
+        resumo = self._gravar(estado.boleto_atual, sucesso, duracao, extras)
+        estado.boleto_atual = None
+        estado.inicio_boleto = None
+        definir_contexto(None, estado.etapa_atual)
+        return resumo
+
+    def suspender_boleto(self) -> Optional[tuple]:
+        """
+        Tira o boleto atual da thread sem gravá-lo, para retomá-lo depois
+
+        Usado quando duas notas se sobrepõem (pipeline): a emissão de uma é
+        confirmada enquanto a seguinte já está em andamento. A duração do
+        boleto retomado continua contando do início original.
+
+        Returns:
+            Estado para retomar_boleto, ou None se não havia boleto em andamento
+        """
+        estado = self._estado()
+        if estado.boleto_atual is None:
+            return None
+        with self._lock:
+            suspenso = (estado.boleto_atual, estado.inicio_boleto, estado.contadores)
+            estado.contadores = {}
+        estado.boleto_atual = None
+        estado.inicio_boleto = None
+        definir_contexto(None, estado.etapa_atual)
+        return suspenso
+
+    def retomar_boleto(self, suspenso: Optional[tuple]):
+        """Volta a contar um boleto suspenso por suspender_boleto"""
+        if suspenso is None:
+            return
+        estado = self._estado()
+        if estado.contadores:
+            self._gravar('sessao', None, None)
+        with self._lock:
+            estado.boleto_atual, estado.inicio_boleto, estado.contadores = suspenso
+        definir_contexto(estado.boleto_atual, estado.etapa_atual)
+
+    def _gravar(self, boleto, sucesso, duracao, extras=None) -> Dict:
+        estado = self._estado()
+        with self._lock:
+            contadores = estado.contadores
+            estado.contadores = {}
+
+        etapas = {}
+        piores = []
+        for etapa, por_tipo in contadores.items():
+            etapas[etapa] = {
+                'comandos': sum(int(i['n']) for i in por_tipo.values()),
+                'ms': round(sum(i['ms'] for i in por_tipo.values()), 1),
+                'tipos': {t: {'n': int(i['n']), 'ms': round(i['ms'], 1)} for t, i in por_tipo.items()}
+            }
+            for tipo, item in por_tipo.items():
+                piores.append({'etapa': etapa, 'tipo': tipo, 'n': int(item['n']), 'ms': round(item['ms'], 1)})
+        piores.sort(key=lambda p: p['ms'], reverse=True)
+
+        resumo = {
+            'data_hora': datetime.now().isoformat(timespec='seconds'),
+            'boleto': boleto,
+            'sucesso': sucesso,
+            'duracao_s': round(duracao, 2) if duracao is not None else None,
+            'comandos': sum(e['comandos'] for e in etapas.values()),
+            'ms_webdriver': round(sum(e['ms'] for e in etapas.values()), 1),
+            'etapas': etapas,
+            'piores': piores[:5]
+        }
+        resumo.update(extras or {})
+        try:
+            with self._lock, open(self.caminho, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(resumo, ensure_ascii=False) + '\n')
+        except Exception as e:
+            logger.warning("Erro ao gravar perfil WebDriver: %s", e)
+
+        memoria = f", navegador com {resumo['rss_mb']:.0f} MB" if resumo.get('rss_mb') else ""
+        logger.info("📊 Perfil WebDriver (%s): %s comandos, %.0fms em chamadas ao navegador%s",
+                    boleto, resumo['comandos'], resumo['ms_webdriver'], memoria)
+        return resumo
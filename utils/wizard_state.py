@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Estado do Wizard - Identifica em que ponto do fluxo do WebISS a página está, em uma única chamada
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+from utils.wait_engine import SELETOR_ETAPA_ATIVA, VISIVEL_JS
+
+logger = logging.getLogger(__name__)
+
+# Estados reconhecidos
+ESTADO_LOGIN = 'login'
+ESTADO_MENU = 'menu'
+ESTADO_PASSO_1 = 'passo1'   # Início (antes do botão Próximo)
+ESTADO_PASSO_2 = 'passo2'   # Tomador
+ESTADO_PASSO_3 = 'passo3'   # Serviços
+ESTADO_PASSO_4 = 'passo4'   # Valores
+ESTADO_POS_EMISSAO = 'pos_emissao'
+ESTADO_MODAL = 'modal'
+ESTADO_DESCONHECIDO = 'desconhecido'
+
+# Diálogos bootstrap/bootbox/jQuery UI abertos sobre a página
+SELETOR_MODAL = '.modal.in, .modal.show, .bootbox, .ui-dialog'
+
+# Classifica a página em um dos estados acima. A ordem importa: um modal
+# aberto bloqueia qualquer passo, e a aba ativa do wizard prevalece sobre
+# mensagens de sucesso (ex.: "rascunho salvo" ainda no passo 4).
+ESTADO_PAGINA_JS = VISIVEL_JS + """
+var resultado = {
+    estado: 'desconhecido', etapa: null, url: window.location.href, detalhe: null,
+    pronto: document.readyState === 'complete'
+};
+
+var modal = Array.prototype.filter.call(document.querySelectorAll(arguments[0]), visivel);
+if (modal.length) {
+    resultado.estado = 'modal';
+    resultado.detalhe = (modal[modal.length - 1].innerText || '').replace(/\\s+/g, ' ').trim().slice(0, 200);
+    return resultado;
+}
+if (Array.prototype.some.call(document.querySelectorAll('input[type="password"]'), visivel)) {
+    resultado.estado = 'login';
+    // Mensagem de erro do formulário de login (credenciais inválidas, bloqueio...)
+    var erros = Array.prototype.filter.call(document.querySelectorAll(
+        '.validation-summary-errors, .field-validation-error, .alert-danger'), visivel);
+    resultado.detalhe = erros.map(function(e) { return (e.innerText || '').trim(); })
+        .filter(function(t) { return t; }).join(' | ') || null;
+    return resultado;
+}
+var ativo = document.querySelector(arguments[1]);
+if (ativo) {
+    resultado.etapa = ativo.getAttribute('href');
+    var numero = /(\\d+)$/.exec(resultado.etapa || '');
+    if (numero) {
+        resultado.estado = 'passo' + numero[1];
+        return resultado;
+    }
+}
+var texto = document.body ? (document.body.innerText || '') : '';
+if (/c[oó]digo de verifica/i.test(texto) || Array.prototype.some.call(
+        document.querySelectorAll('#nota-emitida, .nota-emitida'), visivel)) {
+    resultado.estado = 'pos_emissao';
+    return resultado;
+}
+var menu = Array.prototype.some.call(document.querySelectorAll('span'), function(s) {
+    return visivel(s) && /^\\s*(ISSQN|NFS-e)\\s*$/.test(s.textContent || '');
+});
+if (menu) { resultado.estado = 'menu'; }
+return resultado;
+"""
+
+# Fecha o modal visível mais recente: confirma (botão primário / 'Sim') ou
+# dispensa (fechar / 'Não'); sem botão reconhecível, remove o modal e o fundo.
+FECHAR_MODAL_JS = VISIVEL_JS + """
+var modais = Array.prototype.filter.call(document.querySelectorAll(arguments[0]), visivel);
+if (!modais.length) { return null; }
+var modal = modais[modais.length - 1];
+var seletor = arguments[1]
+    ? "[data-handler='1'], .btn-primary"
+    : "[data-handler='0'], [data-dismiss='modal'], .bootbox-close-button, .close, .btn-default";
+var botao = Array.prototype.filter.call(modal.querySelectorAll(seletor), visivel)[0];
+if (botao) {
+    botao.click();
+    return 'clicado';
+}
+modal.remove();
+document.querySelectorAll('.modal-backdrop').forEach(function(el) { el.remove(); });
+document.body.classList.remove('modal-open');
+return 'removido';
+"""
+
+
+def detectar_estado_pagina(driver) -> Dict[str, Any]:
+    """
+    Classifica a página atual: login, menu, passo 1-4 do wizard, pós-emissão ou modal
+
+    Returns:
+        {'estado': ESTADO_*, 'etapa': aba ativa do wizard ou None, 'url': URL atual,
+         'detalhe': texto do modal ou erro do formulário de login, 'pronto': documento carregado}
+    """
+    return driver.execute_script(ESTADO_PAGINA_JS, SELETOR_MODAL, SELETOR_ETAPA_ATIVA) or {
+        'estado': ESTADO_DESCONHECIDO, 'etapa': None, 'url': None, 'detalhe': None, 'pronto': False
+    }
+
+
+def fechar_modal(driver, confirmar: bool = False) -> Optional[str]:
+    """
+    Fecha o modal aberto sobre a página
+
+    Args:
+        confirmar: Clica no botão de confirmação ('Sim') em vez de dispensar o modal
+
+    Returns:
+        'clicado', 'removido' ou None se não havia modal
+    """
+    return driver.execute_script(FECHAR_MODAL_JS, SELETOR_MODAL, confirmar)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pool de Navegadores - Distribui os boletos entre várias sessões do Chrome em paralelo
+"""
+
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def parse_credenciais(texto: str) -> List[Tuple[str, str]]:
+    """
+    Lê a lista de contas por navegador no formato 'usuario1:senha1;usuario2:senha2'
+
+    Returns:
+        Lista de tuplas (usuário, senha); entradas inválidas são ignoradas
+    """
+    credenciais = []
+    for item in (texto or '').split(';'):
+        if ':' in item:
+            usuario, senha = item.split(':', 1)
+            if usuario.strip():
+                credenciais.append((usuario.strip(), senha.strip()))
+    return credenciais
+
+
+class WorkerPool:
+    """
+    Executa os itens de uma fila em N sessões independentes (uma thread por sessão)
+
+    Cada worker cria a própria automação com criar_automacao(indice); se a
+    criação falhar, apenas aquele worker é descartado. Uma falha ao processar
+    um item não interrompe o worker nem os demais.
+    """
+
+    def __init__(self, num_workers: int, criar_automacao: Callable[[int], Any],
+                 processar: Callable[[Any, Any, int, bool], bool],
+                 continuar: Optional[Callable[[], bool]] = None,
+                 encerrar_automacao: Optional[Callable[[int, Any], None]] = None):
+        """
+        Args:
+            num_workers: Quantidade de sessões paralelas
+            criar_automacao: Recebe o índice do worker e retorna a automação logada (ou None)
+            processar: Recebe (automação, item, posição no worker, há mais itens) e retorna sucesso
+            continuar: Retorna False para interromper o processamento
+            encerrar_automacao: Chamado ao fim de cada worker (índice, automação)
+        """
+        self.num_workers = max(1, int(num_workers))
+        self.criar_automacao = criar_automacao
+        self.processar = processar
+        self.continuar = continuar or (lambda: True)
+        self.encerrar_automacao = encerrar_automacao
+        self.fila: "queue.Queue" = queue.Queue()
+        self.resultados: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def executar(self, itens: List[Any]) -> Dict:
+        """
+        Processa todos os itens e aguarda o fim de todos os workers
+
+        Returns:
+            Resumo {'sucesso': n, 'falha': n, 'nao_processados': n, 'resultados': [...]}
+        """
+        for item in itens:
+            self.fila.put(item)
+
+        threads = [
+            threading.Thread(target=self._worker, args=(indice,), name=f"worker-{indice + 1}", daemon=True)
+            for indice in range(self.num_workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        sucesso = sum(1 for r in self.resultados if r['sucesso'])
+        resumo = {
+            'sucesso': sucesso,
+            'falha': len(self.resultados) - sucesso,
+            'nao_processados': self.fila.qsize(),
+            'resultados': list(self.resultados)
+        }
+        logger.info("Pool de navegadores finalizado: %s sucesso, %s falha, %s não processados",
+                    resumo['sucesso'], resumo['falha'], resumo['nao_processados'])
+        return resumo
+
+    def _worker(self, indice: int):
+        try:
+            automacao = self.criar_automacao(indice)
+        except Exception as e:
+            logger.error("[worker %s] Erro ao iniciar sessão: %s", indice + 1, e)
+            automacao = None
+        if automacao is None:
+            logger.error("[worker %s] Sessão indisponível - worker descartado", indice + 1)
+            return
+
+        posicao = 0
+        try:
+            while self.continuar():
+                try:
+                    item = self.fila.get_nowait()
+                except queue.Empty:
+                    break
+                posicao += 1
+                try:
+                    sucesso = bool(self.processar(automacao, item, posicao, not self.fila.empty()))
+                except Exception as e:
+                    logger.error("[worker %s] Erro ao processar item: %s", indice + 1, e)
+                    sucesso = False
+                with self._lock:
+                    self.resultados.append({'worker': indice + 1, 'item': item, 'sucesso': sucesso})
+        finally:
+            if self.encerrar_automacao:
+                try:
+                    self.encerrar_automacao(indice, automacao)
+                except Exception as e:
+                    logger.warning("[worker %s] Erro ao encerrar sessão: %s", indice + 1, e)
@@ -4,32 +4,265 @@
 Automação WebISS - Login e preenchimento de campos
 """
 
+import os
 import time
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.common.action_chains import ActionChains
 from datetime import datetime
 
+from utils.wait_engine import WaitEngine, SELETOR_ETAPA_ATIVA, MONITOR_JS
+from utils.selector_cache import SelectorCache
+from utils.page_probe import sondar_seletores, preencher_em_lote
+from utils.webdriver_profiler import WebDriverProfiler, perfilar_etapa
+from utils.inscricao_cache import InscricaoCache
+from utils.option_catalog import CatalogoOpcoes
+from utils.conciliacao_rascunhos import interpretar_rascunho, valor_float
+from utils.inscricao_resolver import resolver_inscricoes, escolher_opcao, selecionar_opcao, deduzir_modelo_url, somente_digitos, opcao_selecionada
+from utils.chrome_remoto import garantir_chrome_remoto
+from utils.screenshot_writer import GravadorScreenshots
+from utils.watchdog import WatchdogDriver, memoria_navegador_mb, encerrar_processos_navegador
+from utils.wizard_state import (
+    detectar_estado_pagina, fechar_modal,
+    ESTADO_LOGIN, ESTADO_MODAL, ESTADO_PASSO_1, ESTADO_PASSO_2, ESTADO_PASSO_3, ESTADO_PASSO_4,
+    ESTADO_DESCONHECIDO,
+)
+
 logger = logging.getLogger(__name__)
 
+# Define o valor do serviço e lê de volta em uma única chamada; ativa a aba
+# 'Valores' apenas se o campo ainda não estiver visível.
+CAMPO_VALOR_SERVICO_XPATH = "//*[@id='valores-servico']"
+
+VALOR_SERVICO_JS = """
+var campo = document.getElementById('valores-servico');
+var abaAtivada = false;
+if (!campo || !campo.getClientRects().length) {
+    var aba = document.querySelector("a[href='#tab4-4']");
+    if (aba) { aba.click(); abaAtivada = true; }
+}
+if (!campo) { return {presente: false, aba_ativada: abaAtivada, valor_atual: null}; }
+campo.removeAttribute('disabled');
+campo.value = arguments[0];
+campo.dispatchEvent(new Event('input'));
+campo.dispatchEvent(new Event('change'));
+return {presente: true, aba_ativada: abaAtivada, valor_atual: campo.value};
+"""
+
+# Campo CEP do tomador (preenchido pelo AJAX da página ao escolher a inscrição municipal)
+CEP_CAMPOS = [
+    "//input[@name='cep']",
+    "//input[@id='cep']",
+    "//input[contains(@placeholder, 'CEP')]",
+    "//input[contains(@placeholder, 'cep')]"
+]
+
+# Passos do wizard de emissão (página de um rascunho aberto)
+ESTADOS_WIZARD = (ESTADO_PASSO_1, ESTADO_PASSO_2, ESTADO_PASSO_3, ESTADO_PASSO_4)
+
+# Lista de opções do select2 aberto
+LISTA_SELECT2_XPATH = "//ul[contains(@class, 'select2-results') and not(contains(@style, 'display: none'))]"
+
+# Mensagens de sucesso/erro exibidas pelo WebISS
+SELETOR_ALERTA_ERRO = '.alert-danger, .alert-error, .toast-error, .validation-summary-errors, .ui-pnotify .alert-danger'
+SELETOR_ALERTA_SUCESSO = '.alert-success, .toast-success, .ui-pnotify .alert-success, #nota-emitida, .nota-emitida'
+
+# Textos das mensagens já visíveis antes do clique (ex.: "rascunho salvo")
+ALERTAS_VISIVEIS_JS = """
+return Array.prototype.filter.call(document.querySelectorAll(arguments[0]), function(el) {
+    return el.getClientRects().length;
+}).map(function(el) { return (el.innerText || '').trim(); });
+"""
+
+# Procura a mensagem de sucesso ou de erro da emissão (ou mudança de URL),
+# ignorando as mensagens que já estavam na tela. Devolve null enquanto nada aconteceu.
+RESULTADO_EMISSAO_JS = MONITOR_JS + """
+var ignorar = arguments[1] || [];
+function visiveis(seletor) {
+    return Array.prototype.filter.call(document.querySelectorAll(seletor), function(el) {
+        var texto = (el.innerText || '').trim();
+        return el.getClientRects().length && texto && ignorar.indexOf(texto) === -1;
+    });
+}
+var erro = visiveis(arguments[2]);
+if (erro.length) {
+    return {status: 'erro', texto: erro.map(function(e) { return e.innerText.trim(); }).join(' | ')};
+}
+var sucesso = visiveis(arguments[3]);
+if (sucesso.length) {
+    return {status: 'sucesso', texto: sucesso.map(function(e) { return e.innerText.trim(); }).join(' | ')};
+}
+if (window.location.href !== arguments[0] && document.readyState === 'complete') {
+    // Página da nota emitida: apenas os trechos com número/código de verificação
+    var trechos = (document.body.innerText || '').split('\\n').filter(function(l) {
+        return /n[uú]mero|c[oó]digo de verifica/i.test(l);
+    });
+    return {
+        status: 'url',
+        texto: trechos.slice(0, 10).join(' | '),
+        quieto_ms: Date.now() - (window.__emiteNotaUltimaMutacao || 0)
+    };
+}
+return null;
+"""
+
+
+# Função acaoAbrir(tr) compartilhada pelos scripts da lista de rascunhos: a
+# ação de abrir/editar da linha. Os seletores são tentados um a um, em ordem de
+# prioridade, e ações de excluir, imprimir ou cancelar nunca são escolhidas.
+ACAO_RASCUNHO_JS = """
+var SELETORES_ABRIR = ['a[href*="ditar"]', 'a[title*="ditar"]', 'button[title*="ditar"]',
+                       'a[href*="brir"]', 'a[title*="brir"]', 'a[href*="ascunho"]', 'a[href]:not([href="#"])'];
+var ACAO_PROIBIDA = /exclu|remov|delet|apag|lixeira|trash|imprim|print|pdf|cancel|danger/i;
+function acaoAbrir(tr) {
+    for (var i = 0; i < SELETORES_ABRIR.length; i++) {
+        var candidatos = tr.querySelectorAll(SELETORES_ABRIR[i]);
+        for (var j = 0; j < candidatos.length; j++) {
+            if (!ACAO_PROIBIDA.test(candidatos[j].outerHTML)) { return candidatos[j]; }
+        }
+    }
+    return null;
+}
+function textoLinha(tr) {
+    return (tr.innerText || '').replace(/\\s+/g, ' ').trim();
+}
+"""
+
+# Linhas da página atual da lista de rascunhos: texto e link de abrir/editar de cada uma
+LISTA_RASCUNHOS_JS = ACAO_RASCUNHO_JS + """
+var linhas = document.querySelectorAll('table tbody tr');
+return Array.prototype.map.call(linhas, function(tr, i) {
+    var acao = acaoAbrir(tr);
+    var href = acao && acao.href && !/^javascript:/i.test(acao.href) ? acao.href : null;
+    return {indice: i, texto: textoLinha(tr), href: href};
+}).filter(function(l) { return l.texto; });
+"""
+
+# Clica na ação de abrir/editar da linha com o texto informado (página atual);
+# devolve false se a linha ou a ação não existir
+ABRIR_RASCUNHO_JS = ACAO_RASCUNHO_JS + """
+var linhas = document.querySelectorAll('table tbody tr');
+for (var i = 0; i < linhas.length; i++) {
+    if (textoLinha(linhas[i]) === arguments[0]) {
+        var acao = acaoAbrir(linhas[i]);
+        if (!acao) { return false; }
+        acao.click();
+        return true;
+    }
+}
+return false;
+"""
+
+# Seleciona o maior tamanho de página oferecido pela grade (DataTables ou
+# seletor equivalente); devolve true se o tamanho mudou
+AMPLIAR_PAGINA_RASCUNHOS_JS = """
+var select = document.querySelector('.dataTables_length select, select[name$="_length"], select.page-size, select[name*="PageSize"]');
+if (!select || !select.options.length) { return false; }
+var maior = null;
+Array.prototype.forEach.call(select.options, function(op) {
+    var n = parseInt(op.value, 10);
+    if (isNaN(n)) { return; }
+    var tamanho = n < 0 ? Infinity : n;
+    if (!maior || tamanho > maior.tamanho) { maior = {valor: op.value, tamanho: tamanho}; }
+});
+if (!maior || select.value === maior.valor) { return false; }
+select.value = maior.valor;
+if (window.jQuery) { window.jQuery(select).trigger('change'); }
+else { select.dispatchEvent(new Event('change', {bubbles: true})); }
+return true;
+"""
+
+# Clica no link "próxima página" da grade, se houver e estiver habilitado
+PROXIMA_PAGINA_RASCUNHOS_JS = """
+var link = document.querySelector('.paginate_button.next:not(.disabled), .pagination li.next:not(.disabled) > a, '
+    + '.pagination li:not(.disabled) > a[rel="next"], a[aria-label="Next"]:not(.disabled), a[aria-label="Próximo"]:not(.disabled)');
+if (!link) { return false; }
+link.click();
+return true;
+"""
+
+# Limite de páginas lidas da lista de rascunhos (proteção contra paginação que não avança)
+LIMITE_PAGINAS_RASCUNHOS = 50
+
+
+def cep_confere(cep_preenchido, cep_desejado) -> bool:
+    """Compara CEPs só pelos dígitos (o campo pode vir com ou sem máscara: 77000-000 / 77000000)"""
+    digitos = somente_digitos(cep_preenchido)
+    return bool(digitos) and digitos == somente_digitos(cep_desejado)
+
+
+def extrair_dados_nota(texto: str) -> Dict[str, Any]:
+    """Extrai número da NFS-e e código de verificação do texto de confirmação da emissão"""
+    import re
+    numero = None
+    # Só padrões ancorados em "nota"/"NFS-e" ("Número: 123" sozinho pode ser o do endereço)
+    for padrao in (r'n[uú]mero\s+da\s+(?:nota|nfs-?e)[^\d|]{0,20}(\d+)',
+                   r'nfs-?e\s*(?:n[º°]|n[uú]mero)?\.?\s*:?\s*(\d+)'):
+        numero = re.search(padrao, texto or '', re.IGNORECASE)
+        if numero:
+            break
+    codigo = re.search(r'c[oó]digo\s+de\s+verifica[cç][aã]o\s*:?\s*([A-Z0-9\-]{4,})', texto or '', re.IGNORECASE)
+    return {
+        'numero': numero.group(1) if numero else None,
+        'codigo_verificacao': codigo.group(1) if codigo else None,
+        'mensagem': (texto or '').strip()
+    }
+
 class WebISSAutomation:
     """Classe para automação do WebISS"""
     
+    # Campos com máscara de digitação: exigem send_keys em vez de valor via script
+    CAMPOS_COM_MASCARA = ('cpf_cnpj', 'cep', 'telefone')
+    
+    # Formatos testados no campo de valor do serviço (o aceito é lembrado na sessão)
+    FORMATOS_VALOR = {
+        'original': lambda v: v,
+        'virgula': lambda v: v.replace('.', ','),
+        'ponto': lambda v: v.replace(',', '.'),
+    }
+    
+    # Botão Próximo do início do wizard de criação
+    PROXIMO_INICIO_XPATHS = [
+        "//a[@id='btnProximo']",  # seletor direto por id
+        "//button[contains(., 'Próximo')]",
+        "//a[contains(., 'Próximo')]",
+        "//*[contains(@class, 'btn') and contains(., 'Próximo')]"
+    ]
+    
     def __init__(self, settings):
         self.settings = settings
         self.driver = None
         self.wait = None
+        self.waits = None
+        self.catalogo = None
+        self.formato_valor = None
+        self.url_wizard = None
+        self.url_rascunhos = None
         self.is_logged_in = False
+        self.ressincronizacoes = 0
+        self.relogins = 0
+        self.reciclagens = 0
+        self.notas_desde_reciclagem = 0
+        self.travado = False
+        self.watchdog = None
+        self.anexado = False
+        self.selector_cache = SelectorCache(os.path.join(settings.data_directory, 'seletores_cache.json'))
+        self.inscricao_cache = InscricaoCache(os.path.join(settings.data_directory, 'inscricoes_cache.json'))
+        self.profiler = WebDriverProfiler(os.path.join(self.get_logs_dir(), 'perfil_webdriver.jsonl'))
+        self.screenshots = GravadorScreenshots(
+            os.path.join(self.get_logs_dir(), 'screenshots'), settings.screenshots, settings.screenshots_amostra,
+            settings.screenshots_max_mb, settings.screenshots_max_dias
+        )
     
     def get_logs_dir(self):
         """Retorna o diretório de logs baseado no local do executável"""
@@ -52,7 +285,7 @@ class WebISSAutomation:
     def setup_driver(self):
         """Configura o driver do Chrome"""
         try:
-            logger.info(f"Configurando driver com URL: {self.settings.webiss_url}")
+            logger.info("Configurando driver com URL: %s", self.settings.webiss_url)
             
             chrome_options = Options()
             
@@ -72,32 +305,85 @@ class WebISSAutomation:
             chrome_options.add_argument("--disable-features=VizDisplayCompositor")
             chrome_options.add_argument("--disable-software-rasterizer")
             
+            # Abas em segundo plano continuam processando (modo com várias abas)
+            chrome_options.add_argument("--disable-background-timer-throttling")
+            chrome_options.add_argument("--disable-backgrounding-occluded-windows")
+            chrome_options.add_argument("--disable-renderer-backgrounding")
+            
             # Descomente a linha abaixo para executar em modo headless
             if self.settings.headless_mode:
                 chrome_options.add_argument("--headless")
             
+            # Chrome de longa duração: anexar pela porta de depuração (lançando-o se ainda não existe)
+            porta = self.settings.chrome_debug_port
+            if porta:
+                perfil_dir = self.settings.chrome_perfil_dir or os.path.join(self.settings.data_directory, 'chrome_perfil')
+                if not garantir_chrome_remoto(porta, perfil_dir, list(chrome_options.arguments)):
+                    return False
+                chrome_options = Options()
+                chrome_options.add_experimental_option("debuggerAddress", f"127.0.0.1:{porta}")
+                self.anexado = True
+            
             # Instala e configura o ChromeDriver com tratamento de erro
             try:
                 service = Service(ChromeDriverManager().install())
                 self.driver = webdriver.Chrome(service=service, options=chrome_options)
             except Exception as driver_error:
-                logger.warning(f"Erro com ChromeDriverManager: {driver_error}")
+                logger.warning("Erro com ChromeDriverManager: %s", driver_error)
                 # Fallback: tenta usar ChromeDriver local
                 try:
                     self.driver = webdriver.Chrome(options=chrome_options)
                 except Exception as fallback_error:
-                    logger.error(f"Erro no fallback: {fallback_error}")
+                    logger.error("Erro no fallback: %s", fallback_error)
                     return False
             
+            self.profiler.instalar(self.driver)
             self.wait = WebDriverWait(self.driver, self.settings.timeout)
+            # A sondagem de seletores roda dentro da página até o timeout configurado
+            self.driver.set_script_timeout(self.settings.timeout + 5)
+            # Prazo rígido de carregamento; o watchdog cobre o que o próprio Chrome não limita
+            self.driver.set_page_load_timeout(self.settings.page_load_timeout)
+            if self.watchdog is None:
+                self.watchdog = WatchdogDriver(self.settings.comando_timeout, self._comando_travado)
+                self.watchdog.iniciar()
+            self.profiler.watchdog = self.watchdog
+            self.travado = False
+            if self.anexado:
+                self.reaproveitar_sessao_anexada()
+            self.waits = WaitEngine(self.driver, self.settings.timeout)
+            self.catalogo = CatalogoOpcoes(self.driver)
             
             logger.info("Driver do Chrome configurado com sucesso")
             return True
             
         except Exception as e:
-            logger.error(f"Erro ao configurar driver: {e}")
+            logger.error("Erro ao configurar driver: %s", e)
             return False
     
+    def reaproveitar_sessao_anexada(self):
+        """No Chrome anexado, foca a aba do WebISS e a considera logada se não estiver na página de login"""
+        from urllib.parse import urlparse
+        try:
+            dominio = urlparse(self.settings.webiss_url).netloc
+            for handle in self.driver.window_handles:
+                self.driver.switch_to.window(handle)
+                if dominio and dominio in self.driver.current_url:
+                    break
+            estado = self.estado_pagina()
+            if dominio and dominio in (estado.get('url') or '') and estado['estado'] != ESTADO_LOGIN:
+                self.is_logged_in = True
+                logger.info("🔗 Aba do WebISS já logada reaproveitada (página em '%s')", estado['estado'])
+        except Exception as e:
+            logger.warning("⚠️ Não foi possível reaproveitar a aba do Chrome anexado: %s", e)
+    
+    def encerrar_driver(self):
+        """Encerra a sessão WebDriver; no Chrome anexado, apenas o ChromeDriver (o Chrome continua aberto)"""
+        if self.anexado:
+            self.driver.service.stop()
+        else:
+            self.driver.quit()
+    
+    @perfilar_etapa('login')
     def login(self) -> bool:
         """
         Realiza login no WebISS (versão otimizada)
@@ -117,19 +403,19 @@ class WebISSAutomation:
             
             # Valida URL
             if not self.settings.webiss_url or self.settings.webiss_url.startswith('data:'):
-                logger.error(f"URL inválida: {self.settings.webiss_url}")
+                logger.error("URL inválida: %s", self.settings.webiss_url)
                 return False
             
             # Navega para a página de login
-            logger.info(f"Navegando para: {self.settings.webiss_url}")
+            logger.info("Navegando para: %s", self.settings.webiss_url)
             self.driver.get(self.settings.webiss_url)
             
-            # Aguarda carregamento da página (reduzido)
-            time.sleep(0.5)
+            # Aguarda carregamento da página
+            self.waits.aguardar_documento_pronto()
             
             # Log da URL atual para debug
-            logger.info(f"URL atual: {self.driver.current_url}")
-            logger.info(f"Título da página: {self.driver.title}")
+            logger.info("URL atual: %s", self.driver.current_url)
+            logger.info("Título da página: %s", self.driver.title)
             
             # Tenta diferentes seletores para campo de usuário (otimizado)
             username_selectors = [
@@ -143,16 +429,7 @@ class WebISSAutomation:
                 (By.XPATH, "//input[@placeholder*='usuário' or @placeholder*='login' or @placeholder*='email']")
             ]
             
-            username_field = None
-            for selector_type, selector_value in username_selectors:
-                try:
-                    username_field = self.wait.until(
-                        EC.presence_of_element_located((selector_type, selector_value))
-                    )
-                    logger.info(f"Campo de usuário encontrado: {selector_type}={selector_value}")
-                    break
-                except TimeoutException:
-                    continue
+            username_field, _ = self.resolver_elemento('login_usuario', username_selectors, clicavel=False)
             
             if not username_field:
                 logger.error("Campo de usuário não encontrado")
@@ -173,14 +450,7 @@ class WebISSAutomation:
                 (By.ID, "senha")
             ]
             
-            password_field = None
-            for selector_type, selector_value in password_selectors:
-                try:
-                    password_field = self.driver.find_element(selector_type, selector_value)
-                    logger.info(f"Campo de senha encontrado: {selector_type}={selector_value}")
-                    break
-                except NoSuchElementException:
-                    continue
+            password_field, _ = self.resolver_elemento('login_senha', password_selectors, clicavel=False, timeout=0)
             
             if not password_field:
                 logger.error("Campo de senha não encontrado")
@@ -203,14 +473,7 @@ class WebISSAutomation:
                 (By.NAME, "login-button")
             ]
             
-            login_button = None
-            for selector_type, selector_value in login_button_selectors:
-                try:
-                    login_button = self.driver.find_element(selector_type, selector_value)
-                    logger.info(f"Botão de login encontrado: {selector_type}={selector_value}")
-                    break
-                except NoSuchElementException:
-                    continue
+            login_button, _ = self.resolver_elemento('login_botao', login_button_selectors, clicavel=False, timeout=0)
             
             if not login_button:
                 logger.error("Botão de login não encontrado")
@@ -220,89 +483,47 @@ class WebISSAutomation:
             self.driver.execute_script("arguments[0].click();", login_button)
             logger.info("Botão de login clicado via JavaScript")
             
-            # Aguarda redirecionamento após login (reduzido)
-            time.sleep(0.5)
+            # Login concluído: a página deixa de ser o formulário de login (nova URL ou painel);
+            # uma mensagem de erro no formulário encerra a espera imediatamente
+            def login_concluido(d):
+                estado = detectar_estado_pagina(d)
+                if estado['estado'] == ESTADO_LOGIN:
+                    return estado if estado.get('detalhe') else None
+                return estado if estado.get('pronto') else None
+            
+            estado = self.waits.aguardar("login concluído", login_concluido)
             
             # Log da URL após login para debug
-            logger.info(f"URL após login: {self.driver.current_url}")
-            logger.info(f"Título após login: {self.driver.title}")
-            
-            # Verifica se login foi bem-sucedido
-            success_indicators = [
-                "dashboard" in self.driver.current_url.lower(),
-                "home" in self.driver.current_url.lower(),
-                "main" in self.driver.current_url.lower(),
-                "welcome" in self.driver.current_url.lower(),
-                "painel" in self.driver.current_url.lower(),
-                "menu" in self.driver.current_url.lower(),
-                "inicio" in self.driver.current_url.lower()
-            ]
+            logger.info("URL após login: %s", self.driver.current_url)
             
-            if any(success_indicators):
+            if estado and estado['estado'] != ESTADO_LOGIN:
                 self.is_logged_in = True
-                logger.info("Login realizado com sucesso")
+                logger.info("Login realizado com sucesso (página: %s)", estado['estado'])
                 return True
+            if estado:
+                logger.error("Erro de login: %s", estado['detalhe'])
             else:
-                # Verifica se há mensagem de erro
-                error_messages = [
-                    "//div[contains(text(), 'erro')]",
-                    "//div[contains(text(), 'inválido')]",
-                    "//div[contains(text(), 'incorreto')]",
-                    "//span[contains(text(), 'erro')]",
-                    "//p[contains(text(), 'erro')]"
-                ]
-                
-                for error_xpath in error_messages:
-                    try:
-                        error_element = self.driver.find_element(By.XPATH, error_xpath)
-                        logger.error(f"Erro de login: {error_element.text}")
-                    except NoSuchElementException:
-                        continue
-                
-                logger.error("Falha no login - URL não corresponde ao esperado")
-                return False
+                logger.error("Falha no login - a página de login não foi deixada dentro do prazo")
+            return False
                 
         except TimeoutException:
             logger.error("Timeout ao tentar fazer login")
             return False
         except Exception as e:
-            logger.error(f"Erro durante login: {e}")
+            logger.error("Erro durante login: %s", e)
             return False
     
 
     
+    @perfilar_etapa('tomador')
     def fill_nfse_form(self, data: Dict[str, Any]) -> bool:
         """
         Preenche formulário de NFSe com os dados fornecidos (WebISS Palmas)
         """
         try:
             logger.info("=== PREENCHENDO FORMULÁRIO TOMADOR ===")
-            logger.info(f"Dados recebidos: {data}")
+            logger.debug("Dados recebidos: %s", data)
             
-            # Função auxiliar para encontrar e preencher campo
-            def find_and_fill_field(field_name, xpath_list, value):
-                """Encontra e preenche um campo usando múltiplos XPaths"""
-                if not value:
-                    logger.warning(f"Valor vazio para {field_name}")
-                    return False
-                
-                for xpath in xpath_list:
-                    try:
-                        element = self.driver.find_element(By.XPATH, xpath)
-                        if element.is_displayed() and element.is_enabled():
-                            # Removido scrollIntoView para evitar bug na tela
-                            time.sleep(0.1)  # OTIMIZADO: reduzido de 0.25 para 0.1
-                            element.clear()
-                            element.send_keys(str(value))
-                            logger.info(f"✅ Campo {field_name} preenchido: {value} (usando: {xpath})")
-                            return True
-                    except Exception as e:
-                        logger.debug(f"Falha no XPath {xpath} para {field_name}: {e}")
-                        continue
-                
-                logger.warning(f"❌ Campo {field_name} não encontrado em nenhum XPath")
-                return False
-
             # 1. Preencher CPF/CNPJ
             cpf_xpaths = [
                 "//input[@placeholder='Número do documento do tomador']",
@@ -312,9 +533,10 @@ class WebISSAutomation:
                 "//input[contains(@placeholder, 'CNPJ')]",
                 "//input[contains(@placeholder, 'documento')]"
             ]
-            find_and_fill_field('cpf_cnpj', cpf_xpaths, data.get('cpf_cnpj', ''))
+            # CPF/CNPJ tem máscara: precisa de eventos de tecla reais
+            self.preencher_campo_nativo('cpf_cnpj', cpf_xpaths, data.get('cpf_cnpj', ''))
 
-            # 2. Preencher Nome/Razão Social
+            # 2. Nome/Razão Social (preenchido em lote junto com os campos adicionais)
             nome_xpaths = [
                 "//input[@placeholder='Razão social do tomador']",
                 "//input[@name='nome']",
@@ -323,11 +545,10 @@ class WebISSAutomation:
                 "//input[contains(@placeholder, 'razão')]",
                 "//input[contains(@placeholder, 'social')]"
             ]
-            find_and_fill_field('nome_cliente', nome_xpaths, data.get('nome_cliente', ''))
 
             # 3. Lidar com Inscrição Municipal e CEP
             cep_value = data.get('cep', '')
-            logger.info(f"CEP recebido nos dados: '{cep_value}'")
+            logger.info("CEP recebido nos dados: '%s'", cep_value)
             
             if not cep_value and 'endereco' in data:
                 # Tentar extrair CEP do endereço com múltiplas estratégias
@@ -337,33 +558,33 @@ class WebISSAutomation:
                 cep_match = re.search(r'(\d{5})-?(\d{3})', data['endereco'])
                 if cep_match:
                     cep_value = f"{cep_match.group(1)}-{cep_match.group(2)}"
-                    logger.info(f"✅ CEP extraído do endereço (padrão): {cep_value}")
+                    logger.info("✅ CEP extraído do endereço (padrão): %s", cep_value)
                 else:
                     # Estratégia 2: CEP sem hífen
                     cep_match = re.search(r'(\d{8})', data['endereco'])
                     if cep_match:
                         cep = cep_match.group(1)
                         cep_value = f"{cep[:5]}-{cep[5:]}"
-                        logger.info(f"✅ CEP extraído do endereço (sem hífen): {cep_value}")
+                        logger.info("✅ CEP extraído do endereço (sem hífen): %s", cep_value)
                     else:
                         # Estratégia 3: Buscar CEP em qualquer lugar
                         cep_match = re.search(r'(\d{5})[.\-\s]*(\d{3})', data['endereco'])
                         if cep_match:
                             cep_value = f"{cep_match.group(1)}-{cep_match.group(2)}"
-                            logger.info(f"✅ CEP extraído do endereço (alternativo): {cep_value}")
+                            logger.info("✅ CEP extraído do endereço (alternativo): %s", cep_value)
                         else:
-                            logger.warning(f"❌ CEP não encontrado no endereço: {data['endereco']}")
+                            logger.warning("❌ CEP não encontrado no endereço: %s", data['endereco'])
                             # Tentar extrair da descrição
                             if 'descricao' in data and data['descricao']:
                                 cep_match = re.search(r'(\d{5})-?(\d{3})', data['descricao'])
                                 if cep_match:
                                     cep_value = f"{cep_match.group(1)}-{cep_match.group(2)}"
-                                    logger.info(f"✅ CEP extraído da descrição: {cep_value}")
+                                    logger.info("✅ CEP extraído da descrição: %s", cep_value)
             else:
                 if cep_value:
-                    logger.info(f"✅ CEP já disponível nos dados: {cep_value}")
+                    logger.info("✅ CEP já disponível nos dados: %s", cep_value)
                 else:
-                    logger.warning(f"⚠️ CEP não disponível nos dados e endereço não encontrado")
+                    logger.warning("⚠️ CEP não disponível nos dados e endereço não encontrado")
             
             # Verificar se o campo Inscrição Municipal virou select ou select2
             logger.info("🔍 Verificando campo Inscrição Municipal...")
@@ -388,21 +609,20 @@ class WebISSAutomation:
                         "//div[contains(@class, 'select2-container') and contains(@class, 'inscricao')]"
                     ]
                     
-                    for selector in inscricao_selectors:
-                        try:
-                            inscricao_municipal_select2 = self.driver.find_element(By.XPATH, selector)
-                            if inscricao_municipal_select2.is_displayed():
-                                logger.info(f"✅ Select2 da Inscrição Municipal encontrado: {selector}")
-                                break
-                        except:
-                            continue
+                    inscricao_municipal_select2, selector = self.resolver_elemento(
+                        'inscricao_select2', inscricao_selectors, timeout=0
+                    )
+                    if inscricao_municipal_select2:
+                        logger.info("✅ Select2 da Inscrição Municipal encontrado: %s", selector)
                 
                 # Lidar com select normal
                 if inscricao_municipal_select:
                     logger.info("🔄 Campo Inscrição Municipal é um select normal - tentando selecionar opção correta...")
                     
                     if cep_value:
-                        success = self.tentar_selecionar_inscricao_select_por_cep(inscricao_municipal_select, cep_value)
+                        success = self.tentar_selecionar_inscricao_select_por_cep(
+                            inscricao_municipal_select, cep_value, data.get('cpf_cnpj', '')
+                        )
                         if success:
                             logger.info("✅ Inscrição Municipal selecionada com sucesso pelo CEP")
                         else:
@@ -415,7 +635,9 @@ class WebISSAutomation:
                     logger.info("🔄 Campo Inscrição Municipal é um select2 - tentando selecionar opção correta...")
                     
                     if cep_value:
-                        success = self.tentar_selecionar_inscricao_por_cep(inscricao_municipal_select2, cep_value)
+                        success = self.tentar_selecionar_inscricao_por_cep(
+                            inscricao_municipal_select2, cep_value, data.get('cpf_cnpj', '')
+                        )
                         if success:
                             logger.info("✅ Inscrição Municipal selecionada com sucesso pelo CEP")
                         else:
@@ -427,35 +649,21 @@ class WebISSAutomation:
                 else:
                     logger.info("ℹ️ Campo Inscrição Municipal não é um select - preenchendo CEP normalmente")
                     # Preencher CEP normalmente
-                    cep_xpaths = [
-                        "//input[@name='cep']",
-                        "//input[@id='cep']",
-                        "//input[contains(@placeholder, 'CEP')]",
-                        "//input[contains(@placeholder, 'cep')]"
-                    ]
-                    
-                    logger.info(f"Tentando preencher CEP: '{cep_value}'")
+                    logger.info("Tentando preencher CEP: '%s'", cep_value)
                     if cep_value:
-                        success = find_and_fill_field('cep', cep_xpaths, cep_value)
+                        success = self.preencher_campo_nativo('cep', CEP_CAMPOS, cep_value)
                         if success:
-                            logger.info(f"✅ CEP preenchido com sucesso: {cep_value}")
+                            logger.info("✅ CEP preenchido com sucesso: %s", cep_value)
                         else:
-                            logger.error(f"❌ Falha ao preencher CEP: {cep_value}")
+                            logger.error("❌ Falha ao preencher CEP: %s", cep_value)
                     else:
                         logger.warning("⚠️ Nenhum CEP disponível para preencher")
                         
             except Exception as e:
-                logger.error(f"❌ Erro ao verificar inscrição municipal: {e}")
+                logger.error("❌ Erro ao verificar inscrição municipal: %s", e)
                 # Fallback: tentar preencher CEP normalmente
-                cep_xpaths = [
-                    "//input[@name='cep']",
-                    "//input[@id='cep']",
-                    "//input[contains(@placeholder, 'CEP')]",
-                    "//input[contains(@placeholder, 'cep')]"
-                ]
-                
                 if cep_value:
-                    find_and_fill_field('cep', cep_xpaths, cep_value)
+                    self.preencher_campo_nativo('cep', CEP_CAMPOS, cep_value)
 
             # 4. Aguardar preenchimento automático do endereço (Município/UF) - REMOVIDO para otimização
             # logger.info("Aguardando preenchimento automático do município...")
@@ -521,10 +729,10 @@ class WebISSAutomation:
                 ]
             }
             
+            mapa = {'nome_cliente': (nome_xpaths, data.get('nome_cliente', ''))}
             for campo, xpaths in campos_adicionais.items():
-                valor = data.get(campo, '')
-                if valor:
-                    find_and_fill_field(campo, xpaths, valor)
+                mapa[campo] = (xpaths, data.get(campo, ''))
+            self.preencher_campos_em_lote(mapa)
 
             # 6. Salvar screenshot para debug (REMOVIDO para otimização)
             # try:
@@ -537,7 +745,7 @@ class WebISSAutomation:
             return True
             
         except Exception as e:
-            logger.error(f"❌ Erro ao preencher formulário: {e}")
+            logger.error("❌ Erro ao preencher formulário: %s", e)
             self.take_screenshot("step2_error.png")
             return False
     
@@ -545,15 +753,152 @@ class WebISSAutomation:
     
 
 
-    def click_proximo(self) -> bool:
-        """Clica no botão Próximo na etapa atual"""
+    def preencher_campo_nativo(self, field_name: str, candidatos: List, value) -> bool:
+        """
+        Preenche um campo com clear/send_keys (eventos de tecla reais)
+        
+        Usado apenas em campos com máscara, que ignoram valores definidos via script.
+        """
+        if not value:
+            logger.warning("Valor vazio para %s", field_name)
+            return False
+        
+        element, xpath = self.resolver_elemento(f"campo_{field_name}", candidatos, timeout=0)
+        if element is None:
+            logger.warning("❌ Campo %s não encontrado em nenhum XPath", field_name)
+            return False
+        
         try:
-            import time
-            logger.info("=== TENTANDO CLICAR EM PRÓXIMO ===")
+            # Removido scrollIntoView para evitar bug na tela
+            element.clear()
+            element.send_keys(str(value))
+            logger.info("✅ Campo %s preenchido: %s (usando: %s)", field_name, value, xpath)
+            return True
+        except Exception as e:
+            logger.warning("❌ Falha ao preencher %s (%s): %s", field_name, xpath, e)
+            return False
+
+    def preencher_campos_em_lote(self, mapa: Dict[str, Any]) -> Dict[str, Dict]:
+        """
+        Preenche vários campos com uma única chamada de script
+        
+        Campos com máscara (CAMPOS_COM_MASCARA) são desviados para send_keys,
+        pois precisam de eventos de tecla reais.
+        
+        Args:
+            mapa: {campo lógico: (lista de seletores candidatos, valor)}; campos
+                com valor vazio são ignorados
             
-            # Aguardar um pouco antes de procurar o botão (OTIMIZADO)
-            time.sleep(0.5)
+        Returns:
+            Relatório por campo: {campo: {'ok': bool, 'seletor': ..., 'motivo': ...}}
+        """
+        relatorio = {}
+        lote = {}
+        for campo, (candidatos, valor) in mapa.items():
+            if not valor:
+                continue
+            ordenados = self.selector_cache.ordenar(f"campo_{campo}", candidatos)
+            if campo in self.CAMPOS_COM_MASCARA:
+                ok = self.preencher_campo_nativo(campo, ordenados, valor)
+                relatorio[campo] = {'ok': ok, 'seletor': None, 'motivo': None if ok else 'falha_send_keys'}
+            else:
+                lote[campo] = (ordenados, valor)
+        
+        if lote:
+            try:
+                resultado = preencher_em_lote(self.driver, lote)
+            except Exception as e:
+                logger.warning("❌ Erro no preenchimento em lote: %s", e)
+                resultado = {}
+            
+            for campo, (ordenados, valor) in lote.items():
+                info = resultado.get(campo) or {'ok': False, 'indice': -1, 'motivo': 'sem_resposta'}
+                indice = info.get('indice', -1)
+                seletor = ordenados[indice] if indice is not None and indice >= 0 else None
+                if seletor is not None:
+                    self.selector_cache.registrar_resultado(f"campo_{campo}", seletor)
+                else:
+                    self.selector_cache.registrar_nao_encontrado(f"campo_{campo}")
+                relatorio[campo] = {'ok': bool(info.get('ok')), 'seletor': seletor, 'motivo': info.get('motivo')}
+                if info.get('ok'):
+                    logger.info("✅ Campo %s preenchido: %s (usando: %s)", campo, valor, seletor)
+                else:
+                    logger.warning("❌ Campo %s não preenchido (%s)", campo, info.get('motivo'))
+        
+        return relatorio
+
+    def resolver_elemento(self, elemento: str, candidatos: List, clicavel: bool = True,
+                          timeout: Optional[float] = None):
+        """
+        Localiza um elemento a partir de uma lista de seletores candidatos
+        
+        O seletor que funcionou da última vez é tentado primeiro; todos os
+        candidatos são avaliados dentro da página em uma única chamada, que
+        repete a sondagem no próprio navegador até o limite de tempo. Com
+        várias abas (AgendadorAbas), a sondagem repetida no navegador
+        prenderia o foco: cada passada é única e as repetições passam pelo
+        WaitEngine, que entrega o foco às outras abas entre elas.
+        
+        Args:
+            elemento: Nome lógico do elemento (chave do cache de seletores)
+            candidatos: Lista de XPaths ou tuplas (By, valor)
+            clicavel: Exige elemento visível e habilitado (senão basta estar no DOM)
+            timeout: Limite da sondagem (padrão: timeout das configurações; 0 = uma única passada)
             
+        Returns:
+            Tupla (elemento, candidato) ou (None, None) se não encontrado
+        """
+        ordenados = self.selector_cache.ordenar(elemento, candidatos)
+        limite = self.settings.timeout if timeout is None else timeout
+        
+        try:
+            if self.waits is not None and self.waits.agendador is not None:
+                el, indice, tentativas = self.sondar_pelo_agendador(elemento, ordenados, limite, clicavel)
+            else:
+                el, indice, tentativas = sondar_seletores(self.driver, ordenados, limite, clicavel)
+        except Exception as e:
+            logger.warning("Erro na sondagem de '%s': %s", elemento, e)
+            el, indice, tentativas = None, -1, 0
+        
+        encontrado = (el, ordenados[indice]) if el is not None else None
+        busca_lenta = tentativas > 1
+        
+        if not encontrado:
+            self.selector_cache.registrar_nao_encontrado(elemento)
+            logger.warning("❌ Elemento '%s' não encontrado em nenhum dos %s seletores", elemento, len(candidatos))
+            return None, None
+        
+        el, candidato = encontrado
+        if busca_lenta:
+            logger.info("⏱️ Elemento '%s' apareceu após %s sondagens", elemento, tentativas)
+        self.selector_cache.registrar_resultado(elemento, candidato, busca_lenta)
+        logger.info("✅ Elemento '%s' encontrado: %s", elemento, candidato)
+        return el, candidato
+
+    def sondar_pelo_agendador(self, elemento: str, candidatos: List, limite: float, clicavel: bool):
+        """Repete sondagens de uma passada pelo WaitEngine (mesmo retorno de sondar_seletores)"""
+        passadas = [0]
+        
+        def condicao(d):
+            passadas[0] += 1
+            el, indice, _ = sondar_seletores(d, candidatos, 0, clicavel)
+            return (el, indice) if el is not None else None
+        
+        achado = self.waits.aguardar(f"elemento '{elemento}'", condicao, limite)
+        if not achado:
+            return None, -1, passadas[0]
+        return achado[0], achado[1], passadas[0]
+
+    @perfilar_etapa('avançar')
+    def click_proximo(self) -> bool:
+        """Clica no botão Próximo na etapa atual (True só se o wizard mudou de etapa)"""
+        try:
+            logger.info("=== TENTANDO CLICAR EM PRÓXIMO ===")
+
+            # Aguardar requisições pendentes da etapa atual antes de procurar o botão
+            self.waits.aguardar_ajax_ocioso()
+            etapa_anterior = self.waits.etapa_atual()
+
             # Lista de XPaths para o botão Próximo
             proximo_btn_xpaths = [
                 "//a[@id='btnProximo']",
@@ -574,24 +919,7 @@ class WebISSAutomation:
             ]
             
             # Tentar encontrar e clicar no botão
-            proximo_btn = None
-            xpath_usado = None
-            
-            for xpath in proximo_btn_xpaths:
-                try:
-                    logger.info(f"Tentando XPath: {xpath}")
-                    proximo_btn = self.wait.until(
-                        EC.element_to_be_clickable((By.XPATH, xpath))
-                    )
-                    xpath_usado = xpath
-                    logger.info(f"✅ Botão Próximo encontrado: {xpath}")
-                    break
-                except TimeoutException:
-                    logger.debug(f"XPath não encontrado: {xpath}")
-                    continue
-                except Exception as e:
-                    logger.debug(f"Erro no XPath {xpath}: {e}")
-                    continue
+            proximo_btn, xpath_usado = self.resolver_elemento('botao_proximo', proximo_btn_xpaths)
             
             if not proximo_btn:
                 logger.error("❌ Botão Próximo não encontrado em nenhum seletor")
@@ -599,30 +927,24 @@ class WebISSAutomation:
                 # Tentar encontrar qualquer botão na página
                 try:
                     todos_botoes = self.driver.find_elements(By.XPATH, "//button | //a[contains(@class, 'btn')] | //input[@type='submit']")
-                    logger.info(f"Encontrados {len(todos_botoes)} botões na página:")
+                    logger.info("Encontrados %s botões na página:", len(todos_botoes))
                     for i, btn in enumerate(todos_botoes[:10]):  # Mostrar apenas os primeiros 10
                         try:
                             texto = btn.text.strip()
                             classe = btn.get_attribute('class') or ''
                             id_btn = btn.get_attribute('id') or ''
-                            logger.info(f"  Botão {i+1}: texto='{texto}', class='{classe}', id='{id_btn}'")
+                            logger.info("  Botão %s: texto='%s', class='%s', id='%s'", i+1, texto, classe, id_btn)
                         except Exception as e:
-                            logger.info(f"  Botão {i+1}: erro ao obter informações - {e}")
+                            logger.info("  Botão %s: erro ao obter informações - %s", i+1, e)
                 except Exception as e:
-                    logger.warning(f"Erro ao listar botões: {e}")
+                    logger.warning("Erro ao listar botões: %s", e)
                 
                 self.take_screenshot("proximo_btn_not_found.png")
                 return False
             
-            # Scroll para o botão
-            try:
-                # Removido scrollIntoView para evitar que o conteúdo seja empurrado para cima
-                # O botão Próximo geralmente já está visível na parte inferior da tela
-                time.sleep(1)
-                logger.info("Aguardando botão Próximo (sem scroll)")
-            except Exception as e:
-                logger.warning(f"Erro no aguardo: {e}")
-            
+            # Removido scrollIntoView para evitar que o conteúdo seja empurrado para cima
+            # O botão Próximo geralmente já está visível na parte inferior da tela
+
             # Verificar se o botão está visível e habilitado
             try:
                 if not proximo_btn.is_displayed():
@@ -630,7 +952,7 @@ class WebISSAutomation:
                 if not proximo_btn.is_enabled():
                     logger.warning("⚠️ Botão Próximo não está habilitado")
             except Exception as e:
-                logger.warning(f"Erro ao verificar estado do botão: {e}")
+                logger.warning("Erro ao verificar estado do botão: %s", e)
             
             # Tentar clicar no botão
             try:
@@ -639,61 +961,39 @@ class WebISSAutomation:
                 self.driver.execute_script("arguments[0].click();", proximo_btn)
                 logger.info("✅ Botão Próximo clicado via JavaScript!")
                 
-                # Aguardar um pouco para a página carregar
-                time.sleep(1)
-                
-                # Verificar se apareceu modal de confirmação
-                try:
-                    modal_sim = self.driver.find_element(By.XPATH, "//a[@data-handler='1' and contains(@class, 'btn-primary') and text()='Sim']")
-                    if modal_sim.is_displayed():
-                        logger.info("✅ Modal de confirmação detectado, clicando em 'Sim'...")
-                        self.driver.execute_script("arguments[0].click();", modal_sim)
-                        time.sleep(1)
-                        logger.info("✅ Modal confirmado com 'Sim'")
-                except:
-                    logger.info("ℹ️ Nenhum modal de confirmação detectado")
+                # Aguardar a próxima etapa (confirmando o modal se ele aparecer)
+                avancou = self.aguardar_transicao_etapa(etapa_anterior)
                 
                 # Verificar se houve mudança na URL ou título
                 url_atual = self.driver.current_url
                 titulo_atual = self.driver.title
-                logger.info(f"URL após clique: {url_atual}")
-                logger.info(f"Título após clique: {titulo_atual}")
+                logger.info("URL após clique: %s", url_atual)
+                logger.info("Título após clique: %s", titulo_atual)
                 
-                # Salvar screenshot após o clique
-                try:
-                    self.take_screenshot("apos_proximo_click.png")
-                    logger.info("Screenshot após clique salvo: apos_proximo_click.png")
-                except Exception as e:
-                    logger.warning(f"Erro ao salvar screenshot: {e}")
+                # Screenshot após o clique (conforme a política de screenshots)
+                self.take_screenshot("apos_proximo_click.png", erro=False)
                 
-                return True
+                if not avancou:
+                    logger.warning("⚠️ Botão Próximo clicado, mas o wizard não mudou de etapa")
+                return avancou
             except Exception as e:
-                logger.error(f"❌ Erro ao clicar no botão via JavaScript: {e}")
+                logger.error("❌ Erro ao clicar no botão via JavaScript: %s", e)
                 # Fallback: tentar clique normal
                 try:
                     logger.info("Tentando clique normal como fallback...")
                     proximo_btn.click()
-                    time.sleep(1)
-                    
-                    # Verificar modal novamente
-                    try:
-                        modal_sim = self.driver.find_element(By.XPATH, "//a[@data-handler='1' and contains(@class, 'btn-primary') and text()='Sim']")
-                        if modal_sim.is_displayed():
-                            logger.info("✅ Modal de confirmação detectado no fallback, clicando em 'Sim'...")
-                            modal_sim.click()
-                            time.sleep(1)
-                            logger.info("✅ Modal confirmado com 'Sim' (fallback)")
-                    except:
-                        logger.info("ℹ️ Nenhum modal de confirmação detectado no fallback")
+                    if not self.aguardar_transicao_etapa(etapa_anterior):
+                        logger.warning("⚠️ Clique normal realizado, mas o wizard não mudou de etapa")
+                        return False
                     
                     logger.info("✅ Clique normal realizado como fallback!")
                     return True
                 except Exception as normal_error:
-                    logger.error(f"❌ Erro no clique normal: {normal_error}")
+                    logger.error("❌ Erro no clique normal: %s", normal_error)
                     self.take_screenshot("proximo_btn_error.png")
                     return False
         except Exception as e:
-            logger.error(f"❌ Erro geral ao clicar em Próximo: {e}")
+            logger.error("❌ Erro geral ao clicar em Próximo: %s", e)
             self.take_screenshot("proximo_btn_error.png")
             return False
 
@@ -701,34 +1001,78 @@ class WebISSAutomation:
 
 
 
+    def aguardar_transicao_etapa(self, etapa_anterior: Optional[str], timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda o wizard sair da etapa informada, confirmando o modal 'Sim' se ele aparecer
+
+        Args:
+            etapa_anterior: Aba ativa antes do clique (None se não identificada)
+            timeout: Limite em segundos (padrão: timeout das configurações)
+
+        Returns:
+            bool: True se a transição foi detectada
+        """
+        modal_xpath = "//a[@data-handler='1' and contains(@class, 'btn-primary') and text()='Sim']"
+
+        def condicao(d):
+            return d.execute_script("""
+                var modal = document.evaluate(arguments[0], document, null,
+                    XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+                if (modal && modal.offsetParent !== null) { return {modal: modal}; }
+                var ativo = document.querySelector(arguments[2]);
+                var etapa = ativo ? ativo.getAttribute('href') : null;
+                if (arguments[1] === null) {
+                    // Etapa não identificável: considerar concluído quando a página estiver ociosa
+                    var ocioso = (!window.jQuery || window.jQuery.active === 0) && !window.__emiteNotaPendentes;
+                    var quieto = Date.now() - (window.__emiteNotaUltimaMutacao || 0) >= 300;
+                    return (ocioso && quieto) ? {etapa: etapa} : null;
+                }
+                return (etapa !== null && etapa !== arguments[1]) ? {etapa: etapa} : null;
+            """, modal_xpath, etapa_anterior, SELETOR_ETAPA_ATIVA)
+
+        for _ in range(2):
+            resultado = self.waits.aguardar("transição de etapa", condicao, timeout)
+            if not resultado:
+                return False
+            if 'modal' not in resultado:
+                logger.info("Etapa atual do wizard: %s", resultado.get('etapa'))
+                return True
+            logger.info("✅ Modal de confirmação detectado, clicando em 'Sim'...")
+            self.driver.execute_script("arguments[0].click();", resultado['modal'])
+            self.waits.aguardar(
+                "modal fechado",
+                lambda d: not any(e.is_displayed() for e in d.find_elements(By.XPATH, modal_xpath)),
+                timeout
+            )
+            logger.info("✅ Modal confirmado com 'Sim'")
+        return True
+
     def selecionar_mes_competencia(self, mes_num):
         """Seleciona o mês de competência no select2 do mês com múltiplas estratégias e remoção de overlay."""
         try:
-            import time
             import os
-            from selenium.webdriver.support.ui import WebDriverWait
             from selenium.webdriver.common.by import By
             from selenium.webdriver.common.action_chains import ActionChains
             
             # Detectar mês atual automaticamente
             from datetime import datetime
             mes_atual = datetime.now().month
-            logger.info(f"[DEBUG] Mês atual detectado: {mes_atual}")
-            logger.info(f"[DEBUG] Mês solicitado: {mes_num}")
+            logger.debug("[DEBUG] Mês atual detectado: %s", mes_atual)
+            logger.debug("[DEBUG] Mês solicitado: %s", mes_num)
             
             # Se o mês solicitado for igual ao atual, usar o atual (evita modal)
             if mes_num == mes_atual:
-                logger.info(f"[DEBUG] Usando mês atual ({mes_atual}) para evitar modal de confirmação")
+                logger.debug("[DEBUG] Usando mês atual (%s) para evitar modal de confirmação", mes_atual)
                 mes_para_usar = mes_atual
             else:
-                logger.info(f"[DEBUG] Usando mês solicitado ({mes_num}) - pode aparecer modal")
+                logger.debug("[DEBUG] Usando mês solicitado (%s) - pode aparecer modal", mes_num)
                 mes_para_usar = mes_num
             
             meses = [
                 "Selecione", "Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"
             ]
             nome_mes = meses[mes_para_usar]
-            logger.info(f"[DEBUG] Tentando selecionar mês: {nome_mes} (num: {mes_para_usar})")
+            logger.debug("[DEBUG] Tentando selecionar mês: %s (num: %s)", nome_mes, mes_para_usar)
             
             # Estratégia 1: Tentar remover overlay e clicar normalmente
             try:
@@ -740,93 +1084,83 @@ class WebISSAutomation:
                 try:
                     overlay = self.driver.find_element(By.ID, "select2-drop-mask")
                     if overlay.is_displayed():
-                        logger.info("[DEBUG] Removendo overlay select2-drop-mask")
+                        logger.debug("[DEBUG] Removendo overlay select2-drop-mask")
                         self.driver.execute_script("arguments[0].remove();", overlay)
                 except:
                     pass
                 
                 # Clicar no select2
                 select2_choice.click()
-                wait = WebDriverWait(self.driver, 10)
                 
                 # Aguardar lista aparecer
-                ul = wait.until(lambda d: d.find_element(By.XPATH, "//ul[contains(@class, 'select2-results') and not(contains(@style, 'display: none'))]"))
-                logger.info(f"[DEBUG] ul select2-results encontrado: {ul.get_attribute('outerHTML')[:300]}...")
+                ul = self.aguardar_lista_select2(timeout=10)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("[DEBUG] ul select2-results encontrado: %s...", ul.get_attribute('outerHTML')[:300])
                 
                 # Aguardar opções carregarem (máximo 10 segundos)
                 max_wait = 10
-                start_time = time.time()
-                while time.time() - start_time < max_wait:
-                    try:
-                        # Tentar encontrar o item do mês
-                        li_mes = ul.find_element(By.XPATH, f".//div[@class='select2-result-label' and normalize-space(text())='{nome_mes}']")
-                        if li_mes.is_displayed():
-                            logger.info(f"[DEBUG] li do mês encontrado: {li_mes.get_attribute('outerHTML')}")
-                            break
-                    except:
-                        # Se não encontrou, aguardar um pouco e tentar novamente
-                        time.sleep(0.5)
-                        logger.info("[DEBUG] Aguardando opções carregarem...")
-                        continue
-                else:
+                li_mes = self.waits.aguardar_elemento_visivel(
+                    f"//ul[contains(@class, 'select2-results')]//div[@class='select2-result-label' and normalize-space(text())='{nome_mes}']",
+                    timeout=max_wait,
+                    nome=f"opção do mês {nome_mes}"
+                )
+                if not li_mes:
                     # Se chegou aqui, não encontrou o item
-                    logger.warning(f"[DEBUG] Não encontrou o li do mês após {max_wait}s")
-                    debug_file = os.path.join(self.get_logs_dir(), 'select2_ul_debug.html')
-                    with open(debug_file, 'w', encoding='utf-8') as f:
-                        f.write(ul.get_attribute('outerHTML'))
-                    logger.info(f"[DEBUG] HTML do ul salvo em {debug_file}")
+                    logger.warning("[DEBUG] Não encontrou o li do mês após %ss", max_wait)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        debug_file = os.path.join(self.get_logs_dir(), 'select2_ul_debug.html')
+                        with open(debug_file, 'w', encoding='utf-8') as f:
+                            f.write(ul.get_attribute('outerHTML'))
+                        logger.debug("[DEBUG] HTML do ul salvo em %s", debug_file)
                     raise Exception("Item do mês não encontrado na lista")
                 
-                # Aguardar item ficar visível
-                wait.until(lambda d: li_mes.is_displayed())
-                
                 # Tentar clicar com JavaScript
                 try:
                     self.driver.execute_script("arguments[0].click();", li_mes)
-                    logger.info(f"[DEBUG] Clique no mês realizado com JavaScript")
+                    logger.debug("[DEBUG] Clique no mês realizado com JavaScript")
                 except Exception as e:
-                    logger.warning(f"[DEBUG] Erro ao clicar com JavaScript: {e}")
+                    logger.warning("[DEBUG] Erro ao clicar com JavaScript: %s", e)
                     # Tentar clicar normal
                     li_mes.click()
-                    logger.info(f"[DEBUG] Clique no mês realizado normalmente")
+                    logger.debug("[DEBUG] Clique no mês realizado normalmente")
                 
                 # Aguardar overlay sumir
-                try:
-                    wait.until(lambda d: not d.find_element(By.ID, "select2-drop-mask").is_displayed())
-                    logger.info(f"[DEBUG] Overlay select2-drop-mask sumiu após clique")
-                except:
-                    logger.warning(f"[DEBUG] Overlay não sumiu, tentando remover")
+                if self.waits.aguardar_select2_fechado(timeout=10):
+                    logger.debug("[DEBUG] Overlay select2-drop-mask sumiu após clique")
+                else:
+                    logger.warning("[DEBUG] Overlay não sumiu, tentando remover")
                     try:
                         overlay = self.driver.find_element(By.ID, "select2-drop-mask")
                         self.driver.execute_script("arguments[0].remove();", overlay)
                     except:
                         pass
                 
-                logger.info(f"✅ Mês de competência selecionado clicando no item: {nome_mes}")
+                logger.info("✅ Mês de competência selecionado clicando no item: %s", nome_mes)
                 return True
                 
             except Exception as e:
-                logger.warning(f"[DEBUG] Estratégia 1 falhou: {e}")
+                logger.warning("[DEBUG] Estratégia 1 falhou: %s", e)
                 
-                # Salvar HTML para debug
-                try:
-                    debug_file = os.path.join(self.get_logs_dir(), 'select2_ul_debug.html')
-                    with open(debug_file, 'w', encoding='utf-8') as f:
-                        f.write(self.driver.page_source)
-                    logger.info(f"[DEBUG] HTML da página salvo em {debug_file}")
-                except:
-                    pass
+                # Salvar HTML para debug (page_source é caro: só no nível DEBUG)
+                if logger.isEnabledFor(logging.DEBUG):
+                    try:
+                        debug_file = os.path.join(self.get_logs_dir(), 'select2_ul_debug.html')
+                        with open(debug_file, 'w', encoding='utf-8') as f:
+                            f.write(self.driver.page_source)
+                        logger.debug("[DEBUG] HTML da página salvo em %s", debug_file)
+                    except:
+                        pass
                 
                 # Estratégia 2: Usar JavaScript para setar valor diretamente
                 try:
-                    logger.info("[DEBUG] Tentando estratégia 2: JavaScript direto")
+                    logger.debug("[DEBUG] Tentando estratégia 2: JavaScript direto")
                     select_element = self.driver.find_element(By.ID, "MesDaCompetencia")
                     self.driver.execute_script(f"arguments[0].value = '{mes_para_usar}';", select_element)
                     self.driver.execute_script("arguments[0].dispatchEvent(new Event('change'));", select_element)
                     self.driver.execute_script("arguments[0].dispatchEvent(new Event('input'));", select_element)
                     
-                    # Forçar fechamento do select2 após setar valor
-                    time.sleep(0.5)
+                    # Forçar fechamento do select2 após a página processar o novo valor
+                    self.waits.aguardar_ajax_ocioso()
                     self.driver.execute_script("""
                         // Forçar fechamento do select2
                         var select2Container = document.getElementById('s2id_MesDaCompetencia');
@@ -852,36 +1186,43 @@ class WebISSAutomation:
                         });
                     """)
                     
-                    logger.info(f"✅ Mês de competência selecionado via JavaScript: {nome_mes}")
+                    logger.info("✅ Mês de competência selecionado via JavaScript: %s", nome_mes)
                     return True
                 except Exception as e2:
-                    logger.warning(f"[DEBUG] Estratégia 2 falhou: {e2}")
+                    logger.warning("[DEBUG] Estratégia 2 falhou: %s", e2)
                     
                     # Estratégia 3: Usar JavaScript direto (sem movimento da tela)
                     try:
-                        logger.info("[DEBUG] Tentando estratégia 3: JavaScript direto")
+                        logger.debug("[DEBUG] Tentando estratégia 3: JavaScript direto")
                         container = self.driver.find_element(By.ID, "s2id_MesDaCompetencia")
                         select2_choice = container.find_element(By.CLASS_NAME, "select2-choice")
                         
                         # Clique direto via JavaScript para evitar movimento da tela
                         self.driver.execute_script("arguments[0].click();", select2_choice)
-                        time.sleep(1)
                         
                         # Tentar digitar o nome do mês
-                        search_input = self.driver.find_element(By.XPATH, "//input[contains(@class, 'select2-input') and @type='text']")
+                        search_input = self.waits.aguardar_elemento_visivel(
+                            "//input[contains(@class, 'select2-input') and @type='text']",
+                            nome="campo de busca do select2"
+                        )
+                        if not search_input:
+                            raise Exception("Campo de busca do select2 não apareceu")
                         search_input.clear()
                         search_input.send_keys(nome_mes)
-                        time.sleep(0.5)
+                        self.waits.aguardar_elemento_visivel(
+                            "//li[contains(@class, 'select2-highlighted')]",
+                            nome="resultado destacado do select2"
+                        )
                         search_input.send_keys(Keys.ENTER)
                         
-                        logger.info(f"✅ Mês de competência selecionado via JavaScript direto: {nome_mes}")
+                        logger.info("✅ Mês de competência selecionado via JavaScript direto: %s", nome_mes)
                         return True
                     except Exception as e3:
-                        logger.warning(f"[DEBUG] Erro ao clicar no select2 {index}: {e3}")
+                        logger.warning("Estratégia 3 falhou ao selecionar o mês %s: %s", nome_mes, e3)
                         
                         # Estratégia 4: Forçar carregamento via JavaScript
                         try:
-                            logger.info("[DEBUG] Tentando estratégia 4: Forçar carregamento")
+                            logger.debug("[DEBUG] Tentando estratégia 4: Forçar carregamento")
                             # Forçar o select2 a abrir e carregar opções
                             self.driver.execute_script("""
                                 var container = document.getElementById('s2id_MesDaCompetencia');
@@ -892,82 +1233,69 @@ class WebISSAutomation:
                                     select.dispatchEvent(new Event('input'));
                                 }
                             """, mes_para_usar)
-                            logger.info(f"✅ Mês de competência selecionado via JavaScript forçado: {nome_mes}")
+                            logger.info("✅ Mês de competência selecionado via JavaScript forçado: %s", nome_mes)
                             return True
                         except Exception as e4:
-                            logger.warning(f"[DEBUG] Estratégia 4 falhou: {e4}")
+                            logger.warning("[DEBUG] Estratégia 4 falhou: %s", e4)
                             raise e  # Re-raise o erro original
         except Exception as e:
-            logger.warning(f"❌ Erro ao selecionar mês de competência clicando no item: {e}")
+            logger.warning("❌ Erro ao selecionar mês de competência clicando no item: %s", e)
             self.take_screenshot("erro_mes_competencia.png")
             return False
 
     def limpar_overlays(self):
-        """Remove overlays que podem estar bloqueando interações."""
+        """Remove overlays que podem estar bloqueando interações (uma única chamada ao navegador)."""
         try:
-            # Remover select2-drop-mask se existir
-            overlays = self.driver.find_elements(By.ID, "select2-drop-mask")
-            for overlay in overlays:
-                if overlay.is_displayed():
-                    logger.info("[DEBUG] Removendo overlay select2-drop-mask")
-                    self.driver.execute_script("arguments[0].remove();", overlay)
-            
-            # Remover outros overlays comuns
-            overlay_selectors = [
-                "//div[contains(@class, 'select2-drop-mask')]",
-                "//div[contains(@class, 'modal-backdrop')]",
-                "//div[contains(@class, 'overlay')]"
-            ]
-            
-            for selector in overlay_selectors:
-                try:
-                    elements = self.driver.find_elements(By.XPATH, selector)
-                    for element in elements:
-                        if element.is_displayed():
-                            logger.info(f"[DEBUG] Removendo overlay: {selector}")
-                            self.driver.execute_script("arguments[0].remove();", element)
-                except:
-                    pass
-            
-            # Fechar dropdowns do select2 que possam estar abertos
-            try:
-                self.driver.execute_script("""
-                    // Fechar todos os dropdowns do select2
-                    var dropdowns = document.querySelectorAll('.select2-drop');
-                    dropdowns.forEach(function(dropdown) {
-                        if (dropdown.style.display !== 'none') {
-                            dropdown.style.display = 'none';
+            removidos = self.driver.execute_script("""
+                var removidos = [];
+                var seletores = [
+                    '#select2-drop-mask',
+                    'div[class*="select2-drop-mask"]',
+                    'div[class*="modal-backdrop"]',
+                    'div[class*="overlay"]'
+                ];
+                seletores.forEach(function(seletor) {
+                    document.querySelectorAll(seletor).forEach(function(el) {
+                        if (el.getClientRects().length && getComputedStyle(el).display !== 'none') {
+                            removidos.push(seletor);
+                            el.remove();
                         }
                     });
-                    
-                    // Remover overlays restantes
-                    var overlays = document.querySelectorAll('.select2-drop-mask');
-                    overlays.forEach(function(overlay) {
-                        overlay.remove();
-                    });
-                    
-                    // Forçar blur em inputs do select2
-                    var inputs = document.querySelectorAll('.select2-input');
-                    inputs.forEach(function(input) {
-                        input.blur();
-                    });
-                """)
-                logger.info("[DEBUG] Dropdowns do select2 fechados via JavaScript")
-            except Exception as e:
-                logger.warning(f"[DEBUG] Erro ao fechar dropdowns: {e}")
-                    
-            logger.info("[DEBUG] Limpeza de overlays concluída")
+                });
+                
+                // Fechar todos os dropdowns do select2
+                document.querySelectorAll('.select2-drop').forEach(function(dropdown) {
+                    if (dropdown.style.display !== 'none') {
+                        dropdown.style.display = 'none';
+                    }
+                });
+                
+                // Remover overlays restantes
+                document.querySelectorAll('.select2-drop-mask').forEach(function(overlay) {
+                    overlay.remove();
+                });
+                
+                // Forçar blur em inputs do select2
+                document.querySelectorAll('.select2-input').forEach(function(input) {
+                    input.blur();
+                });
+                return removidos;
+            """) or []
+            
+            for seletor in removidos:
+                logger.debug("[DEBUG] Removendo overlay: %s", seletor)
+            logger.debug("[DEBUG] Limpeza de overlays concluída")
             return True
         except Exception as e:
-            logger.warning(f"[DEBUG] Erro ao limpar overlays: {e}")
+            logger.warning("[DEBUG] Erro ao limpar overlays: %s", e)
             return False
 
+    @perfilar_etapa('serviços')
     def fill_nfse_servicos_sem_scroll(self, data: Dict[str, Any]) -> bool:
         """Preenche a etapa de Serviços usando apenas JavaScript para evitar scroll"""
         try:
-            import time
             logger.info("=== PREENCHENDO STEP 3 - SERVIÇOS (SEM SCROLL) ===")
-            logger.info(f"Dados recebidos: {data}")
+            logger.debug("Dados recebidos: %s", data)
 
             # 1. PREENCHER ANO via JavaScript
             try:
@@ -984,59 +1312,49 @@ class WebISSAutomation:
                             }
                         }
                     """, ano)
-                    logger.info(f"✅ Ano preenchido via JavaScript: {ano}")
+                    logger.info("✅ Ano preenchido via JavaScript: %s", ano)
             except Exception as e:
-                logger.warning(f"⚠️ Erro ao preencher ano: {e}")
+                logger.warning("⚠️ Erro ao preencher ano: %s", e)
+
+            # Catálogo das opções (lido uma única vez por sessão)
+            self.catalogo.carregar()
 
-            # 2. SELECIONAR MÊS via JavaScript
+            # 2. SELECIONAR MÊS pelo valor
             try:
                 if 'vencimento' in data and '/' in data['vencimento']:
                     mes_num = int(data['vencimento'].split('/')[1])
-                    self.driver.execute_script("""
-                        var select = document.getElementById('MesDaCompetencia');
-                        if (select) {
-                            select.value = arguments[0];
-                            select.dispatchEvent(new Event('change'));
-                            select.dispatchEvent(new Event('input'));
-                        }
-                    """, mes_num)
-                    logger.info(f"✅ Mês selecionado via JavaScript: {mes_num}")
+                    opcao = self.catalogo.buscar_por_codigo('MesDaCompetencia', mes_num)
+                    valor_mes = opcao['valor'] if opcao else str(mes_num)
+                    self.catalogo.selecionar('MesDaCompetencia', valor_mes)
+                    logger.info("✅ Mês selecionado via JavaScript: %s", valor_mes)
             except Exception as e:
-                logger.warning(f"⚠️ Erro ao selecionar mês: {e}")
+                logger.warning("⚠️ Erro ao selecionar mês: %s", e)
 
-            # 3. SELECIONAR TIPO DE ATIVIDADE via JavaScript
+            # 3. SELECIONAR TIPO DE ATIVIDADE pelo item da lista de serviços (coluna 'atividade')
             try:
-                self.driver.execute_script("""
-                    var select = document.getElementById('lista-de-servicos-prestador');
-                    if (select && select.options.length > 1) {
-                        select.value = select.options[1].value;
-                        select.dispatchEvent(new Event('change'));
-                        select.dispatchEvent(new Event('input'));
-                    }
-                """)
-                logger.info("✅ Tipo de atividade selecionado via JavaScript")
+                opcao = self.selecionar_opcao_catalogo('lista-de-servicos-prestador', data.get('atividade'))
+                if opcao:
+                    logger.info("✅ Tipo de atividade selecionado: %s", opcao['texto'])
+                else:
+                    logger.warning("⚠️ Tipo de atividade não selecionado")
             except Exception as e:
-                logger.warning(f"⚠️ Erro ao selecionar tipo de atividade: {e}")
+                logger.warning("⚠️ Erro ao selecionar tipo de atividade: %s", e)
 
-            # 4. SELECIONAR CNAE via JavaScript
+            # 4. SELECIONAR CNAE pelo código (coluna 'cnae')
             try:
-                arrow_down_count = 1
-                if 'turma' in data and data['turma']:
-                    turma = data['turma'].upper()
-                    if any(keyword in turma for keyword in ['G', 'MÉDIO', 'MEDIO']):
-                        arrow_down_count = 2
+                indice_padrao = 1
+                turma = str(data.get('turma') or '').upper()
+                # Mesma regra do extrator: turmas 'G...' são ensino médio (CNAE 8520100)
+                if turma.startswith('G'):
+                    indice_padrao = 2
                 
-                self.driver.execute_script("""
-                    var select = document.getElementById('CnaeAtividade_Id');
-                    if (select && select.options.length > arguments[0]) {
-                        select.value = select.options[arguments[0]].value;
-                        select.dispatchEvent(new Event('change'));
-                        select.dispatchEvent(new Event('input'));
-                    }
-                """, arrow_down_count)
-                logger.info(f"✅ CNAE selecionado via JavaScript (índice {arrow_down_count})")
+                opcao = self.selecionar_opcao_catalogo('CnaeAtividade_Id', data.get('cnae'), indice_padrao)
+                if opcao:
+                    logger.info("✅ CNAE selecionado: %s", opcao['texto'])
+                else:
+                    logger.warning("⚠️ CNAE não selecionado")
             except Exception as e:
-                logger.warning(f"⚠️ Erro ao selecionar CNAE: {e}")
+                logger.warning("⚠️ Erro ao selecionar CNAE: %s", e)
 
             # 5. PREENCHER VALOR DO SERVIÇO via JavaScript
             try:
@@ -1053,12 +1371,12 @@ class WebISSAutomation:
                             }
                         }
                     """, valor)
-                    logger.info(f"✅ Valor do serviço preenchido via JavaScript: {valor}")
-                    time.sleep(1)
+                    logger.info("✅ Valor do serviço preenchido via JavaScript: %s", valor)
+                    self.waits.aguardar_ajax_ocioso()
                 else:
                     logger.warning("⚠️ Valor do serviço não informado nos dados")
             except Exception as e:
-                logger.warning(f"⚠️ Erro ao preencher valor do serviço: {e}")
+                logger.warning("⚠️ Erro ao preencher valor do serviço: %s", e)
 
             # 6. PREENCHER DESCRIÇÃO via JavaScript
             try:
@@ -1075,151 +1393,146 @@ class WebISSAutomation:
                 """)
                 logger.info("✅ Descrição preenchida via JavaScript")
             except Exception as e:
-                logger.warning(f"⚠️ Erro ao preencher descrição: {e}")
+                logger.warning("⚠️ Erro ao preencher descrição: %s", e)
 
-            # Screenshot final
-            self.take_screenshot("step3_sem_scroll.png")
-            logger.info("Screenshot final da Step 3 (sem scroll) salvo: step3_sem_scroll.png")
+            # Screenshot final (conforme a política de screenshots)
+            self.take_screenshot("step3_sem_scroll.png", erro=False)
             logger.info("✅ [SERVIÇOS] Etapa de serviços preenchida com sucesso (sem scroll)!")
             return True
 
         except Exception as e:
-            logger.error(f"❌ Erro geral ao preencher serviços (sem scroll): {e}")
+            logger.error("❌ Erro geral ao preencher serviços (sem scroll): %s", e)
             self.take_screenshot("erro_step3_sem_scroll.png")
             return False
 
 
 
+    @perfilar_etapa('valores')
     def fill_nfse_valores(self, data: Dict[str, Any]) -> bool:
-        """Preenche a etapa de Valores sem mover a tela."""
+        """
+        Preenche a etapa de Valores sem mover a tela.
+        
+        O formato decimal aceito pelo campo é descoberto na primeira nota e
+        reutilizado nas seguintes; os demais formatos só são testados se o
+        valor lido de volta não conferir.
+        """
         try:
-            from selenium.webdriver.common.by import By
-            from selenium.webdriver.support.ui import WebDriverWait
-            from selenium.webdriver.support import expected_conditions as EC
-            import time
-
-            # 0. Ativar a aba 'Valores' se não estiver ativa
-            try:
-                aba_valores = self.driver.find_element(By.XPATH, "//a[@href='#tab4-4']")
-                self.driver.execute_script("arguments[0].click();", aba_valores)
-                time.sleep(0.5)
-                logger.info("Aba 'Valores' ativada via JS.")
-            except Exception as e:
-                logger.warning(f"Não foi possível ativar a aba 'Valores': {e}")
-
-            # 1. Esperar o campo de valor do serviço estar presente no DOM
-            try:
-                wait = WebDriverWait(self.driver, 10)
-                valor_input = wait.until(
-                    EC.presence_of_element_located((By.ID, "valores-servico"))
-                )
-                logger.info("Campo de valor do serviço presente no DOM.")
-            except Exception as e:
-                logger.warning(f"Campo de valor do serviço não apareceu: {e}")
-                return False
-
-            # 2. Verificar se o campo está habilitado
-            if not valor_input.is_enabled() or valor_input.get_attribute('disabled'):
-                logger.warning("Campo de valor do serviço está desabilitado. Tentando habilitar via JavaScript...")
-                try:
-                    self.driver.execute_script("arguments[0].removeAttribute('disabled');", valor_input)
-                    time.sleep(0.2)
-                except Exception as e:
-                    logger.error(f"Não foi possível habilitar o campo via JS: {e}")
-                    return False
-                if not valor_input.is_enabled() or valor_input.get_attribute('disabled'):
-                    logger.error("Mesmo após tentar habilitar, o campo continua desabilitado.")
-                    return False
-
-            # 3. Preencher o valor do serviço (testar vírgula e ponto)
             valor = str(data.get('valor', ''))
             if not valor:
                 logger.warning("Valor do serviço não informado nos dados")
                 return False
-            formatos = [valor, valor.replace('.', ','), valor.replace(',', '.')]
-            sucesso = False
-            for v in formatos:
-                try:
-                    # Preencher via JavaScript para evitar movimento da tela
-                    self.driver.execute_script("arguments[0].value = arguments[1];", valor_input, v)
-                    self.driver.execute_script("arguments[0].dispatchEvent(new Event('input'));", valor_input)
-                    self.driver.execute_script("arguments[0].dispatchEvent(new Event('change'));", valor_input)
-                    logger.info(f"Tentando preencher valor do serviço via JS: {v}")
-                    time.sleep(0.5)
-                    # Verifica se o valor foi realmente inserido
-                    valor_atual = valor_input.get_attribute('value')
-                    logger.info(f"Valor no campo após envio: {valor_atual}")
-                    if valor_atual and valor_atual != '0,00' and valor_atual != '0.00':
-                        sucesso = True
-                        break
-                except Exception as e:
-                    logger.warning(f"Erro ao tentar preencher valor '{v}' via JS: {e}")
-                    # Fallback: tentar preenchimento normal
-                    try:
-                        valor_input.click()
-                        valor_input.clear()
-                        valor_input.send_keys(v)
-                        logger.info(f"Tentando preencher valor do serviço normal: {v}")
-                        time.sleep(0.5)
-                        valor_atual = valor_input.get_attribute('value')
-                        if valor_atual and valor_atual != '0,00' and valor_atual != '0.00':
-                            sucesso = True
-                            break
-                    except Exception as e2:
-                        logger.warning(f"Erro ao tentar preencher valor '{v}' normal: {e2}")
-            if not sucesso:
-                logger.error("Nenhum formato de valor foi aceito pelo campo.")
-                return False
-
-            # 4. Valor do serviço preenchido com sucesso
-            logger.info("✅ Valor do serviço preenchido com sucesso no Step 4.")
-            return True
+            
+            # Formato aprendido primeiro, depois os demais
+            nomes = list(self.FORMATOS_VALOR)
+            if self.formato_valor in nomes:
+                nomes.remove(self.formato_valor)
+                nomes.insert(0, self.formato_valor)
+            
+            aguardou_campo = False
+            for nome in nomes:
+                v = self.FORMATOS_VALOR[nome](valor)
+                resultado = self.driver.execute_script(VALOR_SERVICO_JS, v)
+                
+                if not resultado['presente'] and not aguardou_campo:
+                    # Aba ainda não carregada: aguardar o campo uma única vez
+                    aguardou_campo = True
+                    if not self.waits.aguardar_elemento_visivel(CAMPO_VALOR_SERVICO_XPATH, nome="aba Valores visível"):
+                        logger.warning("Campo de valor do serviço não apareceu")
+                        return False
+                    resultado = self.driver.execute_script(VALOR_SERVICO_JS, v)
+                
+                if not resultado['presente']:
+                    logger.warning("Campo de valor do serviço não encontrado")
+                    return False
+                if resultado['aba_ativada']:
+                    logger.info("Aba 'Valores' ativada via JS.")
+                
+                # Ler de volta depois que a máscara/AJAX do campo assentar
+                valor_atual = (self.waits.aguardar_valor(CAMPO_VALOR_SERVICO_XPATH, diferente_de=v, timeout=3)
+                               or self.waits.ler_valor(CAMPO_VALOR_SERVICO_XPATH))
+                logger.info("Valor no campo após envio (%s): %s", nome, valor_atual)
+                if self.valor_confere(valor_atual, valor):
+                    if self.formato_valor != nome:
+                        logger.info("📌 Formato de valor aceito pelo campo: %s", nome)
+                        self.formato_valor = nome
+                    logger.info("✅ Valor do serviço preenchido com sucesso no Step 4.")
+                    return True
+                
+                if nome == self.formato_valor:
+                    logger.warning("⚠️ Formato aprendido '%s' não conferiu (%s) - testando os demais", nome, valor_atual)
+            
+            logger.error("Nenhum formato de valor foi aceito pelo campo.")
+            return False
         except Exception as e:
-            logger.error(f"Erro ao preencher etapa Valores: {e}")
+            logger.error("Erro ao preencher etapa Valores: %s", e)
+            return False
+
+    @staticmethod
+    def valor_confere(valor_atual: str, valor_esperado: str) -> bool:
+        """Verifica se o valor exibido no campo corresponde ao valor esperado (False se algum não puder ser lido)"""
+        if not valor_atual or valor_atual in ('0,00', '0.00'):
+            return False
+        atual = valor_float(valor_atual)
+        esperado = valor_float(valor_esperado)
+        if atual is None or esperado is None:
             return False
+        return abs(atual - esperado) < 0.005
 
+    @perfilar_etapa('rascunho')
     def salvar_rascunho(self) -> bool:
         """Clica no botão Salvar rascunho"""
         try:
-            import time
             salvar_btn_xpaths = [
                 "//a[contains(@class, 'salvar-rascunho')]",
                 "//button[contains(., 'Salvar rascunho')]",
                 "//input[@value='Salvar rascunho']"
             ]
-            salvar_btn = None
-            for xpath in salvar_btn_xpaths:
-                try:
-                    salvar_btn = self.wait.until(
-                        EC.element_to_be_clickable((By.XPATH, xpath))
-                    )
-                    logger.info(f"Botão Salvar rascunho encontrado: {xpath}")
-                    break
-                except TimeoutException:
-                    continue
+            salvar_btn, _ = self.resolver_elemento('botao_salvar_rascunho', salvar_btn_xpaths)
             if not salvar_btn:
                 logger.error("Botão Salvar rascunho não encontrado em nenhum seletor")
                 self.take_screenshot("salvar_rascunho_not_found.png")
                 return False
             salvar_btn.click()
-            time.sleep(1)
             logger.info("Botão Salvar rascunho clicado")
+            self.waits.aguardar_ajax_ocioso(quieto_ms=300)
             return True
         except Exception as e:
-            logger.error(f"Erro ao clicar em Salvar rascunho: {e}")
+            logger.error("Erro ao clicar em Salvar rascunho: %s", e)
             self.take_screenshot("salvar_rascunho_error.png")
             return False
     
-    def emitir_nota_fiscal(self) -> bool:
-        """Clica no botão Emitir nota fiscal"""
-        try:
-            import time
-            # Aguardar um pouco para a página carregar após salvar rascunho
-            time.sleep(1)
-            
-            # Múltiplos seletores para o botão Emitir (ordenados por precisão)
-            emitir_btn_xpaths = [
-                "//button[@id='botao-emitir-nota-fiscal']",
+    @perfilar_etapa('emitir')
+    def emitir_nota_fiscal(self) -> Optional[Dict[str, Any]]:
+        """
+        Clica no botão Emitir nota fiscal e aguarda o resultado
+        
+        Returns:
+            Dict com 'numero', 'codigo_verificacao', 'mensagem', 'url' e
+            'confirmado'; com 'indeterminado' True se a página não exibiu
+            mensagem nem mudou de URL (a nota pode ou não ter sido emitida e
+            deve ser conferida manualmente); ou None se a emissão falhou
+        """
+        contexto = self.disparar_emissao()
+        if contexto is None:
+            return None
+        return self.confirmar_emissao(contexto)
+    
+    @perfilar_etapa('emitir')
+    def disparar_emissao(self) -> Optional[Dict[str, Any]]:
+        """
+        Clica no botão Emitir nota fiscal sem aguardar o resultado
+        
+        Returns:
+            Contexto para confirmar_emissao (URL e alertas antes do clique),
+            ou None se o botão não foi encontrado
+        """
+        try:
+            # Aguardar a página terminar de processar o rascunho salvo
+            self.waits.aguardar_ajax_ocioso()
+            
+            # Múltiplos seletores para o botão Emitir (ordenados por precisão)
+            emitir_btn_xpaths = [
+                "//button[@id='botao-emitir-nota-fiscal']",
                 "//button[@data-loading-message='Emitindo Nota Fiscal']",
                 "//button[contains(@class, 'btn-primary') and contains(@class, 'glyphicons') and contains(@class, 'circle_ok')]",
                 "//button[contains(@class, 'btn-primary') and contains(text(), 'Emitir')]",
@@ -1229,30 +1542,16 @@ class WebISSAutomation:
                 "//form//button[@type='submit' and contains(@class, 'btn-primary')]"
             ]
             
-            emitir_btn = None
-            
-            # Primeiro tentar com seletor CSS mais específico
-            try:
-                emitir_btn = self.wait.until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, "button#botao-emitir-nota-fiscal"))
-                )
-                logger.info("Botão Emitir encontrado via CSS selector")
-            except TimeoutException:
-                # Se não encontrar, tentar com XPath
-                for xpath in emitir_btn_xpaths:
-                    try:
-                        emitir_btn = self.wait.until(
-                            EC.element_to_be_clickable((By.XPATH, xpath))
-                        )
-                        logger.info(f"Botão Emitir encontrado: {xpath}")
-                        break
-                    except TimeoutException:
-                        continue
+            # Seletor CSS mais específico primeiro, depois os XPaths
+            emitir_btn, _ = self.resolver_elemento(
+                'botao_emitir',
+                [(By.CSS_SELECTOR, "button#botao-emitir-nota-fiscal")] + emitir_btn_xpaths
+            )
             
             if not emitir_btn:
                 logger.error("Botão Emitir não encontrado em nenhum seletor")
                 self.take_screenshot("emitir_not_found.png")
-                return False
+                return None
             
             # Verificar se o botão está visível e habilitado
             if not emitir_btn.is_displayed():
@@ -1263,69 +1562,300 @@ class WebISSAutomation:
             # Verificar se o botão não está com loading
             if "page-loading" in emitir_btn.get_attribute("class"):
                 logger.info("Aguardando botão sair do estado de loading...")
-                time.sleep(2)
+                self.waits.aguardar(
+                    "botão Emitir sem loading",
+                    lambda d: "page-loading" not in (emitir_btn.get_attribute("class") or "")
+                )
             
             # Clicar no botão via JavaScript para evitar problemas de scroll
+            contexto = {
+                'url_antes': self.driver.current_url,
+                'alertas_antes': self.driver.execute_script(
+                    ALERTAS_VISIVEIS_JS, f"{SELETOR_ALERTA_ERRO}, {SELETOR_ALERTA_SUCESSO}"
+                ) or []
+            }
             self.driver.execute_script("arguments[0].click();", emitir_btn)
             logger.info("Botão Emitir clicado via JavaScript")
-            
-            # Aguardar processamento da emissão
-            time.sleep(3)
-            
-            # Verificar se a emissão foi bem-sucedida
-            # Procurar por mensagens de sucesso ou redirecionamento
-            success_indicators = [
-                "nota fiscal emitida",
-                "emissão concluída",
-                "nota fiscal gerada",
-                "sucesso",
-                "emitida com sucesso"
-            ]
-            
-            page_text = self.driver.page_source.lower()
-            if any(indicator in page_text for indicator in success_indicators):
-                logger.info("✅ Nota fiscal emitida com sucesso!")
-                return True
-            else:
-                # Verificar se houve erro
-                error_indicators = [
-                    "erro",
-                    "falha",
-                    "não foi possível",
-                    "tente novamente"
-                ]
-                
-                if any(indicator in page_text for indicator in error_indicators):
-                    logger.error("❌ Erro na emissão da nota fiscal")
-                    self.take_screenshot("erro_emissao.png")
-                    return False
-                else:
-                    # Se não encontrou indicadores claros, assumir sucesso
-                    logger.info("✅ Emissão da nota fiscal concluída")
-                    
-                    # Aguardar um pouco para a página carregar completamente
-                    time.sleep(2)
+            return contexto
                     
-                    return True
+        except Exception as e:
+            logger.error("Erro ao emitir nota fiscal: %s", e)
+            self.take_screenshot("emitir_error.png")
+            return None
+    
+    @perfilar_etapa('emitir')
+    def confirmar_emissao(self, contexto: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Aguarda o resultado de uma emissão disparada por disparar_emissao
+        
+        Uma mudança de URL só confirma a emissão se a página nova trouxer o
+        número da nota ou o código de verificação.
+        
+        Returns:
+            Dados da nota (ver emitir_nota_fiscal), emissao_indeterminada quando
+            não há confirmação, ou None se a página exibiu erro
+        """
+        try:
+            url_antes = contexto['url_antes']
+            alertas_antes = contexto['alertas_antes']
+            
+            # Aguardar o elemento de sucesso/erro ou a mudança de URL
+            def resultado_emissao(d):
+                resultado = d.execute_script(
+                    RESULTADO_EMISSAO_JS, url_antes, alertas_antes, SELETOR_ALERTA_ERRO, SELETOR_ALERTA_SUCESSO
+                )
+                if resultado and resultado['status'] == 'url':
+                    # Página nova: dar tempo para a mensagem/dados da nota aparecerem
+                    return resultado if resultado['quieto_ms'] >= 500 else None
+                return resultado
+
+            resultado = self.waits.aguardar("resultado da emissão", resultado_emissao)
+            
+            if resultado and resultado['status'] == 'erro':
+                logger.error("❌ Erro na emissão da nota fiscal: %s", resultado['texto'])
+                self.take_screenshot("erro_emissao.png")
+                return None
+            
+            if not resultado:
+                # Sem mensagem nem redirecionamento: não dá para saber se a nota saiu
+                logger.warning("⚠️ Emissão sem confirmação na página - verificar manualmente antes de reemitir")
+                self.take_screenshot("emissao_sem_confirmacao.png")
+                return self.emissao_indeterminada("emissão sem confirmação na página")
+            
+            nota = extrair_dados_nota(resultado['texto'])
+            if resultado['status'] == 'url' and not (nota['numero'] or nota['codigo_verificacao']):
+                # Redirecionamento sem mensagem de sucesso nem dados da nota (página de erro, login...)
+                logger.warning("⚠️ Página mudou após Emitir sem confirmação da nota (%s) - verificar manualmente",
+                               self.driver.current_url)
+                self.take_screenshot("emissao_sem_confirmacao.png")
+                return self.emissao_indeterminada("página mudou após Emitir sem número nem código de verificação")
+            
+            nota['url'] = self.driver.current_url
+            nota['confirmado'] = True
+            logger.info("✅ Nota fiscal emitida com sucesso! Número: %s, código de verificação: %s",
+                        nota['numero'] or 'não identificado', nota['codigo_verificacao'] or 'não identificado')
+            return nota
                     
         except Exception as e:
-            logger.error(f"Erro ao emitir nota fiscal: {e}")
+            # O clique em Emitir já foi dado: o resultado é desconhecido, não uma falha
+            logger.error("Erro ao confirmar a emissão: %s", e)
             self.take_screenshot("emitir_error.png")
-            return False
+            return self.emissao_indeterminada(f"erro ao confirmar a emissão: {e}")
+    
+    def emissao_indeterminada(self, motivo: str) -> Dict[str, Any]:
+        """Resultado de uma emissão disparada sem confirmação (a nota pode ou não ter sido emitida)"""
+        try:
+            url = self.driver.current_url
+        except Exception:
+            url = None
+        return {
+            'numero': None,
+            'codigo_verificacao': None,
+            'mensagem': motivo,
+            'url': url,
+            'confirmado': False,
+            'indeterminado': True
+        }
     
+    @perfilar_etapa('rascunhos')
+    def listar_rascunhos(self) -> List[Dict[str, Any]]:
+        """
+        Abre a lista de rascunhos do WebISS e lê as linhas de todas as páginas
+        
+        A grade é ampliada para o maior tamanho de página disponível; se ainda
+        houver paginação, as páginas seguintes são lidas uma a uma (uma
+        chamada por página).
+        
+        Returns:
+            Lista de rascunhos interpretados (documento, valor, texto, href, indice, pagina)
+        """
+        try:
+            if self.settings.rascunhos_url:
+                self.driver.get(self.settings.rascunhos_url)
+            else:
+                for texto_menu in ('ISSQN', 'NFS-e', 'Rascunho'):
+                    menu = self.aguardar_menu(texto_menu)
+                    menu.click()
+            self.waits.aguardar_documento_pronto()
+            self.waits.aguardar_ajax_ocioso(quieto_ms=300)
+            self.url_rascunhos = self.driver.current_url
+            self.ampliar_pagina_rascunhos()
+            
+            linhas = []
+            vistas = set()
+            for pagina in range(LIMITE_PAGINAS_RASCUNHOS):
+                novas = [linha for linha in self.driver.execute_script(LISTA_RASCUNHOS_JS) or []
+                         if (linha['texto'], linha['href']) not in vistas]
+                if not novas:
+                    break
+                for linha in novas:
+                    vistas.add((linha['texto'], linha['href']))
+                    linhas.append(dict(linha, indice=len(linhas), pagina=pagina))
+                if not self.driver.execute_script(PROXIMA_PAGINA_RASCUNHOS_JS):
+                    break
+                self.waits.aguardar_ajax_ocioso(quieto_ms=300)
+            
+            rascunhos = [interpretar_rascunho(linha) for linha in linhas]
+            logger.info("📋 %s rascunhos encontrados na lista", len(rascunhos))
+            return rascunhos
+        except Exception as e:
+            logger.error("❌ Erro ao listar rascunhos: %s", e)
+            self.take_screenshot("erro_lista_rascunhos.png")
+            return []
+
+    def ampliar_pagina_rascunhos(self) -> bool:
+        """Mostra o máximo de rascunhos por página na grade (True se o tamanho mudou)"""
+        try:
+            if not self.driver.execute_script(AMPLIAR_PAGINA_RASCUNHOS_JS):
+                return False
+            self.waits.aguardar_ajax_ocioso(quieto_ms=300)
+            return True
+        except Exception as e:
+            logger.warning("⚠️ Não foi possível ampliar a página de rascunhos: %s", e)
+            return False
+
+    def clicar_rascunho_na_lista(self, texto: str) -> bool:
+        """
+        Volta à lista de rascunhos e clica na ação de abrir/editar da linha com o texto informado
+        
+        Todas as páginas da grade são percorridas: emissões anteriores podem ter
+        deslocado a linha para outra página.
+        
+        Returns:
+            bool: True se a linha foi encontrada e clicada
+        """
+        self.driver.get(self.url_rascunhos)
+        self.waits.aguardar_documento_pronto()
+        self.waits.aguardar_ajax_ocioso(quieto_ms=300)
+        self.ampliar_pagina_rascunhos()
+        for _ in range(LIMITE_PAGINAS_RASCUNHOS):
+            if self.driver.execute_script(ABRIR_RASCUNHO_JS, texto):
+                return True
+            if not self.driver.execute_script(PROXIMA_PAGINA_RASCUNHOS_JS):
+                return False
+            self.waits.aguardar_ajax_ocioso(quieto_ms=300)
+        return False
+
+    @perfilar_etapa('emitir')
+    def emitir_rascunho(self, rascunho: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Abre um rascunho da lista e emite a nota com o mínimo de cliques
+        
+        Args:
+            rascunho: Item retornado por listar_rascunhos
+            
+        Returns:
+            Mesmo retorno de emitir_nota_fiscal (None em caso de falha)
+        """
+        try:
+            if rascunho.get('href'):
+                self.driver.get(rascunho['href'])
+            elif not self.clicar_rascunho_na_lista(rascunho['texto']):
+                logger.error("❌ Rascunho não encontrado na lista: %s", rascunho['texto'])
+                return None
+            self.waits.aguardar_documento_pronto()
+            self.waits.aguardar_ajax_ocioso()
+            
+            # Só emitir se a página aberta é de fato o wizard do rascunho
+            if not self.waits.aguardar(
+                "wizard do rascunho",
+                lambda d: detectar_estado_pagina(d)['estado'] in ESTADOS_WIZARD,
+                timeout=10
+            ):
+                logger.error("❌ O wizard do rascunho não abriu (página em '%s')", self.estado_pagina()['estado'])
+                self.take_screenshot("rascunho_sem_wizard.png")
+                return None
+            
+            # O botão Emitir fica na aba Valores do wizard
+            self.driver.execute_script("""
+                var aba = document.querySelector("a[href='#tab4-4']");
+                var botao = document.getElementById('botao-emitir-nota-fiscal');
+                if (aba && !(botao && botao.getClientRects().length)) { aba.click(); }
+            """)
+            return self.emitir_nota_fiscal()
+        except Exception as e:
+            logger.error("❌ Erro ao emitir rascunho: %s", e)
+            self.take_screenshot("erro_emitir_rascunho.png")
+            return None
+
+    def aguardar_menu(self, texto_menu: str):
+        """
+        Aguarda um item do menu lateral ficar clicável (pelo WaitEngine, que cede o foco entre abas)
+
+        Raises:
+            TimeoutException: Se o item não apareceu dentro do limite
+        """
+        menu = self.waits.aguardar_clicavel(f"//span[contains(text(), '{texto_menu}')]", nome=f"menu {texto_menu}")
+        if not menu:
+            raise TimeoutException(f"Menu {texto_menu} não encontrado")
+        return menu
+
+    def aguardar_lista_select2(self, timeout: Optional[float] = None):
+        """
+        Aguarda a lista de opções do select2 aberto
+
+        Raises:
+            TimeoutException: Se a lista não apareceu dentro do limite
+        """
+        ul = self.waits.aguardar(
+            "lista do select2",
+            lambda d: d.find_element(By.XPATH, LISTA_SELECT2_XPATH),
+            timeout
+        )
+        if not ul:
+            raise TimeoutException("Lista de opções do select2 não apareceu")
+        return ul
+
+    def registrar_url_wizard(self):
+        """Guarda a URL do wizard de criação para as próximas notas da sessão"""
+        url = self.driver.current_url
+        if url and url != self.url_wizard:
+            self.url_wizard = url
+            logger.info("📌 URL do wizard de emissão registrada: %s", url)
+
+    def abrir_wizard_direto(self) -> bool:
+        """
+        Abre o wizard de criação diretamente pela URL registrada
+        
+        Faz uma verificação rápida (botão Próximo presente) e, se a página não
+        for o wizard, descarta a URL para que a navegação pelo menu seja usada.
+        
+        Returns:
+            bool: True se o wizard foi aberto e avançou para o Tomador
+        """
+        if not self.url_wizard:
+            return False
+        try:
+            self.driver.get(self.url_wizard)
+            proximo_btn, _ = self.resolver_elemento('botao_proximo_inicio', self.PROXIMO_INICIO_XPATHS, timeout=5)
+            if not proximo_btn:
+                logger.warning("⚠️ URL direta não abriu o wizard - voltando à navegação pelo menu")
+                self.url_wizard = None
+                return False
+            etapa_anterior = self.waits.etapa_atual()
+            proximo_btn.click()
+            self.aguardar_transicao_etapa(etapa_anterior)
+            logger.info("✅ Wizard aberto pela URL direta - avançando para Tomador")
+            return True
+        except Exception as e:
+            logger.warning("⚠️ Falha ao abrir wizard pela URL direta: %s", e)
+            self.url_wizard = None
+            return False
+
+    @perfilar_etapa('próxima nota')
     def navigate_to_new_nfse(self) -> bool:
         """
         Navega para formulário de nova NFSe (WebISS Palmas)
         """
         try:
-            import time
+            # 0. Ir direto ao wizard se a URL já é conhecida
+            if self.abrir_wizard_direto():
+                return True
+            
             # 1. Clicar em ISSQN
             try:
-                issqn_menu = self.wait.until(
-                    EC.element_to_be_clickable((By.XPATH, "//span[contains(text(), 'ISSQN')]"))
-                )
+                issqn_menu = self.aguardar_menu('ISSQN')
                 issqn_menu.click()
-                time.sleep(1)
                 logger.info("Menu ISSQN clicado")
             except TimeoutException:
                 logger.error("Menu ISSQN não encontrado")
@@ -1334,11 +1864,8 @@ class WebISSAutomation:
             
             # 2. Clicar em NFS-e
             try:
-                nfse_menu = self.wait.until(
-                    EC.element_to_be_clickable((By.XPATH, "//span[contains(text(), 'NFS-e')]"))
-                )
+                nfse_menu = self.aguardar_menu('NFS-e')
                 nfse_menu.click()
-                time.sleep(1)
                 logger.info("Menu NFS-e clicado")
             except TimeoutException:
                 logger.error("Menu NFS-e não encontrado")
@@ -1347,11 +1874,12 @@ class WebISSAutomation:
             
             # 3. Clicar em Criar
             try:
-                criar_menu = self.wait.until(
-                    EC.element_to_be_clickable((By.XPATH, "//span[contains(text(), 'Criar')]"))
-                )
+                criar_menu = self.aguardar_menu('Criar')
+                url_menu = self.driver.current_url
                 criar_menu.click()
-                time.sleep(1)
+                if self.waits.aguardar_mudanca_url(url_menu, timeout=5):
+                    self.waits.aguardar_documento_pronto()
+                    self.registrar_url_wizard()
                 logger.info("Menu Criar clicado - pronto para preencher a nota")
             except TimeoutException:
                 logger.error("Menu Criar não encontrado")
@@ -1360,26 +1888,12 @@ class WebISSAutomation:
             
             # 4. Clicar no botão Próximo para avançar para o passo Tomador
             try:
-                proximo_btn_xpaths = [
-                    "//a[@id='btnProximo']",  # seletor direto por id
-                    "//button[contains(., 'Próximo')]",
-                    "//a[contains(., 'Próximo')]",
-                    "//*[contains(@class, 'btn') and contains(., 'Próximo')]"
-                ]
-                proximo_btn = None
-                for xpath in proximo_btn_xpaths:
-                    try:
-                        proximo_btn = self.wait.until(
-                            EC.element_to_be_clickable((By.XPATH, xpath))
-                        )
-                        logger.info(f"Botão Próximo encontrado: {xpath}")
-                        break
-                    except TimeoutException:
-                        continue
+                proximo_btn, _ = self.resolver_elemento('botao_proximo_inicio', self.PROXIMO_INICIO_XPATHS)
                 if not proximo_btn:
                     raise TimeoutException("Botão Próximo não encontrado em nenhum seletor")
+                etapa_anterior = self.waits.etapa_atual()
                 proximo_btn.click()
-                time.sleep(1)
+                self.aguardar_transicao_etapa(etapa_anterior)
                 logger.info("Botão Próximo clicado - avançando para Tomador")
                 return True
             except TimeoutException:
@@ -1387,65 +1901,307 @@ class WebISSAutomation:
                 self.take_screenshot("proximo_btn_not_found.png")
                 return False
         except Exception as e:
-            logger.error(f"Erro ao navegar para nova NFSe: {e}")
+            logger.error("Erro ao navegar para nova NFSe: %s", e)
             self.take_screenshot("navigate_to_new_nfse_error.png")
             return False
     
+    def estado_pagina(self) -> Dict[str, Any]:
+        """Detecta o ponto do fluxo em que a página está (login, menu, passo do wizard, pós-emissão, modal)"""
+        try:
+            return detectar_estado_pagina(self.driver)
+        except Exception as e:
+            logger.warning("⚠️ Não foi possível detectar o estado da página: %s", e)
+            return {'estado': ESTADO_DESCONHECIDO, 'etapa': None, 'url': None, 'detalhe': None, 'pronto': False}
+
+    def fechar_modal(self, confirmar: bool = False) -> bool:
+        """Fecha o modal aberto (confirmando ou dispensando) e aguarda a página assentar"""
+        try:
+            acao = fechar_modal(self.driver, confirmar)
+            if not acao:
+                return False
+            logger.info("🪟 Modal %s (%s)", 'confirmado' if confirmar else 'fechado', acao)
+            self.waits.aguardar_ajax_ocioso(timeout=5)
+            return True
+        except Exception as e:
+            logger.warning("⚠️ Erro ao fechar modal: %s", e)
+            return False
+
+    def executar_etapa(self, descricao: str, acao: Callable[[], bool], estado: str,
+                       destino: Optional[str] = None, tentativas: int = 2) -> bool:
+        """
+        Executa uma etapa do wizard, repetindo-a enquanto a página continuar no mesmo passo
+
+        Args:
+            descricao: Nome da etapa (para o log)
+            acao: Função sem argumentos que executa a etapa e retorna bool
+            estado: Passo em que a etapa é executada (ESTADO_PASSO_*)
+            destino: Passo esperado depois da etapa (transições); None para preenchimentos
+            tentativas: Número máximo de execuções
+
+        Returns:
+            bool: True se a etapa foi concluída
+        """
+        for tentativa in range(1, tentativas + 1):
+            if acao():
+                return True
+            atual = self.estado_pagina()['estado']
+            if atual == ESTADO_MODAL:
+                # Confirmação do próprio wizard (ex.: competência): confirmar e reavaliar
+                self.fechar_modal(confirmar=True)
+                atual = self.estado_pagina()['estado']
+            if destino and atual == destino:
+                logger.info("✅ %s: página já está em '%s'", descricao, destino)
+                return True
+            if atual not in (estado, ESTADO_DESCONHECIDO) or tentativa == tentativas:
+                logger.error("❌ %s falhou (página em '%s')", descricao, atual)
+                return False
+            logger.warning("🔁 %s falhou em '%s' - repetindo (%s/%s)", descricao, atual, tentativa + 1, tentativas)
+            self.limpar_overlays()
+        return False
+
+    def sessao_ativa(self) -> bool:
+        """Verificação leve (uma chamada ao navegador) de que a sessão não caiu na página de login"""
+        if not self.driver or not self.is_logged_in:
+            return False
+        return self.estado_pagina()['estado'] != ESTADO_LOGIN
+
+    def reconectar(self) -> bool:
+        """Refaz o login no mesmo navegador (sessão expirada no meio do lote)"""
+        self.relogins += 1
+        self.is_logged_in = False
+        logger.warning("🔐 Sessão expirada - refazendo login...")
+        if self.login():
+            logger.info("✅ Sessão restabelecida")
+            return True
+        logger.error("❌ Não foi possível refazer o login")
+        return False
+
+    def garantir_sessao(self) -> bool:
+        """
+        Confere navegador e sessão antes de uma nota
+
+        Recicla o Chrome se ele travou ou atingiu o limite de notas/memória, e
+        refaz o login (com um wizard limpo) se a sessão expirou.
+
+        Returns:
+            bool: True se a sessão está ativa (ou foi restabelecida)
+        """
+        if not self.verificar_reciclagem():
+            return False
+        if self.sessao_ativa():
+            return True
+        return self.reconectar() and self.ressincronizar_wizard()
+
+    def _comando_travado(self, comando: str, duracao: float):
+        """Ação do watchdog: encerra o navegador para destravar a thread da automação"""
+        logger.error("🐕 Comando WebDriver '%s' sem resposta há %.0fs - encerrando o navegador", comando, duracao)
+        self.travado = True
+        self.is_logged_in = False
+        encerrar_processos_navegador(self.driver)
+
+    def contabilizar_nota(self) -> Optional[float]:
+        """Conta uma nota para a reciclagem e retorna a memória atual do navegador em MB (None sem psutil)"""
+        self.notas_desde_reciclagem += 1
+        if self.travado or not self.driver:
+            return None
+        return memoria_navegador_mb(self.driver)
+
+    def motivo_reciclagem(self) -> Optional[str]:
+        """Motivo para reciclar o navegador agora (travado, limite de notas ou de memória), ou None"""
+        # Com várias abas o driver é compartilhado: não reciclar por baixo das outras abas
+        if self.waits is not None and self.waits.agendador is not None:
+            return None
+        if self.travado:
+            return "navegador travado"
+        if self.anexado:
+            # Chrome de longa duração: só é reanexado se travar
+            return None
+        if self.settings.reciclar_navegador_notas and self.notas_desde_reciclagem >= self.settings.reciclar_navegador_notas:
+            return f"{self.notas_desde_reciclagem} notas desde a última reciclagem"
+        if self.settings.reciclar_navegador_mb:
+            memoria = memoria_navegador_mb(self.driver) if self.driver else None
+            if memoria and memoria > self.settings.reciclar_navegador_mb:
+                return f"memória em {memoria:.0f} MB"
+        return None
+
+    def verificar_reciclagem(self) -> bool:
+        """
+        Recicla o navegador se ele travou ou passou do limite de notas ou de memória
+
+        Returns:
+            bool: False apenas se a reciclagem foi necessária e falhou
+        """
+        motivo = self.motivo_reciclagem()
+        return self.reciclar_navegador(motivo) if motivo else True
+
+    def reciclar_navegador(self, motivo: str) -> bool:
+        """
+        Fecha e relança o Chrome, preservando os cookies da sessão, e reabre um wizard limpo
+
+        Se o navegador travou (cookies inacessíveis) ou a sessão não sobreviveu
+        à troca, refaz o login.
+
+        Returns:
+            bool: True se o novo navegador está pronto no Tomador
+        """
+        inicio = time.perf_counter()
+        logger.warning("♻️ Reciclando navegador (%s)...", motivo)
+        cookies = []
+        if not self.travado:
+            try:
+                cookies = self.driver.get_cookies()
+            except Exception as e:
+                logger.warning("⚠️ Cookies da sessão inacessíveis: %s", e)
+        try:
+            self.encerrar_driver()
+        except Exception:
+            encerrar_processos_navegador(self.driver)
+        self.driver = None
+        self.reciclagens += 1
+        self.notas_desde_reciclagem = 0
+        
+        if not self.setup_driver():
+            logger.error("❌ Falha ao relançar o navegador")
+            return False
+        if cookies:
+            try:
+                self.driver.get(self.settings.webiss_url)
+                for cookie in cookies:
+                    self.driver.add_cookie({k: v for k, v in cookie.items()
+                                            if k in ('name', 'value', 'path', 'domain', 'secure', 'httpOnly', 'expiry', 'sameSite')})
+                self.driver.get(self.url_wizard or self.settings.webiss_url)
+                self.is_logged_in = True
+            except Exception as e:
+                logger.warning("⚠️ Erro ao restaurar cookies da sessão: %s", e)
+        if not self.sessao_ativa() and not self.reconectar():
+            return False
+        if not self.ressincronizar_wizard():
+            return False
+        logger.info("✅ Navegador reciclado em %.1fs", time.perf_counter() - inicio)
+        return True
+
+    def ressincronizar_wizard(self) -> bool:
+        """
+        Leva a sessão a um wizard novo, no passo 2 (Tomador), a partir de qualquer estado
+
+        Usado depois de uma falha no meio do wizard, para que o próximo boleto
+        não herde a página suja da nota que falhou.
+
+        Returns:
+            bool: True se o wizard está pronto no Tomador
+        """
+        inicio = time.perf_counter()
+        self.ressincronizacoes += 1
+        estado = self.estado_pagina()
+        logger.info("🧭 Ressincronizando wizard (página em '%s')", estado['estado'])
+        for _ in range(2):
+            if estado['estado'] != ESTADO_MODAL:
+                break
+            logger.info("🪟 Modal aberto: %s", estado.get('detalhe') or '-')
+            self.fechar_modal(confirmar=False)
+            estado = self.estado_pagina()
+        if estado['estado'] == ESTADO_LOGIN and not self.reconectar():
+            return False
+        self.limpar_overlays()
+        if not self.navigate_to_new_nfse():
+            # A navegação pode ter caído no login (sessão expirada durante a nota)
+            if self.estado_pagina()['estado'] != ESTADO_LOGIN:
+                return False
+            if not self.reconectar() or not self.navigate_to_new_nfse():
+                return False
+        estado = self.estado_pagina()['estado']
+        if estado not in (ESTADO_PASSO_2, ESTADO_DESCONHECIDO):
+            logger.error("❌ Wizard não chegou ao Tomador após ressincronizar (página em '%s')", estado)
+            return False
+        logger.info("✅ Wizard ressincronizado em %.1fs", time.perf_counter() - inicio)
+        return True
+
+    def criar_sessao_aba(self, agendador) -> 'WebISSAutomation':
+        """
+        Cria a automação de outra aba da mesma sessão do Chrome
+        
+        Compartilha driver (e cookies), caches, catálogo e perfilador; cada aba
+        tem o próprio motor de esperas, que devolve o foco ao agendador.
+        """
+        import copy
+        sessao = copy.copy(self)
+        sessao.waits = WaitEngine(self.driver, self.settings.timeout, agendador=agendador)
+        return sessao
+
     def close(self):
         """Fecha o driver do navegador"""
+        self.selector_cache.exportar_estatisticas(os.path.join(self.get_logs_dir(), 'seletores_estatisticas.json'))
+        self.screenshots.aguardar()
+        if self.watchdog:
+            self.watchdog.parar()
+            self.watchdog = None
         if self.driver:
-            self.driver.quit()
-            logger.info("Driver do navegador fechado")
+            self.encerrar_driver()
+            if self.anexado:
+                logger.info("Desconectado do Chrome (continua aberto para a próxima execução)")
+            else:
+                logger.info("Driver do navegador fechado")
     
-    def take_screenshot(self, filename: str = None):
+    def take_screenshot(self, filename: str = None, erro: bool = True) -> Optional[str]:
         """
-        Tira screenshot da página atual
+        Captura a página atual conforme a política de screenshots; a gravação em disco é assíncrona
         
         Args:
-            filename: Nome do arquivo (opcional)
-        """
-        import os
-        import time
-        if not filename:
-            filename = f"screenshot_{int(time.time())}.png"
+            filename: Nome base do arquivo (recebe data/hora, boleto e etapa)
+            erro: Captura de diagnóstico de falha (False = registro do caminho de sucesso)
         
+        Returns:
+            Caminho do arquivo enfileirado, ou None se a política dispensou a captura
+        """
+        boleto, etapa = self.profiler.contexto_atual()
+        if not self.driver or not self.screenshots.deve_capturar(erro, boleto):
+            return None
         try:
-            screenshot_path = os.path.join(self.get_logs_dir(), filename)
-            self.driver.save_screenshot(screenshot_path)
-            logger.info(f"Screenshot salvo: {screenshot_path}")
+            png = self.driver.get_screenshot_as_png()
+            caminho = self.screenshots.enviar(png, self.screenshots.nome_arquivo(filename or 'screenshot', boleto, etapa))
+            logger.info("Screenshot enfileirado: %s", caminho)
+            return caminho
         except Exception as e:
-            logger.error(f"Erro ao salvar screenshot: {e}") 
+            logger.error("Erro ao salvar screenshot: %s", e)
+            return None
 
  
 
  
 
-    def selecionar_tipo_atividade(self, arrow_down_count=1):
-        """Seleciona o tipo de atividade no município usando JavaScript direto."""
+    def selecionar_opcao_catalogo(self, select_id: str, codigo=None, indice_padrao: int = 1):
+        """
+        Seleciona uma opção pelo valor, usando o catálogo da sessão
+        
+        Args:
+            select_id: Id do select (ex.: 'CnaeAtividade_Id')
+            codigo: Código vindo dos dados (CNAE, item da lista de serviços)
+            indice_padrao: Posição usada quando o código não existe ou não é encontrado
+            
+        Returns:
+            Opção selecionada ({'valor', 'texto'}) ou None
+        """
+        opcao = self.catalogo.buscar_por_codigo(select_id, codigo)
+        if opcao is None:
+            if codigo not in (None, '') and str(codigo).lower() != 'nan':
+                logger.warning("⚠️ Código '%s' não encontrado em '%s' - usando opção %s", codigo, select_id, indice_padrao)
+            opcao = self.catalogo.buscar_por_indice(select_id, indice_padrao)
+        if opcao is None or not self.catalogo.selecionar(select_id, opcao['valor']):
+            return None
+        return opcao
+
+    def selecionar_tipo_atividade(self, arrow_down_count=1, codigo=None):
+        """Seleciona o tipo de atividade no município pelo código (ou pela posição, sem código)."""
         try:
-            import time
-            logger.info(f"[DEBUG] Tentando selecionar tipo de atividade com {arrow_down_count} descidas")
+            logger.debug("[DEBUG] Tentando selecionar tipo de atividade com %s descidas", arrow_down_count)
             
             # Estratégia 1: Usar JavaScript para setar valor diretamente
             try:
-                logger.info("[DEBUG] Tentando estratégia 1: JavaScript direto para tipo de atividade")
-                select_element = self.driver.find_element(By.ID, "lista-de-servicos-prestador")
-                
-                # Log das opções disponíveis para debug
-                options = select_element.find_elements(By.TAG_NAME, "option")
-                logger.info(f"[DEBUG] Opções disponíveis no tipo de atividade: {len(options)}")
-                for i, option in enumerate(options):
-                    logger.info(f"[DEBUG] Opção {i}: {option.get_attribute('value')} - {option.text}")
-                
-                # Setar valor baseado no número de descidas (índice começa em 1)
-                if len(options) > arrow_down_count:
-                    selected_value = options[arrow_down_count].get_attribute('value')
-                    self.driver.execute_script(f"arguments[0].value = '{selected_value}';", select_element)
-                    self.driver.execute_script("arguments[0].dispatchEvent(new Event('change'));", select_element)
-                    self.driver.execute_script("arguments[0].dispatchEvent(new Event('input'));", select_element)
-                    
-                    # Forçar fechamento do select2 após setar valor
-                    time.sleep(0.5)
+                logger.debug("[DEBUG] Tentando estratégia 1: JavaScript direto para tipo de atividade")
+                opcao = self.selecionar_opcao_catalogo("lista-de-servicos-prestador", codigo, arrow_down_count)
+                if opcao:
+                    # Forçar fechamento do select2 após a página processar o novo valor
+                    self.waits.aguardar_ajax_ocioso()
                     self.driver.execute_script("""
                         // Forçar fechamento do select2
                         var select2Container = document.getElementById('s2id_lista-de-servicos-prestador');
@@ -1471,46 +2227,32 @@ class WebISSAutomation:
                         });
                     """)
                     
-                    logger.info(f"✅ Tipo de atividade selecionado via JavaScript: {options[arrow_down_count].text}")
+                    logger.info("✅ Tipo de atividade selecionado via JavaScript: %s", opcao['texto'])
                     return True
                 else:
-                    logger.warning(f"[DEBUG] Não há opções suficientes no tipo de atividade")
+                    logger.warning("[DEBUG] Não há opções suficientes no tipo de atividade")
                     return False
                     
             except Exception as e:
-                logger.warning(f"[DEBUG] Estratégia 1 falhou: {e}")
+                logger.warning("[DEBUG] Estratégia 1 falhou: %s", e)
                 return False
                 
         except Exception as e:
-            logger.warning(f"❌ Erro ao selecionar tipo de atividade: {e}")
+            logger.warning("❌ Erro ao selecionar tipo de atividade: %s", e)
             return False
 
-    def selecionar_cnae(self, arrow_down_count=1):
-        """Seleciona o CNAE usando JavaScript direto."""
+    def selecionar_cnae(self, arrow_down_count=1, codigo=None):
+        """Seleciona o CNAE pelo código (ou pela posição, sem código)."""
         try:
-            import time
-            logger.info(f"[DEBUG] Tentando selecionar CNAE com {arrow_down_count} descidas")
+            logger.debug("[DEBUG] Tentando selecionar CNAE com %s descidas", arrow_down_count)
             
             # Estratégia 1: Usar JavaScript para setar valor diretamente
             try:
-                logger.info("[DEBUG] Tentando estratégia 1: JavaScript direto para CNAE")
-                select_element = self.driver.find_element(By.ID, "CnaeAtividade_Id")
-                
-                # Log das opções disponíveis para debug
-                options = select_element.find_elements(By.TAG_NAME, "option")
-                logger.info(f"[DEBUG] Opções disponíveis no CNAE: {len(options)}")
-                for i, option in enumerate(options):
-                    logger.info(f"[DEBUG] Opção {i}: {option.get_attribute('value')} - {option.text}")
-                
-                # Setar valor baseado no número de descidas (índice começa em 1)
-                if len(options) > arrow_down_count:
-                    selected_value = options[arrow_down_count].get_attribute('value')
-                    self.driver.execute_script(f"arguments[0].value = '{selected_value}';", select_element)
-                    self.driver.execute_script("arguments[0].dispatchEvent(new Event('change'));", select_element)
-                    self.driver.execute_script("arguments[0].dispatchEvent(new Event('input'));", select_element)
-                    
-                    # Forçar fechamento do select2 após setar valor
-                    time.sleep(0.5)
+                logger.debug("[DEBUG] Tentando estratégia 1: JavaScript direto para CNAE")
+                opcao = self.selecionar_opcao_catalogo("CnaeAtividade_Id", codigo, arrow_down_count)
+                if opcao:
+                    # Forçar fechamento do select2 após a página processar o novo valor
+                    self.waits.aguardar_ajax_ocioso()
                     self.driver.execute_script("""
                         // Forçar fechamento do select2
                         var select2Container = document.getElementById('s2id_CnaeAtividade_Id');
@@ -1536,27 +2278,23 @@ class WebISSAutomation:
                         });
                     """)
                     
-                    logger.info(f"✅ CNAE selecionado via JavaScript: {options[arrow_down_count].text}")
+                    logger.info("✅ CNAE selecionado via JavaScript: %s", opcao['texto'])
                     return True
                 else:
-                    logger.warning(f"[DEBUG] Não há opções suficientes no CNAE")
+                    logger.warning("[DEBUG] Não há opções suficientes no CNAE")
                     return False
                     
             except Exception as e:
-                logger.warning(f"[DEBUG] Estratégia 1 falhou: {e}")
+                logger.warning("[DEBUG] Estratégia 1 falhou: %s", e)
                 return False
                 
         except Exception as e:
-            logger.warning(f"❌ Erro ao selecionar CNAE: {e}")
+            logger.warning("❌ Erro ao selecionar CNAE: %s", e)
             return False
 
     def lidar_com_modal_competencia(self):
         """Lida com o modal de confirmação da competência que pode aparecer."""
         try:
-            import time
-            # Aguardar um pouco para o modal aparecer
-            time.sleep(1)
-            
             # Diferentes seletores para o botão "Sim"
             sim_selectors = [
                 "//a[@data-handler='1' and contains(@class, 'btn-primary') and text()='Sim']",
@@ -1567,67 +2305,172 @@ class WebISSAutomation:
                 "//button[text()='Sim']"
             ]
             
-            for selector in sim_selectors:
-                try:
-                    sim_button = self.driver.find_element(By.XPATH, selector)
-                    if sim_button.is_displayed():
-                        logger.info(f"✅ Modal de confirmação encontrado com seletor: {selector}")
-                        sim_button.click()
-                        logger.info("✅ Clicado em 'Sim' no modal de confirmação")
-                        time.sleep(1)
+            # Aguardar brevemente o modal aparecer (ele só surge para competências diferentes da atual)
+            sim_button = self.waits.aguardar_elemento_visivel(sim_selectors, timeout=1, nome="modal de competência")
+            if sim_button:
+                logger.info("✅ Modal de confirmação encontrado")
+                sim_button.click()
+                logger.info("✅ Clicado em 'Sim' no modal de confirmação")
+                def modal_fechado(d):
+                    try:
+                        return not sim_button.is_displayed()
+                    except StaleElementReferenceException:
                         return True
-                except:
-                    continue
+
+                self.waits.aguardar("modal de competência fechado", modal_fechado)
+                return True
             
             logger.info("ℹ️ Modal de confirmação não encontrado")
             return False
             
         except Exception as e:
-            logger.warning(f"⚠️ Erro ao lidar com modal: {e}")
+            logger.warning("⚠️ Erro ao lidar com modal: %s", e)
+            return False
+
+    def resolver_inscricao_em_paralelo(self, elemento, cep_desejado, cpf_cnpj='') -> bool:
+        """
+        Resolve a inscrição municipal consultando o endereço de todas as opções de uma vez
+        
+        Usa o endpoint configurado (INSCRICAO_ENDERECO_URL) ou o aprendido ao
+        observar a página; a opção correta é selecionada uma única vez. Um
+        endpoint aprendido que não devolve CEPs ou cuja escolha não confere
+        com o CEP preenchido pela página é descartado, para ser aprendido de novo.
+        
+        Args:
+            elemento: Select da inscrição ou container select2
+            cep_desejado: CEP que a inscrição deve ter
+            cpf_cnpj: Documento do tomador (para alimentar o cache de inscrições)
+            
+        Returns:
+            bool: True se encontrou, selecionou e confirmou a inscrição
+        """
+        url_modelo = self.settings.inscricao_endereco_url or self.inscricao_cache.endpoint_endereco
+        if not url_modelo:
+            return False
+        aprendido = not self.settings.inscricao_endereco_url
+        
+        try:
+            resultados = resolver_inscricoes(self.driver, elemento, url_modelo, self.settings.timeout)
+            if not resultados:
+                logger.info("ℹ️ Consulta paralela de inscrições indisponível - usando teste sequencial")
+                return False
+            
+            escolhida = escolher_opcao(resultados, cep_desejado)
+            logger.info("📋 %s inscrições consultadas em paralelo", len(resultados))
+            if aprendido and not any(r.get('cep') for r in resultados):
+                # Nenhuma resposta trouxe CEP: o endpoint deduzido não é o do endereço
+                self.inscricao_cache.descartar_endpoint()
+                return False
+            if not escolhida:
+                logger.info("ℹ️ Nenhuma inscrição com CEP %s na consulta paralela - usando teste sequencial", cep_desejado)
+                return False
+            
+            cep_anterior = self.waits.ler_valor(CEP_CAMPOS)
+            if not selecionar_opcao(self.driver, elemento, escolhida['valor']):
+                return False
+            cep_preenchido = self.waits.aguardar_valor(CEP_CAMPOS, diferente_de=cep_anterior, timeout=3)
+            if not cep_confere(cep_preenchido, cep_desejado):
+                logger.warning("⚠️ Inscrição da consulta paralela não confere (%s != %s)", cep_preenchido, cep_desejado)
+                if aprendido:
+                    self.inscricao_cache.descartar_endpoint()
+                return False
+            
+            logger.info("✅ Inscrição resolvida em paralelo: %s (valor: %s)", escolhida['texto'], escolhida['valor'])
+            self.inscricao_cache.gravar(cpf_cnpj, cep_desejado, escolhida['valor'], escolhida['texto'])
+            return True
+        except Exception as e:
+            logger.warning("⚠️ Erro na consulta paralela de inscrições: %s", e)
+            return False
+
+    def aprender_endpoint_inscricao(self, valor_opcao: str):
+        """Deduz, das requisições feitas pela página, o endpoint que carrega o endereço da inscrição"""
+        if self.settings.inscricao_endereco_url or self.inscricao_cache.endpoint_endereco:
+            return
+        url_modelo = deduzir_modelo_url(self.waits.urls_recentes(), valor_opcao)
+        if url_modelo:
+            self.inscricao_cache.gravar_endpoint(url_modelo)
+
+    def aplicar_inscricao_em_cache(self, elemento, cep_desejado, cpf_cnpj='') -> bool:
+        """
+        Seleciona a inscrição que casou da última vez para o tomador/CEP e confere o CEP preenchido
+        
+        Registra acerto, divergência (a entrada é descartada) ou ausência no cache.
+        
+        Args:
+            elemento: Select da inscrição ou container select2
+            
+        Returns:
+            bool: True se a inscrição do cache foi selecionada e confirmada pelo CEP
+        """
+        em_cache = self.inscricao_cache.consultar(cpf_cnpj, cep_desejado)
+        if not em_cache:
+            self.inscricao_cache.registrar('ausentes')
             return False
+        
+        logger.info("💾 Inscrição em cache para o tomador: %s (valor: %s)", em_cache['texto'], em_cache['valor'])
+        cep_anterior = self.waits.ler_valor(CEP_CAMPOS)
+        if selecionar_opcao(self.driver, elemento, em_cache['valor']):
+            cep_preenchido = self.waits.aguardar_valor(CEP_CAMPOS, diferente_de=cep_anterior, timeout=3)
+            if cep_confere(cep_preenchido, cep_desejado):
+                self.inscricao_cache.registrar('acertos')
+                logger.info("✅ Inscrição do cache confirmada pelo CEP: %s", cep_preenchido)
+                return True
+            logger.info("⚠️ Inscrição do cache não confere (%s != %s) - testando opções", cep_preenchido, cep_desejado)
+        else:
+            logger.info("⚠️ Inscrição do cache não está mais entre as opções - testando opções")
+        self.inscricao_cache.registrar('divergencias')
+        self.inscricao_cache.remover(cpf_cnpj, cep_desejado)
+        return False
 
-    def tentar_selecionar_inscricao_select_por_cep(self, select_element, cep_desejado):
+    def tentar_selecionar_inscricao_select_por_cep(self, select_element, cep_desejado, cpf_cnpj=''):
         """
         Tenta selecionar a inscrição municipal correta baseada no CEP desejado (select normal)
         
+        A opção que casou da última vez para o mesmo tomador/CEP é tentada primeiro
+        (uma única leitura do CEP); as demais opções só são testadas se não houver
+        entrada no cache ou se ela não conferir mais.
+        
         Args:
             select_element: Elemento select da inscrição municipal
             cep_desejado: CEP que deve ser encontrado após seleção
+            cpf_cnpj: Documento do tomador (chave do cache de inscrições)
             
         Returns:
             bool: True se encontrou e selecionou a inscrição correta
         """
         try:
-            import time
-            logger.info(f"🎯 Tentando encontrar inscrição municipal para CEP: {cep_desejado}")
+            logger.info("🎯 Tentando encontrar inscrição municipal para CEP: %s", cep_desejado)
+            
+            def opcoes_carregadas(d):
+                return len(select_element.find_elements(By.TAG_NAME, "option")) > 1
             
-            # Aguardar um pouco para o select carregar as opções
-            time.sleep(2)
+            # Aguardar o select carregar as opções
+            self.waits.aguardar("opções da inscrição municipal", opcoes_carregadas, timeout=2)
             
             # Verificar se o select está habilitado
             if select_element.get_attribute('disabled'):
                 logger.warning("⚠️ Select está desabilitado, tentando habilitar...")
                 self.driver.execute_script("arguments[0].removeAttribute('disabled');", select_element)
-                time.sleep(1)
             
             # Obter todas as opções do select
             opcoes = select_element.find_elements(By.TAG_NAME, "option")
-            logger.info(f"📋 Encontradas {len(opcoes)} opções de inscrição municipal")
+            logger.info("📋 Encontradas %s opções de inscrição municipal", len(opcoes))
             
-            # Log das opções para debug
-            for i, opcao in enumerate(opcoes):
-                valor = opcao.get_attribute('value')
-                texto = opcao.text
-                logger.info(f"  Opção {i}: valor='{valor}', texto='{texto}'")
+            # Log das opções para debug (duas chamadas WebDriver por opção: só no nível DEBUG)
+            if logger.isEnabledFor(logging.DEBUG):
+                for i, opcao in enumerate(opcoes):
+                    valor = opcao.get_attribute('value')
+                    texto = opcao.text
+                    logger.debug("  Opção %s: valor='%s', texto='%s'", i, valor, texto)
             
             if len(opcoes) <= 1:  # Apenas "Selecione uma inscrição..."
                 logger.warning("⚠️ Nenhuma opção válida encontrada no select")
                 
                 # Tentar aguardar mais um pouco e verificar novamente
                 logger.info("🔄 Aguardando carregamento das opções...")
-                time.sleep(3)
+                self.waits.aguardar("opções da inscrição municipal", opcoes_carregadas, timeout=3)
                 opcoes = select_element.find_elements(By.TAG_NAME, "option")
-                logger.info(f"📋 Após aguardar: {len(opcoes)} opções encontradas")
+                logger.info("📋 Após aguardar: %s opções encontradas", len(opcoes))
                 
                 if len(opcoes) <= 1:
                     logger.warning("⚠️ Ainda não há opções válidas, tentando forçar carregamento...")
@@ -1635,16 +2478,24 @@ class WebISSAutomation:
                     # Tentar forçar carregamento clicando no select
                     try:
                         self.driver.execute_script("arguments[0].click();", select_element)
-                        time.sleep(2)
+                        self.waits.aguardar("opções da inscrição municipal", opcoes_carregadas, timeout=2)
                         opcoes = select_element.find_elements(By.TAG_NAME, "option")
-                        logger.info(f"📋 Após clicar: {len(opcoes)} opções encontradas")
+                        logger.info("📋 Após clicar: %s opções encontradas", len(opcoes))
                     except Exception as e:
-                        logger.warning(f"⚠️ Erro ao clicar no select: {e}")
+                        logger.warning("⚠️ Erro ao clicar no select: %s", e)
                 
                 if len(opcoes) <= 1:
                     logger.error("❌ Não foi possível carregar opções do select")
                     return False
             
+            # Consultar o cache antes de testar as opções
+            if self.aplicar_inscricao_em_cache(select_element, cep_desejado, cpf_cnpj):
+                return True
+            
+            # Consultar o endereço de todas as opções de uma vez
+            if self.resolver_inscricao_em_paralelo(select_element, cep_desejado, cpf_cnpj):
+                return True
+            
             # Tentar cada opção até encontrar o CEP correto
             for i, opcao in enumerate(opcoes):
                 try:
@@ -1657,84 +2508,78 @@ class WebISSAutomation:
                     
                     # Pular opções vazias ou inválidas
                     if not valor_opcao or valor_opcao == '-1' or valor_opcao == '':
-                        logger.info(f"⏭️ Pulando opção {i}: valor inválido '{valor_opcao}'")
+                        logger.info("⏭️ Pulando opção %s: valor inválido '%s'", i, valor_opcao)
                         continue
                     
-                    logger.info(f"🔄 Testando opção {i}/{len(opcoes)}: {texto_opcao} (valor: {valor_opcao})")
+                    logger.info("🔄 Testando opção %s/%s: %s (valor: %s)", i, len(opcoes), texto_opcao, valor_opcao)
                     
                     # Selecionar a opção
+                    cep_anterior = self.waits.ler_valor(CEP_CAMPOS)
                     self.driver.execute_script("arguments[0].value = arguments[1];", select_element, valor_opcao)
                     self.driver.execute_script("arguments[0].dispatchEvent(new Event('change'));", select_element)
                     self.driver.execute_script("arguments[0].dispatchEvent(new Event('input'));", select_element)
                     
-                    time.sleep(3)  # Aguardar carregamento
-                    
-                    # Verificar se o CEP foi preenchido automaticamente
-                    cep_campos = [
-                        "//input[@name='cep']",
-                        "//input[@id='cep']",
-                        "//input[contains(@placeholder, 'CEP')]",
-                        "//input[contains(@placeholder, 'cep')]"
-                    ]
-                    
-                    cep_preenchido = None
-                    for cep_xpath in cep_campos:
-                        try:
-                            cep_field = self.driver.find_element(By.XPATH, cep_xpath)
-                            if cep_field.is_displayed() and cep_field.get_attribute('value'):
-                                cep_preenchido = cep_field.get_attribute('value')
-                                break
-                        except:
-                            continue
+                    # Aguardar o AJAX da página preencher o CEP da inscrição
+                    cep_preenchido = self.waits.aguardar_valor(CEP_CAMPOS, diferente_de=cep_anterior, timeout=3)
                     
                     if cep_preenchido:
-                        logger.info(f"📍 CEP preenchido automaticamente: {cep_preenchido}")
+                        logger.info("📍 CEP preenchido automaticamente: %s", cep_preenchido)
+                        self.aprender_endpoint_inscricao(valor_opcao)
                         
                         # Comparar com o CEP desejado
-                        if cep_preenchido == cep_desejado:
-                            logger.info(f"✅ CEP correto encontrado! Opção {i} selecionada: {texto_opcao}")
+                        if cep_confere(cep_preenchido, cep_desejado):
+                            logger.info("✅ CEP correto encontrado! Opção %s selecionada: %s", i, texto_opcao)
+                            self.inscricao_cache.gravar(cpf_cnpj, cep_desejado, valor_opcao, texto_opcao)
                             return True
                         else:
-                            logger.info(f"❌ CEP incorreto ({cep_preenchido} != {cep_desejado}) - tentando próxima opção")
+                            logger.info("❌ CEP incorreto (%s != %s) - tentando próxima opção", cep_preenchido, cep_desejado)
                     else:
-                        logger.warning(f"⚠️ Nenhum CEP foi preenchido automaticamente para opção {i}: {texto_opcao}")
+                        logger.warning("⚠️ Nenhum CEP foi preenchido automaticamente para opção %s: %s", i, texto_opcao)
                         
                 except Exception as e:
-                    logger.warning(f"⚠️ Erro ao testar opção {i}: {e}")
+                    logger.warning("⚠️ Erro ao testar opção %s: %s", i, e)
                     continue
             
-            logger.warning(f"❌ Nenhuma opção encontrou o CEP correto: {cep_desejado}")
+            logger.warning("❌ Nenhuma opção encontrou o CEP correto: %s", cep_desejado)
             return False
             
         except Exception as e:
-            logger.error(f"❌ Erro ao tentar selecionar inscrição por CEP: {e}")
+            logger.error("❌ Erro ao tentar selecionar inscrição por CEP: %s", e)
             return False
 
-    def tentar_selecionar_inscricao_por_cep(self, select2_element, cep_desejado):
+    def tentar_selecionar_inscricao_por_cep(self, select2_element, cep_desejado, cpf_cnpj=''):
         """
         Tenta selecionar a inscrição municipal correta baseada no CEP desejado (select2)
         
+        Como no select normal, a inscrição em cache é tentada antes de abrir o
+        select2, e a opção confirmada pelo CEP é gravada no cache.
+        
         Args:
             select2_element: Elemento select2 da inscrição municipal
             cep_desejado: CEP que deve ser encontrado após seleção
+            cpf_cnpj: Documento do tomador (para alimentar o cache de inscrições)
             
         Returns:
             bool: True se encontrou e selecionou a inscrição correta
         """
         try:
-            import time
-            logger.info(f"🎯 Tentando encontrar inscrição municipal para CEP: {cep_desejado}")
+            logger.info("🎯 Tentando encontrar inscrição municipal para CEP: %s", cep_desejado)
+            
+            # Consultar o cache antes de abrir o select2
+            if self.aplicar_inscricao_em_cache(select2_element, cep_desejado, cpf_cnpj):
+                return True
+            
+            # Consultar o endereço de todas as opções de uma vez
+            if self.resolver_inscricao_em_paralelo(select2_element, cep_desejado, cpf_cnpj):
+                return True
             
             # Clicar no select2 para abrir as opções
             select2_choice = select2_element.find_element(By.CLASS_NAME, "select2-choice")
             self.driver.execute_script("arguments[0].click();", select2_choice)
-            time.sleep(1)
             
             # Aguardar lista de opções aparecer
             try:
-                ul = self.wait.until(
-                    lambda d: d.find_element(By.XPATH, "//ul[contains(@class, 'select2-results') and not(contains(@style, 'display: none'))]")
-                )
+                ul = self.aguardar_lista_select2()
                 logger.info("✅ Lista de opções do select2 aberta")
             except TimeoutException:
                 logger.error("❌ Lista de opções não apareceu")
@@ -1742,7 +2587,7 @@ class WebISSAutomation:
             
             # Obter todas as opções
             opcoes = ul.find_elements(By.XPATH, ".//li[@class='select2-result-selectable']")
-            logger.info(f"📋 Encontradas {len(opcoes)} opções de inscrição municipal")
+            logger.info("📋 Encontradas %s opções de inscrição municipal", len(opcoes))
             
             if not opcoes:
                 logger.warning("⚠️ Nenhuma opção encontrada no select2")
@@ -1751,50 +2596,36 @@ class WebISSAutomation:
             # Tentar cada opção até encontrar o CEP correto
             for i, opcao in enumerate(opcoes):
                 try:
-                    logger.info(f"🔄 Testando opção {i+1}/{len(opcoes)}")
+                    logger.info("🔄 Testando opção %s/%s", i+1, len(opcoes))
                     
                     # Clicar na opção
+                    cep_anterior = self.waits.ler_valor(CEP_CAMPOS)
                     self.driver.execute_script("arguments[0].click();", opcao)
-                    time.sleep(2)  # Aguardar carregamento
                     
-                    # Verificar se o CEP foi preenchido automaticamente
-                    cep_campos = [
-                        "//input[@name='cep']",
-                        "//input[@id='cep']",
-                        "//input[contains(@placeholder, 'CEP')]",
-                        "//input[contains(@placeholder, 'cep')]"
-                    ]
-                    
-                    cep_preenchido = None
-                    for cep_xpath in cep_campos:
-                        try:
-                            cep_field = self.driver.find_element(By.XPATH, cep_xpath)
-                            if cep_field.is_displayed() and cep_field.get_attribute('value'):
-                                cep_preenchido = cep_field.get_attribute('value')
-                                break
-                        except:
-                            continue
+                    # Aguardar o AJAX da página preencher o CEP da inscrição
+                    cep_preenchido = self.waits.aguardar_valor(CEP_CAMPOS, diferente_de=cep_anterior, timeout=3)
                     
                     if cep_preenchido:
-                        logger.info(f"📍 CEP preenchido automaticamente: {cep_preenchido}")
+                        logger.info("📍 CEP preenchido automaticamente: %s", cep_preenchido)
                         
                         # Comparar com o CEP desejado
-                        if cep_preenchido == cep_desejado:
-                            logger.info(f"✅ CEP correto encontrado! Opção {i+1} selecionada")
+                        if cep_confere(cep_preenchido, cep_desejado):
+                            logger.info("✅ CEP correto encontrado! Opção %s selecionada", i+1)
+                            selecionada = opcao_selecionada(self.driver, select2_element)
+                            if selecionada and selecionada['valor']:
+                                self.aprender_endpoint_inscricao(selecionada['valor'])
+                                self.inscricao_cache.gravar(cpf_cnpj, cep_desejado, selecionada['valor'], selecionada['texto'])
                             return True
                         else:
-                            logger.info(f"❌ CEP incorreto ({cep_preenchido} != {cep_desejado}) - tentando próxima opção")
+                            logger.info("❌ CEP incorreto (%s != %s) - tentando próxima opção", cep_preenchido, cep_desejado)
                             
                             # Abrir select2 novamente para próxima opção
                             if i < len(opcoes) - 1:  # Se não for a última opção
                                 self.driver.execute_script("arguments[0].click();", select2_choice)
-                                time.sleep(1)
                                 
                                 # Aguardar lista aparecer novamente
                                 try:
-                                    ul = self.wait.until(
-                                        lambda d: d.find_element(By.XPATH, "//ul[contains(@class, 'select2-results') and not(contains(@style, 'display: none'))]")
-                                    )
+                                    ul = self.aguardar_lista_select2()
                                 except TimeoutException:
                                     logger.error("❌ Não foi possível reabrir lista de opções")
                                     return False
@@ -1806,17 +2637,14 @@ class WebISSAutomation:
                                 else:
                                     break
                     else:
-                        logger.warning(f"⚠️ Nenhum CEP foi preenchido automaticamente para opção {i+1}")
+                        logger.warning("⚠️ Nenhum CEP foi preenchido automaticamente para opção %s", i+1)
                         
                         # Tentar próxima opção mesmo assim
                         if i < len(opcoes) - 1:
                             self.driver.execute_script("arguments[0].click();", select2_choice)
-                            time.sleep(1)
                             
                             try:
-                                ul = self.wait.until(
-                                    lambda d: d.find_element(By.XPATH, "//ul[contains(@class, 'select2-results') and not(contains(@style, 'display: none'))]")
-                                )
+                                ul = self.aguardar_lista_select2()
                                 opcoes = ul.find_elements(By.XPATH, ".//li[@class='select2-result-selectable']")
                                 if i + 1 < len(opcoes):
                                     opcao = opcoes[i + 1]
@@ -1826,58 +2654,49 @@ class WebISSAutomation:
                                 break
                         
                 except Exception as e:
-                    logger.warning(f"⚠️ Erro ao testar opção {i+1}: {e}")
+                    logger.warning("⚠️ Erro ao testar opção %s: %s", i+1, e)
                     continue
             
-            logger.warning(f"❌ Nenhuma opção encontrou o CEP correto: {cep_desejado}")
+            logger.warning("❌ Nenhuma opção encontrou o CEP correto: %s", cep_desejado)
             return False
             
         except Exception as e:
-            logger.error(f"❌ Erro ao tentar selecionar inscrição por CEP: {e}")
+            logger.error("❌ Erro ao tentar selecionar inscrição por CEP: %s", e)
             return False
 
+    @perfilar_etapa('próxima nota')
     def navegar_para_proxima_nota(self) -> bool:
         """Navega para criar a próxima nota após emitir a atual"""
         try:
-            import time
             logger.info("🔄 Navegando para próxima nota...")
             
-            # Aguardar um pouco para a página carregar após emissão
-            time.sleep(2)
+            # Aguardar a página terminar de carregar após a emissão
+            self.waits.aguardar_ajax_ocioso()
+            
+            # Ir direto ao wizard se a URL já é conhecida
+            if self.abrir_wizard_direto():
+                return True
             
             # Tentar diferentes estratégias para voltar ao menu de criação
             
             # Estratégia 1: Clicar em "Criar" no menu lateral
             try:
-                criar_menu = self.wait.until(
-                    EC.element_to_be_clickable((By.XPATH, "//span[contains(text(), 'Criar')]"))
-                )
+                criar_menu = self.aguardar_menu('Criar')
+                url_menu = self.driver.current_url
                 criar_menu.click()
-                time.sleep(1.5)
+                if self.waits.aguardar_mudanca_url(url_menu, timeout=5):
+                    self.waits.aguardar_documento_pronto()
+                    self.registrar_url_wizard()
                 logger.info("✅ Menu Criar clicado")
                 
                 # Clicar no botão Próximo para avançar para o passo Tomador
                 try:
-                    proximo_btn_xpaths = [
-                        "//a[@id='btnProximo']",  # seletor direto por id
-                        "//button[contains(., 'Próximo')]",
-                        "//a[contains(., 'Próximo')]",
-                        "//*[contains(@class, 'btn') and contains(., 'Próximo')]"
-                    ]
-                    proximo_btn = None
-                    for xpath in proximo_btn_xpaths:
-                        try:
-                            proximo_btn = self.wait.until(
-                                EC.element_to_be_clickable((By.XPATH, xpath))
-                            )
-                            logger.info(f"Botão Próximo encontrado: {xpath}")
-                            break
-                        except TimeoutException:
-                            continue
+                    proximo_btn, _ = self.resolver_elemento('botao_proximo_inicio', self.PROXIMO_INICIO_XPATHS)
                     if not proximo_btn:
                         raise TimeoutException("Botão Próximo não encontrado em nenhum seletor")
+                    etapa_anterior = self.waits.etapa_atual()
                     proximo_btn.click()
-                    time.sleep(1)
+                    self.aguardar_transicao_etapa(etapa_anterior)
                     logger.info("✅ Botão Próximo clicado - avançando para Tomador")
                     return True
                 except TimeoutException:
@@ -1890,25 +2709,19 @@ class WebISSAutomation:
             # Estratégia 2: Voltar ao menu principal e navegar novamente
             try:
                 # Tentar voltar ao menu ISSQN
-                issqn_menu = self.wait.until(
-                    EC.element_to_be_clickable((By.XPATH, "//span[contains(text(), 'ISSQN')]"))
-                )
+                issqn_menu = self.aguardar_menu('ISSQN')
                 issqn_menu.click()
-                time.sleep(1)
                 
                 # Clicar em NFS-e
-                nfse_menu = self.wait.until(
-                    EC.element_to_be_clickable((By.XPATH, "//span[contains(text(), 'NFS-e')]"))
-                )
+                nfse_menu = self.aguardar_menu('NFS-e')
                 nfse_menu.click()
-                time.sleep(1)
                 
                 # Clicar em Criar
-                criar_menu = self.wait.until(
-                    EC.element_to_be_clickable((By.XPATH, "//span[contains(text(), 'Criar')]"))
-                )
+                criar_menu = self.aguardar_menu('Criar')
+                url_menu = self.driver.current_url
                 criar_menu.click()
-                time.sleep(1.5)
+                if self.waits.aguardar_mudanca_url(url_menu, timeout=5):
+                    self.waits.aguardar_documento_pronto()
                 logger.info("✅ Navegação para próxima nota via menu completo")
                 return True
             except TimeoutException:
@@ -1926,18 +2739,18 @@ class WebISSAutomation:
                         }
                     }
                 """)
-                time.sleep(1.5)
+                self.waits.aguardar_ajax_ocioso(quieto_ms=300)
                 logger.info("✅ Navegação para próxima nota via JavaScript")
                 return True
             except Exception as e:
-                logger.warning(f"Navegação via JavaScript falhou: {e}")
+                logger.warning("Navegação via JavaScript falhou: %s", e)
             
             logger.error("❌ Falha em todas as estratégias de navegação")
             self.take_screenshot("navegacao_proxima_nota_falhou.png")
             return False
             
         except Exception as e:
-            logger.error(f"Erro ao navegar para próxima nota: {e}")
+            logger.error("Erro ao navegar para próxima nota: %s", e)
             self.take_screenshot("erro_navegacao_proxima_nota.png")
             return False
 